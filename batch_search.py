@@ -0,0 +1,100 @@
+import click
+import json
+import time
+from typing import Dict, List
+from search import resolve_query_terms, tokenize_query
+from utils.bm25 import B, K1
+from utils.booleanAND_utils import validate_paths
+from utils.flat_index import load_flat_index
+from utils.impact_matrix import DEFAULT_BLOCK_SIZE, batch_scores, build_impact_matrix
+from utils.lexicon import load_lexicon
+from utils.liveness import load_liveness
+from utils.pruning import load_document_frequencies
+
+Q0 = "Q0"
+RUNTAG = "ctiscareBM25"
+DEFAULT_DEPTH = 1000
+
+
+def load_topics(query_file_path: str) -> Dict[str, str]:
+    with open(query_file_path) as f:
+        return {
+            topic: query.replace("\n", " ").replace("_", " ")
+            for topic, query in json.load(f).items()
+        }
+
+
+def write_run(
+    output_file_path: str,
+    topics: List[str],
+    rankings: List[List],
+    docnos: List[str],
+    run_tag: str,
+) -> None:
+    with open(output_file_path, "w") as f:
+        for topic, ranking in zip(topics, rankings):
+            for rank, (doc_id, score) in enumerate(ranking, 1):
+                f.write(f"{topic} {Q0} {docnos[doc_id]} {rank} {score:.6f} {run_tag}\n")
+
+
+@click.command()
+@click.argument("index_directory_path", nargs=1, required=False)
+@click.argument("query_file_path", nargs=1, required=False)
+@click.argument("output_file_path", nargs=1, required=False)
+@click.option(
+    "--depth",
+    default=DEFAULT_DEPTH,
+    show_default=True,
+    help="Documents retrieved per topic.",
+)
+@click.option(
+    "--block-size",
+    default=DEFAULT_BLOCK_SIZE,
+    show_default=True,
+    help="Topics scored per sparse matrix product.",
+)
+@click.option("--run-tag", default=RUNTAG, show_default=True)
+def main(
+    index_directory_path: str,
+    query_file_path: str,
+    output_file_path: str,
+    depth: int,
+    block_size: int,
+    run_tag: str,
+) -> None:
+    validate_paths(index_directory_path, query_file_path, output_file_path)
+
+    start_time = time.perf_counter()
+    lexicon = load_lexicon(index_directory_path)
+    with open(f"{index_directory_path}/index_registrar.txt") as f:
+        docnos = f.read().splitlines()
+    impact_matrix = build_impact_matrix(
+        load_flat_index(index_directory_path),
+        K1,
+        B,
+        load_document_frequencies(index_directory_path),
+        load_liveness(index_directory_path),
+    )
+    load_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    topics = load_topics(query_file_path)
+    queries = [
+        resolve_query_terms(tokenize_query(query), lexicon) for query in topics.values()
+    ]
+    rankings = list(batch_scores(impact_matrix, queries, depth, block_size))
+    search_time = time.perf_counter() - start_time
+
+    write_run(output_file_path, list(topics), rankings, docnos, run_tag)
+    print(
+        f"Built a {impact_matrix.shape[0]}x{impact_matrix.shape[1]} impact matrix "
+        f"with {impact_matrix.nnz} postings in {load_time:.2f} seconds."
+    )
+    print(
+        f"Scored {len(topics)} topics in {search_time * 1000:.2f} ms "
+        f"({search_time / max(len(topics), 1) * 1000:.3f} ms per topic)."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,21 @@
 import click
 import json
-import re
-from typing import List, Dict, Tuple
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Tuple
 from utils.booleanAND_utils import validate_paths
+from utils.liveness import Liveness, load_liveness
+from utils import lexicon as lexicon_store
+from utils.snapshot import compact_postings, load_or_build
+from utils.boolean_query import QuerySyntaxError, run_query, tokenize_query
 
 Q0 = "QO"
 RUNTAG = "ctiscareAND"
+SNAPSHOT_FILE = "booleanAND_state.snapshot"
+DEFAULT_SKIPPED_TOPICS = "416,423,437,444,447"
+
+_worker_index = None
 
 
 def load_json_file(file_path: str) -> Dict:
@@ -13,21 +23,19 @@ def load_json_file(file_path: str) -> Dict:
         return json.load(file)
 
 
-def process_query_topics(query_topics: Dict) -> Dict[str, List[str]]:
-    search_tokens = {}
+def process_query_topics(
+    query_topics: Dict, skipped_topics: Tuple[int, ...] = ()
+) -> Dict[str, str]:
+    search_queries = {}
     for key, value in query_topics.items():
-        if int(key) in (416, 423, 437, 444, 447):
+        if int(key) in skipped_topics:
             continue
-        cleaned_query = value.replace("\n", " ").replace("_", " ")
-        query_tokens = re.sub(r"\W+", ", ", cleaned_query).lower().split(", ")
-        search_tokens[key] = query_tokens
-    return search_tokens
+        search_queries[key] = value.replace("\n", " ").replace("_", " ")
+    return search_queries
 
 
 def load_lexicon(file_path: str) -> Dict[str, int]:
-    with open(file_path) as file:
-        lexicon = file.read().splitlines()
-    return {word: index for index, word in enumerate(lexicon, 1)}
+    return lexicon_store.load_lexicon(os.path.dirname(file_path))
 
 
 def load_index_registrar(file_path: str) -> Dict[int, str]:
@@ -36,30 +44,111 @@ def load_index_registrar(file_path: str) -> Dict[int, str]:
     return {index: value for index, value in enumerate(index_registrar)}
 
 
+def build_index_data(
+    index_directory_path: str,
+) -> Tuple[Dict[str, int], Dict[int, str], Dict[str, List[int]]]:
+    lexicon = load_lexicon(f"{index_directory_path}/lexicon.txt")
+    index_registrar = load_index_registrar(
+        f"{index_directory_path}/index_registrar.txt"
+    )
+    inverted_index = compact_postings(
+        load_json_file(f"{index_directory_path}/inverted_index.json")
+    )
+    return lexicon, index_registrar, inverted_index
+
+
+def load_index_data(
+    index_directory_path: str,
+) -> Tuple[Dict[str, int], Dict[int, str], Dict[str, List[int]]]:
+    source_paths = [
+        f"{index_directory_path}/{name}"
+        for name in [
+            "lexicon.txt",
+            lexicon_store.FRONT_CODED_LEXICON_FILE,
+            "index_registrar.txt",
+            "inverted_index.json",
+        ]
+    ]
+    return load_or_build(
+        f"{index_directory_path}/{SNAPSHOT_FILE}",
+        source_paths,
+        lambda: build_index_data(index_directory_path),
+    )
+
+
 def search_inverted_index(
-    search_tokens: Dict[str, List[str]],
+    search_queries: Dict[str, str],
     lexicon: Dict[str, int],
     inverted_index: Dict[str, List[int]],
     index_registrar: Dict[int, str],
+    timings: Optional[Dict[str, float]] = None,
+    liveness: Optional[Liveness] = None,
 ) -> List[Dict]:
     results = []
-    for key, tokens in search_tokens.items():
-        valid_tokens = [token for token in tokens if token in lexicon]
-        if not valid_tokens:
+    for key, query in search_queries.items():
+        if not tokenize_query(query):
             continue
+        start_time = time.perf_counter()
+        try:
+            doc_ids = run_query(query, lexicon, inverted_index, len(index_registrar))
+        except QuerySyntaxError as e:
+            print(f"Query Syntax Error: topic {key}: {e}")
+            continue
+        if liveness is not None:
+            doc_ids = liveness.filter_ids(doc_ids)
+        if timings is not None:
+            timings[key] = time.perf_counter() - start_time
+        results.extend(create_final_results(key, doc_ids, index_registrar))
+    return results
 
-        term_ids = [lexicon[token] for token in valid_tokens]
-        collections = [
-            inverted_index.get(str(term_id), [])[::2] for term_id in term_ids
-        ]
 
-        common_docs = set(collections[0]).intersection(*collections[1:])
-        results.extend(create_final_results(key, common_docs, index_registrar))
+def load_worker_index(index_directory_path: str) -> None:
+    global _worker_index
+    _worker_index = (
+        *load_index_data(index_directory_path),
+        load_liveness(index_directory_path),
+    )
+
+
+def search_topic_batch(
+    search_queries: Dict[str, str],
+) -> Tuple[List[Dict], Dict[str, float]]:
+    lexicon, index_registrar, inverted_index, liveness = _worker_index
+    timings = {}
+    results = search_inverted_index(
+        search_queries, lexicon, inverted_index, index_registrar, timings, liveness
+    )
+    return results, timings
+
+
+def search_in_parallel(
+    index_directory_path: str,
+    search_queries: Dict[str, str],
+    workers: int,
+    timings: Dict[str, float],
+) -> List[Dict]:
+    # Warm the snapshot once so workers restore it instead of each parsing JSON.
+    load_index_data(index_directory_path)
+    keys = list(search_queries)
+    batch_size = max(1, -(-len(keys) // (workers * 4)))
+    batches = [
+        {key: search_queries[key] for key in keys[i : i + batch_size]}
+        for i in range(0, len(keys), batch_size)
+    ]
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=load_worker_index,
+        initargs=(index_directory_path,),
+    ) as executor:
+        for batch_results, batch_timings in executor.map(search_topic_batch, batches):
+            results.extend(batch_results)
+            timings.update(batch_timings)
     return results
 
 
 def create_final_results(
-    topic_id: str, doc_ids: set, index_registrar: Dict[int, str]
+    topic_id: str, doc_ids: List[int], index_registrar: Dict[int, str]
 ) -> List[Dict]:
     return [
         {
@@ -84,23 +173,57 @@ def write_results_to_file(output_file_path: str, final_results: List[Dict]):
 @click.argument("index_directory_path", nargs=1, required=False)
 @click.argument("query_file_path", nargs=1, required=False)
 @click.argument("output_file_path", nargs=1, required=False)
-def main(index_directory_path: str, query_file_path: str, output_file_path: str):
+@click.option(
+    "--workers",
+    default=1,
+    show_default=True,
+    help="Number of processes used to evaluate topics in parallel.",
+)
+@click.option(
+    "--skip-topics",
+    default=DEFAULT_SKIPPED_TOPICS,
+    show_default=True,
+    help="Comma-separated topic IDs to leave out of the run.",
+)
+def main(
+    index_directory_path: str,
+    query_file_path: str,
+    output_file_path: str,
+    workers: int,
+    skip_topics: str,
+):
     validate_paths(index_directory_path, query_file_path, output_file_path)
 
     query_topics = load_json_file(query_file_path)
-    search_tokens = process_query_topics(query_topics)
-
-    lexicon = load_lexicon(f"{index_directory_path}/lexicon.txt")
-    index_registrar = load_index_registrar(
-        f"{index_directory_path}/index_registrar.txt"
-    )
-    inverted_index = load_json_file(f"{index_directory_path}/inverted_index.json")
-
-    final_results = search_inverted_index(
-        search_tokens, lexicon, inverted_index, index_registrar
-    )
+    skipped_topics = tuple(int(topic) for topic in skip_topics.split(",") if topic)
+    search_queries = process_query_topics(query_topics, skipped_topics)
+
+    timings = {}
+    if workers > 1:
+        final_results = search_in_parallel(
+            index_directory_path, search_queries, workers, timings
+        )
+    else:
+        lexicon, index_registrar, inverted_index = load_index_data(index_directory_path)
+        final_results = search_inverted_index(
+            search_queries,
+            lexicon,
+            inverted_index,
+            index_registrar,
+            timings,
+            load_liveness(index_directory_path),
+        )
     write_results_to_file(output_file_path, final_results)
 
+    if timings:
+        total = sum(timings.values())
+        slowest = max(timings, key=timings.get)
+        print(
+            f"Evaluated {len(timings)} topics in {total * 1000:.2f} ms "
+            f"(mean {total / len(timings) * 1000:.3f} ms, "
+            f"slowest topic {slowest} at {timings[slowest] * 1000:.3f} ms)."
+        )
+
 
 if __name__ == "__main__":
     main()
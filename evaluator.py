@@ -1,6 +1,10 @@
 import click
+import functools
+import heapq
 import math
-from typing import Dict, List, Tuple
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from utils.evaluator_utils import validate_paths, EXPECTED_TOPICS
 
 
@@ -8,45 +12,45 @@ class ResultsParseError(Exception):
     pass
 
 
-def average_precision(
-    relevancy_profiles: Dict[str, List[Dict[str, str]]],
-    topic_arr: List[List[str]],
-    topic: str,
-) -> float:
-    running_precision = 0
-    n_precision = 0
-    n_relevance = 0
-    rel = count_relevant_docs(relevancy_profiles, topic)
-    for i, result in enumerate(topic_arr, 1):
-        relevance = is_relevant(relevancy_profiles, topic, result[2])
-        running_precision += relevance
-        n_precision = running_precision / i
-        n_relevance += n_precision * relevance
-    return n_relevance / rel
-
-
-def precision_10(
-    relevancy_profiles: Dict[str, List[Dict[str, str]]],
-    topic_arr: List[List[str]],
-    topic: str,
-) -> float:
-    running_precision = 0
-    n_precision = 0
-    idx = 0
-    for i in range(1, 11):
-        if idx <= len(topic_arr) - 1:
-            relevance = is_relevant(relevancy_profiles, topic, topic_arr[idx][2])
-            running_precision += relevance
-        n_precision = running_precision / i
-        idx += 1
+METRICS = ["ap", "P_10", "ndcg_cut_10", "ndcg_cut_1000"]
+MEAN_LABELS = {
+    "ap": "mean average precision",
+    "P_10": "mean P@10",
+    "ndcg_cut_10": "mean NDCG@10",
+    "ndcg_cut_1000": "mean NDCG@1000",
+}
+_discounts = []
+_worker_qrels = None
+_worker_depth = None
 
-    return n_precision
 
+def discounts(length: int) -> np.ndarray:
+    # Built with math.log2 so every DCG term is bit-identical to the scalar form.
+    for i in range(len(_discounts) + 1, length + 1):
+        _discounts.append(math.log2(i + 1))
+    return np.array(_discounts[:length])
 
-def ideal_ranking_score(
-    relevancy_profiles: Dict[str, List[Dict[str, str]]], topic: str, n: int
-) -> float:
-    rel_docs = count_relevant_docs(relevancy_profiles, topic)
+
+def relevance_vector(
+    judgments: Dict[str, int], topic_arr: List[List[str]]
+) -> np.ndarray:
+    return np.array(
+        [judgments.get(result[2], 0) for result in topic_arr], dtype=np.int64
+    )
+
+
+def average_precision(relevance: np.ndarray, rel: int) -> float:
+    ranks = np.arange(1, len(relevance) + 1)
+    precision_at_rank = np.cumsum(relevance) / ranks
+    return float(np.cumsum(precision_at_rank * relevance)[-1]) / rel
+
+
+def precision_10(relevance: np.ndarray) -> float:
+    return int(relevance[:10].sum()) / 10
+
+
+@functools.lru_cache(maxsize=None)
+def ideal_ranking_score(rel_docs: int, n: int) -> float:
     running_score = 0
     for i in range(1, rel_docs + 1):
         running_score += 1 / math.log2(i + 1)
@@ -56,40 +60,22 @@ def ideal_ranking_score(
 
 
 def normalized_discount_cumulative_gain_n(
-    relevancy_profiles: Dict[str, List[Dict[str, str]]],
-    topic_arr: List[List[str]],
-    topic: str,
-    n: int,
+    relevance: np.ndarray, rel: int, n: int
 ) -> float:
-    running_dcg = 0
-    topic_len = len(topic_arr)
-    for i, result in enumerate(topic_arr, 1):
-        numerator = is_relevant(relevancy_profiles, topic, result[2])
-        denominator = math.log2(i + 1)
-        running_dcg += numerator / denominator
-        if i == n or i == topic_len:
-            ideal_ranking_arr = ideal_ranking_score(relevancy_profiles, topic, n)
-            ndcg = running_dcg / ideal_ranking_arr
-            return ndcg
-
-
-def count_relevant_docs(
-    relevancy_profiles: Dict[str, List[Dict[str, str]]], topic: str
-) -> int:
-    count = 0
-    for i in relevancy_profiles[str(topic)]:
-        count += int(i["relevant"])
-    return count
-
-
-def is_relevant(
-    relevancy_profiles: Dict[str, List[Dict[str, str]]], topic: str, docno: str
-) -> int:
-    rs = relevancy_profiles[str(topic)]
-    try:
-        return int(list(filter(lambda r: r["docno"] == docno, rs))[0]["relevant"])
-    except IndexError as e:
-        return 0
+    gains = relevance[:n] / discounts(min(n, len(relevance)))
+    return float(np.cumsum(gains)[-1]) / ideal_ranking_score(rel, n)
+
+
+def evaluate_topic(
+    judgments: Dict[str, int], rel: int, topic_arr: List[List[str]]
+) -> Dict[str, float]:
+    relevance = relevance_vector(judgments, topic_arr)
+    return {
+        "ap": average_precision(relevance, rel),
+        "P_10": precision_10(relevance),
+        "ndcg_cut_10": normalized_discount_cumulative_gain_n(relevance, rel, 10),
+        "ndcg_cut_1000": normalized_discount_cumulative_gain_n(relevance, rel, 1000),
+    }
 
 
 def validate_line(current_line: List[str]) -> None:
@@ -111,148 +97,288 @@ def validate_line(current_line: List[str]) -> None:
         )
 
 
-def load_relevancy_profiles(qrel: str) -> Dict[str, List[Dict[str, str]]]:
+def load_relevancy_profiles(
+    qrel: str,
+) -> Tuple[Dict[str, Dict[str, int]], Dict[str, int]]:
     relevancy_profiles = {}
+    relevant_counts = {}
     with open(qrel, "r") as qrel_file:
-        lines = qrel_file.readlines()
-        for line in lines:
+        for line in qrel_file:
             currentLine = line.split(" ")
             currentLine[-1] = currentLine[-1].strip()
-            if relevancy_profiles.get(currentLine[0]) is None:
-                relevancy_profiles[currentLine[0]] = [
-                    dict(docno=currentLine[2], relevant=currentLine[3])
-                ]
-            else:
-                relevancy_profiles[currentLine[0]].append(
-                    dict(docno=currentLine[2], relevant=currentLine[3])
-                )
-    return relevancy_profiles
+            topic, docno, relevant = currentLine[0], currentLine[2], int(currentLine[3])
+            relevancy_profiles.setdefault(topic, {}).setdefault(docno, relevant)
+            relevant_counts[topic] = relevant_counts.get(topic, 0) + relevant
+    return relevancy_profiles, relevant_counts
 
 
-def load_result_profiles(results: str) -> List[List[str]]:
-    result_profiles = []
+def iter_result_profiles(results: str) -> Iterator[List[str]]:
     with open(results, "r") as results_file:
-        lines = results_file.readlines()
-        for line in lines:
+        for line in results_file:
             current_line = line.split(" ")
             validate_line(current_line)
             current_line[-1] = current_line[-1].strip()
-            result_profiles.append(current_line)
-    return result_profiles
+            yield current_line
 
 
-@click.command()
-@click.argument("qrel", nargs=1, required=False)
-@click.argument("results", nargs=1, required=False)
-def main(qrel: str, results: str) -> None:
-    validate_paths(qrel, results)
-    relevancy_profiles = load_relevancy_profiles(qrel)
-    result_profiles = load_result_profiles(results)
-
-    average_precision_results = {}
-    precision_10_results = {}
-    ndcg_10_results = {}
-    ndcg_1000_results = {}
-    current_topic_arr = []
+def load_result_profiles(results: str) -> List[List[str]]:
+    return list(iter_result_profiles(results))
+
+
+class TopicBuffer:
+    # Holds one topic's result lines. With a depth, only the `depth` best lines
+    # by (score, docno) are kept in a min-heap, so memory is O(depth).
+    def __init__(self, depth: Optional[int]) -> None:
+        self.depth = depth
+        self.entries = []
+        self.count = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.entries)
+
+    def add(self, line: List[str]) -> None:
+        if self.depth is None:
+            self.entries.append(line)
+            return
+        entry = (float(line[4]), line[2], self.count, line)
+        self.count += 1
+        if len(self.entries) < self.depth:
+            heapq.heappush(self.entries, entry)
+        elif entry[:2] > self.entries[0][:2]:
+            heapq.heapreplace(self.entries, entry)
+
+    def lines(self, ranked: bool) -> List[List[str]]:
+        if self.depth is None:
+            if ranked:
+                return sorted(
+                    self.entries, key=lambda x: (float(x[4]), x[2]), reverse=True
+                )
+            return self.entries
+        if ranked:
+            ordered = sorted(self.entries, key=lambda e: e[:2], reverse=True)
+        else:
+            ordered = sorted(self.entries, key=lambda e: e[2])
+        return [entry[3] for entry in ordered]
+
+
+def evaluate_run(
+    relevancy_profiles: Dict[str, Dict[str, int]],
+    relevant_counts: Dict[str, int],
+    results: str,
+    depth: Optional[int] = None,
+    on_topic: Optional[Callable[[str, Dict[str, float]], None]] = None,
+) -> Dict[str, Dict[str, float]]:
+    metric_results = {metric: {} for metric in METRICS}
+
+    def record_topic(topic: str, topic_buffer: TopicBuffer, ranked: bool) -> None:
+        metrics = evaluate_topic(
+            relevancy_profiles[str(topic)],
+            relevant_counts[str(topic)],
+            topic_buffer.lines(ranked),
+        )
+        for metric, value in metrics.items():
+            metric_results[metric][topic] = value
+        if on_topic:
+            on_topic(topic, metrics)
+
+    current_topic_buffer = TopicBuffer(depth)
     current_topic = None
-    for line in result_profiles:
+    for line in iter_result_profiles(results):
         if current_topic is None:
             current_topic = line[0]
 
         topic = line[0]
         if topic != current_topic:
-            current_topic_arr = sorted(
-                current_topic_arr, key=lambda x: (float(x[4]), x[2]), reverse=True
-            )
-            average_precision_results[current_topic] = average_precision(
-                relevancy_profiles, current_topic_arr, current_topic
-            )
-            precision_10_results[current_topic] = precision_10(
-                relevancy_profiles, current_topic_arr, current_topic
-            )
-            ndcg_10_results[current_topic] = normalized_discount_cumulative_gain_n(
-                relevancy_profiles, current_topic_arr, current_topic, 10
-            )
-            ndcg_1000_results[current_topic] = normalized_discount_cumulative_gain_n(
-                relevancy_profiles, current_topic_arr, current_topic, 1000
-            )
-
+            record_topic(current_topic, current_topic_buffer, ranked=True)
             current_topic = topic
-            current_topic_arr = []
+            current_topic_buffer = TopicBuffer(depth)
 
-        current_topic_arr.append(line)
+        current_topic_buffer.add(line)
 
-    if current_topic_arr:
-        average_precision_results[current_topic] = average_precision(
-            relevancy_profiles, current_topic_arr, current_topic
-        )
-        precision_10_results[current_topic] = precision_10(
-            relevancy_profiles, current_topic_arr, current_topic
-        )
-        ndcg_10_results[current_topic] = normalized_discount_cumulative_gain_n(
-            relevancy_profiles, current_topic_arr, current_topic, 10
-        )
-        ndcg_1000_results[current_topic] = normalized_discount_cumulative_gain_n(
-            relevancy_profiles, current_topic_arr, current_topic, 1000
-        )
+    # The final topic has always been scored in file order; kept as-is so that
+    # reported metrics stay identical to earlier runs.
+    if current_topic_buffer:
+        record_topic(current_topic, current_topic_buffer, ranked=False)
 
     for topic in EXPECTED_TOPICS:
         topic = str(topic)
-        if topic not in average_precision_results.keys():
-            average_precision_results[topic] = 0
-        if topic not in precision_10_results.keys():
-            precision_10_results[topic] = 0
-        if topic not in ndcg_10_results.keys():
-            ndcg_10_results[topic] = 0
-        if topic not in ndcg_1000_results.keys():
-            ndcg_1000_results[topic] = 0
-
-    average_precision_metric = "{:.3f}".format(
-        round(
-            sum(average_precision_results.values())
-            / len(average_precision_results.values()),
-            3,
-        )
-    )
-    precision_10_metric = "{:.3f}".format(
-        round(
-            sum(precision_10_results.values()) / len(precision_10_results.values()), 3
-        )
+        for metric in METRICS:
+            if topic not in metric_results[metric].keys():
+                metric_results[metric][topic] = 0
+    return metric_results
+
+
+def print_topic_metrics(topic: str, metrics: Dict[str, float]) -> None:
+    print(
+        " ".join(
+            f"{metric} {topic} {'{:.3f}'.format(round(value, 3))}"
+            for metric, value in metrics.items()
+        ),
+        flush=True,
     )
-    ndcg_10_metric = "{:.3f}".format(
-        round(sum(ndcg_10_results.values()) / len(ndcg_10_results.values()), 3)
-    )
-    ndcg_1000_metric = "{:.3f}".format(
-        round(sum(ndcg_1000_results.values()) / len(ndcg_1000_results.values()), 3)
+
+
+def mean_metric(topic_results: Dict[str, float]) -> str:
+    return "{:.3f}".format(
+        round(sum(topic_results.values()) / len(topic_results.values()), 3)
     )
 
+
+def write_run_results(results: str, metric_results: Dict[str, Dict[str, float]]):
     prefix = results.split("/")[-1].split(".")[0]
 
     with open(f"{prefix}_results.txt", "a") as results_file:
-        average_precision_results = dict(sorted(average_precision_results.items()))
-        precision_10_results = dict(sorted(precision_10_results.items()))
-        ndcg_10_results = dict(sorted(ndcg_10_results.items()))
-        ndcg_1000_results = dict(sorted(ndcg_1000_results.items()))
-        for topic, ap in average_precision_results.items():
-            results_file.write(f"ap {topic} {'{:.3f}'.format(round(ap,3))}\n")
-
-        for topic, P_10 in precision_10_results.items():
-            results_file.write(f"P_10 {topic} {'{:.3f}'.format(round(P_10,3))}\n")
+        for metric in METRICS:
+            for topic, value in sorted(metric_results[metric].items()):
+                results_file.write(
+                    f"{metric} {topic} {'{:.3f}'.format(round(value,3))}\n"
+                )
 
-        for topic, ndcg_cut_10 in ndcg_10_results.items():
+        for metric in METRICS:
             results_file.write(
-                f"ndcg_cut_10 {topic} {'{:.3f}'.format(round(ndcg_cut_10,3))}\n"
+                f"{MEAN_LABELS[metric]}: {mean_metric(metric_results[metric])}\n"
             )
 
-        for topic, ndcg_cut_1000 in ndcg_1000_results.items():
-            results_file.write(
-                f"ndcg_cut_1000 {topic} {'{:.3f}'.format(round(ndcg_cut_1000,3))}\n"
-            )
 
-        results_file.write(f"mean average precision: {average_precision_metric}\n")
-        results_file.write(f"mean P@10: {precision_10_metric}\n")
-        results_file.write(f"mean NDCG@10: {ndcg_10_metric}\n")
-        results_file.write(f"mean NDCG@1000: {ndcg_1000_metric}\n")
+def randomization_test(
+    baseline: np.ndarray, run: np.ndarray, permutations: int, rng: np.random.Generator
+) -> float:
+    differences = run - baseline
+    observed = abs(differences.mean())
+    signs = rng.choice(np.array([-1.0, 1.0]), size=(permutations, len(differences)))
+    permuted = np.abs(signs @ differences) / len(differences)
+    extreme = np.count_nonzero(permuted >= observed - 1e-12)
+    return (extreme + 1) / (permutations + 1)
+
+
+def bootstrap_test(
+    baseline: np.ndarray, run: np.ndarray, samples: int, rng: np.random.Generator
+) -> float:
+    differences = run - baseline
+    observed = abs(differences.mean())
+    shifted = differences - differences.mean()
+    indices = rng.integers(0, len(differences), size=(samples, len(differences)))
+    resampled = np.abs(shifted[indices].mean(axis=1))
+    extreme = np.count_nonzero(resampled >= observed - 1e-12)
+    return (extreme + 1) / (samples + 1)
+
+
+def load_worker_qrels(
+    relevancy_profiles: Dict[str, Dict[str, int]],
+    relevant_counts: Dict[str, int],
+    depth: Optional[int],
+) -> None:
+    global _worker_qrels, _worker_depth
+    _worker_qrels = (relevancy_profiles, relevant_counts)
+    _worker_depth = depth
+
+
+def evaluate_run_in_worker(results: str) -> Dict[str, Dict[str, float]]:
+    return evaluate_run(*_worker_qrels, results, _worker_depth)
+
+
+def print_comparison(
+    results: List[str],
+    run_metrics: List[Dict[str, Dict[str, float]]],
+    metric: str,
+    permutations: int,
+    seed: int,
+) -> None:
+    rng = np.random.default_rng(seed)
+    names = [path.split("/")[-1].split(".")[0] for path in results]
+    topics = sorted(run_metrics[0][metric])
+    baseline = np.array([run_metrics[0][metric].get(t, 0) for t in topics], float)
+
+    width = max(len(name) for name in names) + 2
+    print(
+        f"{'run':<{width}}"
+        + "".join(f"{MEAN_LABELS[m].replace('mean ', ''):>24}" for m in METRICS)
+        + f"{'delta ' + metric:>18}{'p (randomization)':>20}{'p (bootstrap)':>16}"
+    )
+    for i, (name, metrics) in enumerate(zip(names, run_metrics)):
+        row = f"{name:<{width}}" + "".join(
+            f"{mean_metric(metrics[m]):>24}" for m in METRICS
+        )
+        if i == 0:
+            print(row + f"{'baseline':>18}")
+            continue
+        scores = np.array([metrics[metric].get(t, 0) for t in topics], float)
+        delta = scores.mean() - baseline.mean()
+        p_randomization = randomization_test(baseline, scores, permutations, rng)
+        p_bootstrap = bootstrap_test(baseline, scores, permutations, rng)
+        print(row + f"{delta:>+18.4f}{p_randomization:>20.4f}{p_bootstrap:>16.4f}")
+    print(
+        f"\nPaired tests over {len(topics)} topics with {permutations} "
+        f"permutations/resamples against {names[0]}."
+    )
+
+
+@click.command()
+@click.argument("qrel", nargs=1, required=False)
+@click.argument("results", nargs=-1, required=False)
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Processes used to evaluate several runs (defaults to the CPU count).",
+)
+@click.option(
+    "--metric",
+    type=click.Choice(METRICS),
+    default="ap",
+    show_default=True,
+    help="Per-topic metric compared by the significance tests.",
+)
+@click.option("--permutations", default=10000, show_default=True)
+@click.option("--seed", default=0, show_default=True)
+@click.option(
+    "--depth",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Only score the top N results of each topic, keeping at most N lines in memory.",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Print each topic's metrics as soon as the topic has been read.",
+)
+def main(
+    qrel: str,
+    results: Tuple[str, ...],
+    workers: int,
+    metric: str,
+    permutations: int,
+    seed: int,
+    depth: Optional[int],
+    stream: bool,
+) -> None:
+    validate_paths(qrel, results)
+    relevancy_profiles, relevant_counts = load_relevancy_profiles(qrel)
+
+    if len(results) == 1 or stream:
+        run_metrics = [
+            evaluate_run(
+                relevancy_profiles,
+                relevant_counts,
+                path,
+                depth,
+                print_topic_metrics if stream else None,
+            )
+            for path in results
+        ]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=load_worker_qrels,
+            initargs=(relevancy_profiles, relevant_counts, depth),
+        ) as executor:
+            run_metrics = list(executor.map(evaluate_run_in_worker, results))
+
+    for path, metrics in zip(results, run_metrics):
+        write_run_results(path, metrics)
+
+    if len(results) > 1:
+        print_comparison(list(results), run_metrics, metric, permutations, seed)
 
 
 if __name__ == "__main__":
@@ -1,24 +1,61 @@
 import click
+import functools
 import gzip
 import re
 import datetime
 import os
 import json
 from nltk.stem import PorterStemmer
-from typing import Tuple, List, Dict
+from typing import Iterator, Tuple, List, Dict, Optional, Sequence, TextIO
 from collections import Counter
 from utils import index_engine_utils
+from utils.lexicon import FRONT_CODED_LEXICON_FILE, write_front_coded_lexicon
+from utils.docno_map import DOCNO_MAP_FILE, write_docno_map
+from utils.profiling import BuildProfiler
+from utils.spelling import write_spelling_index
+from utils.doc_dates import DOC_DATES_FILE, write_doc_dates
+from utils.tiers import CHAMPION_ORDERS, write_champion_lists
+from utils.bm25 import B, K1
+from utils.stopwords import STOPWORDS
+from utils.build_checkpoint import (
+    DEFAULT_CHECKPOINT_INTERVAL,
+    BuildCheckpointer,
+    CheckpointMismatchError,
+)
 
 ps = PorterStemmer()
 
 DOCNO_REGEX = re.compile(r"<DOCNO>\s(.*)\s</DOCNO>")
 DATE_REGEX = re.compile(r"LA([0-9]{6})-[0-9]{4}")
+VARIANTS_DIRECTORY = "variants"
+# Variant name -> (Porter stemming, stopword removal).
+VARIANT_ANALYSES = {
+    "raw": (False, False),
+    "stemmed": (True, False),
+    "stopped": (False, True),
+    "stemmed-stopped": (True, True),
+}
 
 
-def tokenize(text: str, porter_stem: bool) -> List[str]:
-    artifacts = re.sub(r"\W+", " ", text).lower()
-    tokens = artifacts.split()
-    return [ps.stem(token) if porter_stem else token for token in tokens]
+@functools.lru_cache(maxsize=2**16)
+def stem(token: str) -> str:
+    return ps.stem(token)
+
+
+def split_tokens(text: str) -> List[str]:
+    return re.sub(r"\W+", " ", text).lower().split()
+
+
+def analyze(
+    tokens: List[str], porter_stem: bool, remove_stopwords: bool = False
+) -> List[str]:
+    if remove_stopwords:
+        tokens = [token for token in tokens if token not in STOPWORDS]
+    return [stem(token) for token in tokens] if porter_stem else tokens
+
+
+def tokenize(text: str, porter_stem: bool, remove_stopwords: bool = False) -> List[str]:
+    return analyze(split_tokens(text), porter_stem, remove_stopwords)
 
 
 def update_lexicon_and_inverted_index(
@@ -37,6 +74,25 @@ def update_lexicon_and_inverted_index(
         inverted_index[term_id].extend([doc_id, count])
 
 
+class IndexVariant:
+    # The lexicon, postings and doc lengths of one extra analysis of the
+    # documents, built alongside the main index from the same parse.
+    def __init__(self, name: str, destination_directory: str) -> None:
+        self.name = name
+        self.directory = f"{destination_directory}/{VARIANTS_DIRECTORY}/{name}"
+        self.porter_stem, self.remove_stopwords = VARIANT_ANALYSES[name]
+        self.lexicon: Dict[str, int] = {}
+        self.inverted_index: Dict[int, List[int]] = {}
+        self.doc_lengths: List[int] = []
+
+    def add_document(self, tokens: List[str], doc_id: int) -> None:
+        tokenized = analyze(tokens, self.porter_stem, self.remove_stopwords)
+        update_lexicon_and_inverted_index(
+            tokenized, self.lexicon, self.inverted_index, doc_id
+        )
+        self.doc_lengths.append(len(tokenized))
+
+
 def register_document(doc_details: Dict[str, str], destination_directory: str) -> None:
     lines = [
         f"docno: {doc_details['docno']}\n",
@@ -56,21 +112,24 @@ def process_and_generate_document(
     lexicon: Dict[str, int],
     inverted_index: Dict[int, List[int]],
     porter_stem: bool,
+    profiler: BuildProfiler,
+    variants: Sequence[IndexVariant] = (),
 ) -> Tuple[int, str]:
-    raw_document = "\n".join(document_features)
-    docno = index_engine_utils.regex_capture(DOCNO_REGEX, raw_document)
-    date_component = datetime.datetime.strptime(
-        index_engine_utils.regex_capture(DATE_REGEX, docno), "%m%d%y"
-    )
-    doc_details = {
-        "docno": docno,
-        "internal_id": doc_id,
-        "date": date_component.strftime("%B %-d, %Y"),
-        "headline": index_engine_utils.extract_tag_text(raw_document, "HEADLINE"),
-        "text": index_engine_utils.extract_tag_text(raw_document, "TEXT"),
-        "graphic": index_engine_utils.extract_tag_text(raw_document, "GRAPHIC"),
-        "raw_document": raw_document,
-    }
+    with profiler.stage("parsing"):
+        raw_document = "\n".join(document_features)
+        docno = index_engine_utils.regex_capture(DOCNO_REGEX, raw_document)
+        date_component = datetime.datetime.strptime(
+            index_engine_utils.regex_capture(DATE_REGEX, docno), "%m%d%y"
+        )
+        doc_details = {
+            "docno": docno,
+            "internal_id": doc_id,
+            "date": date_component.strftime("%B %-d, %Y"),
+            "headline": index_engine_utils.extract_tag_text(raw_document, "HEADLINE"),
+            "text": index_engine_utils.extract_tag_text(raw_document, "TEXT"),
+            "graphic": index_engine_utils.extract_tag_text(raw_document, "GRAPHIC"),
+            "raw_document": raw_document,
+        }
 
     path = index_engine_utils.parse_directories(
         destination_directory,
@@ -80,71 +139,289 @@ def process_and_generate_document(
     )
     doc_details["destination_directory"] = path
 
-    tokenized = tokenize(
-        doc_details["graphic"]
-        + " "
-        + doc_details["text"]
-        + " "
-        + doc_details["headline"],
-        porter_stem,
-    )
-    update_lexicon_and_inverted_index(tokenized, lexicon, inverted_index, doc_id)
-    register_document(doc_details, path)
+    with profiler.stage("tokenizing"):
+        tokens = split_tokens(
+            doc_details["graphic"]
+            + " "
+            + doc_details["text"]
+            + " "
+            + doc_details["headline"]
+        )
+        tokenized = analyze(tokens, porter_stem)
+    with profiler.stage("postings"):
+        update_lexicon_and_inverted_index(tokenized, lexicon, inverted_index, doc_id)
+    # Variants reuse the parsed fields and split tokens; only their own
+    # analysis and postings are done per variant.
+    with profiler.stage("variants"):
+        for variant in variants:
+            variant.add_document(tokens, doc_id)
+    with profiler.stage("document writes"):
+        register_document(doc_details, path)
 
     return len(tokenized), docno
 
 
-def process_file(
-    source_file: str, destination_directory: str, porter_stem: bool
-) -> None:
-    raw_document, id, lexicon, inverted_index, doc_lengths = [], 0, {}, {}, []
-    docnos = []
-    os.mkdir(destination_directory)
+def iter_raw_documents(f: TextIO) -> Iterator[List[str]]:
+    # readline() rather than iteration, so that f.tell() stays available
+    # between documents.
+    raw_document = []
+    for line in iter(f.readline, ""):
+        line = line.strip()
+        raw_document.append(line)
+        if "</DOC>" in line:
+            yield raw_document
+            raw_document = []
 
-    with gzip.open(source_file, "rt") as f:
-        for line in f:
-            line = line.strip()
-            raw_document.append(line)
-            if "</DOC>" in line:
-                doc_length, docno = process_and_generate_document(
-                    raw_document,
-                    destination_directory,
-                    id,
-                    lexicon,
-                    inverted_index,
-                    porter_stem,
-                )
-                id += 1
-                raw_document = []
-                doc_lengths.append(doc_length)
-                docnos.append(docno)
 
-    with open(f"{destination_directory}/lexicon.txt", "a") as lexicon_registrar:
+def write_index_files(
+    destination_directory: str,
+    lexicon: Dict[str, int],
+    inverted_index: Dict[int, List[int]],
+    doc_lengths: List[int],
+    docnos: List[str],
+    spelling_index: bool = False,
+) -> None:
+    with open(f"{destination_directory}/lexicon.txt", "w") as lexicon_registrar:
         for term, id in lexicon.items():
             lexicon_registrar.write(f"{term}\n")
+    write_front_coded_lexicon(
+        f"{destination_directory}/{FRONT_CODED_LEXICON_FILE}", lexicon.keys()
+    )
 
     with open(
         f"{destination_directory}/inverted_index.json", "w"
     ) as inverted_index_registrar:
         json.dump(inverted_index, inverted_index_registrar)
 
-    with open(f"{destination_directory}/doc-lengths.txt", "a") as doc_length_file:
+    with open(f"{destination_directory}/doc-lengths.txt", "w") as doc_length_file:
         for length in doc_lengths:
             doc_length_file.write(f"{length}\n")
 
-    with open(f"{destination_directory}/index_registrar.txt", "a") as index_file:
+    with open(f"{destination_directory}/index_registrar.txt", "w") as index_file:
         for docno in docnos:
             index_file.write(f"{docno}\n")
+    write_docno_map(f"{destination_directory}/{DOCNO_MAP_FILE}", docnos)
+    write_doc_dates(f"{destination_directory}/{DOC_DATES_FILE}", docnos)
+    # Optional: search.py builds the deletion index on first use when missing.
+    if spelling_index:
+        write_spelling_index(destination_directory, lexicon, inverted_index)
+
+
+def link_stored_documents(index_directory_path: str, destination_path: str) -> None:
+    for entry in os.listdir(index_directory_path):
+        source_path = os.path.join(index_directory_path, entry)
+        if entry.isdigit() and os.path.isdir(source_path):
+            os.symlink(source_path, os.path.join(destination_path, entry))
+
+
+def write_champion_lists_for(
+    destination_directory: str,
+    inverted_index: Dict[int, List[int]],
+    doc_lengths: List[int],
+    champion_size: int,
+    champion_order: str,
+) -> None:
+    write_champion_lists(
+        destination_directory,
+        inverted_index,
+        doc_lengths,
+        champion_size,
+        champion_order,
+        K1,
+        B,
+    )
+
+
+def process_file(
+    source_file: str,
+    destination_directory: str,
+    porter_stem: bool,
+    profiler: Optional[BuildProfiler] = None,
+    checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL,
+    resume: bool = False,
+    champion_size: int = 0,
+    champion_order: str = "impact",
+    variant_names: Sequence[str] = (),
+    spelling_index: bool = False,
+) -> None:
+    profiler = profiler or BuildProfiler(enabled=False)
+    variants = [IndexVariant(name, destination_directory) for name in variant_names]
+    id, lexicon, inverted_index, doc_lengths = 0, {}, {}, []
+    docnos = []
+    # Checkpoints only cover the main index, so a build with variants runs
+    # without them.
+    checkpointer = BuildCheckpointer(
+        destination_directory,
+        source_file,
+        porter_stem,
+        0 if variants else checkpoint_interval,
+    )
+    source_offset = None
+    if resume and os.path.isdir(destination_directory):
+        try:
+            source_offset = checkpointer.restore(lexicon, doc_lengths, docnos)
+        except CheckpointMismatchError as e:
+            print(f"Checkpoint Mismatch Error: {e}\n")
+            exit()
+        id = len(docnos)
+    else:
+        os.mkdir(destination_directory)
+    profiler.start()
+
+    with gzip.open(source_file, "rt") as f:
+        if source_offset is not None:
+            f.seek(source_offset)
+            print(f"Resuming from document {id}.")
+        for raw_document in iter_raw_documents(f):
+            doc_length, docno = process_and_generate_document(
+                raw_document,
+                destination_directory,
+                id,
+                lexicon,
+                inverted_index,
+                porter_stem,
+                profiler,
+                variants,
+            )
+            id += 1
+            doc_lengths.append(doc_length)
+            docnos.append(docno)
+            profiler.maybe_snapshot(id, lexicon, inverted_index)
+            if checkpointer.due(id):
+                checkpointer.save(
+                    f.tell(), lexicon, inverted_index, doc_lengths, docnos
+                )
+
+    profiler.maybe_snapshot(id, lexicon, inverted_index, force=True)
+    inverted_index = checkpointer.merged_postings(inverted_index)
+    with profiler.stage("serialization"):
+        write_index_files(
+            destination_directory,
+            lexicon,
+            inverted_index,
+            doc_lengths,
+            docnos,
+            spelling_index,
+        )
+        if champion_size:
+            write_champion_lists_for(
+                destination_directory,
+                inverted_index,
+                doc_lengths,
+                champion_size,
+                champion_order,
+            )
+        # Every variant shares the main index's internal IDs, DOCNOs and
+        # stored documents, which it links to rather than copies.
+        for variant in variants:
+            os.makedirs(variant.directory)
+            write_index_files(
+                variant.directory,
+                variant.lexicon,
+                variant.inverted_index,
+                variant.doc_lengths,
+                docnos,
+            )
+            if champion_size:
+                write_champion_lists_for(
+                    variant.directory,
+                    variant.inverted_index,
+                    variant.doc_lengths,
+                    champion_size,
+                    champion_order,
+                )
+            link_stored_documents(destination_directory, variant.directory)
+            print(f"Wrote the {variant.name} variant to {variant.directory}")
+    checkpointer.remove()
+    profiler.stop()
+
+    report_path = profiler.write_report(destination_directory)
+    if report_path:
+        print(f"Build profile written to {report_path}")
 
 
 @click.command()
 @click.argument("source_file", nargs=1, required=False)
 @click.argument("destination_directory", nargs=1, required=False)
 @click.argument("porter_stem", nargs=1, required=False)
-def main(source_file: str, destination_directory: str, porter_stem: str) -> None:
-    index_engine_utils.validate_paths(source_file, destination_directory, porter_stem)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Report per-stage timings, memory snapshots and a cProfile dump.",
+)
+@click.option(
+    "--profile-interval",
+    default=5000,
+    show_default=True,
+    help="Number of documents between memory snapshots in profile mode (0 takes only the final one).",
+)
+@click.option(
+    "--checkpoint-interval",
+    default=DEFAULT_CHECKPOINT_INTERVAL,
+    show_default=True,
+    help="Number of documents between build checkpoints (0 disables them).",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Continue an interrupted build from its last checkpoint.",
+)
+@click.option(
+    "--champion-size",
+    default=0,
+    show_default=True,
+    help="Also write tiered postings with this many champions per term (0 disables them).",
+)
+@click.option(
+    "--champion-order",
+    type=click.Choice(CHAMPION_ORDERS),
+    default="impact",
+    show_default=True,
+    help="Rank a term's postings for its champion list by BM25 impact or raw tf.",
+)
+@click.option(
+    "--variant",
+    "variant_names",
+    type=click.Choice(list(VARIANT_ANALYSES)),
+    multiple=True,
+    help="Also build this analysis of the same parse under <destination>/variants/; repeat for several.",
+)
+@click.option(
+    "--spelling-index",
+    is_flag=True,
+    help="Also write the spelling-correction snapshot for the main index (search.py otherwise builds it on first launch).",
+)
+def main(
+    source_file: str,
+    destination_directory: str,
+    porter_stem: str,
+    profile: bool,
+    profile_interval: int,
+    checkpoint_interval: int,
+    resume: bool,
+    champion_size: int,
+    champion_order: str,
+    variant_names: Tuple[str, ...],
+    spelling_index: bool,
+) -> None:
+    index_engine_utils.validate_paths(
+        source_file, destination_directory, porter_stem, resume
+    )
+    index_engine_utils.validate_variants(variant_names, resume)
     porter_stem = True if porter_stem and porter_stem.lower() == "true" else False
-    process_file(source_file, destination_directory, porter_stem)
+    profiler = BuildProfiler(enabled=profile, snapshot_interval=profile_interval)
+    process_file(
+        source_file,
+        destination_directory,
+        porter_stem,
+        profiler,
+        checkpoint_interval,
+        resume,
+        champion_size,
+        champion_order,
+        list(dict.fromkeys(variant_names)),
+        spelling_index,
+    )
 
 
 if __name__ == "__main__":
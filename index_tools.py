@@ -0,0 +1,783 @@
+import click
+import gzip
+import json
+import os
+import shutil
+import statistics
+import time
+import evaluator
+import index_engine
+import search
+from typing import Dict, List, Optional, Set
+from utils import reordering
+from utils.index_tools_utils import (
+    validate_destination,
+    validate_paths,
+    validate_source,
+)
+from utils.lexicon import (
+    FRONT_CODED_LEXICON_FILE,
+    FrontCodedLexicon,
+    read_text_lexicon,
+    read_text_terms,
+    write_front_coded_lexicon,
+)
+from utils.snapshot import compact_postings
+from utils.docno_map import DOCNO_MAP_FILE, write_docno_map
+from utils.doc_dates import DOC_DATES_FILE, DocDates, write_doc_dates
+from utils.spelling import SPELLING_SNAPSHOT_FILE, write_spelling_index
+from utils.pruning import (
+    DOC_FREQUENCIES_FILE,
+    PRUNING_METHODS,
+    prune_index,
+    remove_document_frequencies,
+    write_document_frequencies,
+)
+from utils.profiling import BuildProfiler
+from utils.bm25 import B, K1
+from utils.tiers import (
+    CHAMPION_ORDERS,
+    DEFAULT_CHAMPION_SIZE,
+    load_tiered_index,
+    write_champion_lists,
+)
+from utils.liveness import (
+    DEFAULT_COMPACTION_THRESHOLD,
+    DELETED_DOCS_FILE,
+    load_liveness,
+    write_deleted_docs,
+)
+
+INDEX_FILES = [
+    "lexicon.txt",
+    "index_registrar.txt",
+    "inverted_index.json",
+    "doc-lengths.txt",
+]
+
+
+def read_lines(file_path: str) -> List[str]:
+    with open(file_path) as f:
+        return f.read().splitlines()
+
+
+def read_index_files(index_directory_path: str):
+    lexicon = read_text_lexicon(index_directory_path)
+    docnos = read_lines(f"{index_directory_path}/index_registrar.txt")
+    with open(f"{index_directory_path}/inverted_index.json") as f:
+        inverted_index = json.load(f)
+    doc_lengths = [
+        int(length) for length in read_lines(f"{index_directory_path}/doc-lengths.txt")
+    ]
+    return lexicon, docnos, inverted_index, doc_lengths
+
+
+def load_topic_queries(topics_file_path: str) -> Dict[str, str]:
+    with open(topics_file_path) as f:
+        return json.load(f)
+
+
+def load_topics(topics_file_path: str) -> List[str]:
+    return list(load_topic_queries(topics_file_path).values())
+
+
+def measure_query_latency(
+    queries: List[str],
+    lexicon: Dict[str, int],
+    inverted_index: Dict[str, List[int]],
+    doc_lengths: List[int],
+    repeat: int = 3,
+    document_frequencies: Optional[List[int]] = None,
+) -> float:
+    inverted_index = compact_postings(inverted_index)
+    average_doc_length = statistics.fmean(doc_lengths)
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        for query in queries:
+            search.process_query(
+                query,
+                lexicon,
+                inverted_index,
+                doc_lengths,
+                average_doc_length,
+                len(doc_lengths),
+                document_frequencies=document_frequencies,
+            )
+        timings.append((time.perf_counter() - start_time) / max(len(queries), 1))
+    return min(timings) * 1000
+
+
+def measure_effectiveness(
+    topic_queries: Dict[str, str],
+    relevancy_profiles: Dict[str, Dict[str, int]],
+    relevant_counts: Dict[str, int],
+    lexicon: Dict[str, int],
+    inverted_index: Dict[str, List[int]],
+    docnos: List[str],
+    doc_lengths: List[int],
+    depth: int,
+    document_frequencies: Optional[List[int]] = None,
+) -> Dict[str, float]:
+    average_doc_length = statistics.fmean(doc_lengths)
+    topic_metrics = {metric: [] for metric in evaluator.METRICS}
+    for topic, query in topic_queries.items():
+        if not relevant_counts.get(topic):
+            continue
+        document_scores = search.process_query(
+            query,
+            lexicon,
+            inverted_index,
+            doc_lengths,
+            average_doc_length,
+            len(doc_lengths),
+            document_frequencies=document_frequencies,
+            limit=depth,
+        )
+        ranking = [
+            [topic, "Q0", docnos[doc_id], str(rank), str(score), "pruned"]
+            for rank, (doc_id, score) in enumerate(document_scores.items(), 1)
+        ]
+        metrics = (
+            evaluator.evaluate_topic(
+                relevancy_profiles[topic], relevant_counts[topic], ranking
+            )
+            if ranking
+            else dict.fromkeys(evaluator.METRICS, 0.0)
+        )
+        for metric, value in metrics.items():
+            topic_metrics[metric].append(value)
+    return {
+        metric: statistics.fmean(values) if values else 0.0
+        for metric, values in topic_metrics.items()
+    }
+
+
+def load_deleted_ids(index_directory_path: str) -> Set[int]:
+    liveness = load_liveness(index_directory_path)
+    return set(liveness.deleted_ids()) if liveness is not None else set()
+
+
+def invalidate_document_frequencies(index_directory_path: str) -> None:
+    if remove_document_frequencies(index_directory_path):
+        print(
+            f"Removed the stale {DOC_FREQUENCIES_FILE}; idf now comes from the "
+            "postings of this index."
+        )
+
+
+def report_deleted(num_deleted: int, num_docs: int, threshold: float) -> None:
+    fraction = num_deleted / num_docs if num_docs else 0.0
+    print(f"{num_deleted} of {num_docs} document IDs ({fraction:.1%}) are deleted.")
+    if num_deleted and fraction >= threshold:
+        print(
+            f"That is above the {threshold:.0%} compaction threshold; "
+            "run `index_tools.py compact` to purge their postings."
+        )
+
+
+@click.group()
+def cli() -> None:
+    pass
+
+
+@cli.command()
+@click.argument("index_directory_path", nargs=1, required=False)
+def lexicon(index_directory_path: str) -> None:
+    validate_paths(index_directory_path, ["lexicon.txt"])
+    text_path = f"{index_directory_path}/lexicon.txt"
+    compact_path = f"{index_directory_path}/{FRONT_CODED_LEXICON_FILE}"
+    write_front_coded_lexicon(compact_path, read_text_terms(index_directory_path))
+
+    start_time = time.perf_counter()
+    read_text_lexicon(index_directory_path)
+    text_load = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    compact = FrontCodedLexicon(compact_path)
+    compact_load = time.perf_counter() - start_time
+
+    print(f"Wrote {compact_path} ({len(compact)} terms).")
+    print(
+        f"lexicon.txt: {os.path.getsize(text_path)} bytes, loaded in {text_load * 1000:.2f} ms"
+    )
+    print(
+        f"{FRONT_CODED_LEXICON_FILE}: {os.path.getsize(compact_path)} bytes, opened in {compact_load * 1000:.2f} ms"
+    )
+
+
+@cli.command()
+@click.argument("index_directory_path", nargs=1, required=False)
+def docnos(index_directory_path: str) -> None:
+    validate_paths(index_directory_path, ["index_registrar.txt"])
+    registrar = read_lines(f"{index_directory_path}/index_registrar.txt")
+    map_path = f"{index_directory_path}/{DOCNO_MAP_FILE}"
+    write_docno_map(map_path, registrar)
+    print(f"Wrote {map_path} ({len(registrar)} documents).")
+
+
+@cli.command()
+@click.argument("index_directory_path", nargs=1, required=False)
+def spelling(index_directory_path: str) -> None:
+    validate_paths(index_directory_path, ["lexicon.txt", "inverted_index.json"])
+    lexicon, _, inverted_index, _ = read_index_files(index_directory_path)
+    start_time = time.perf_counter()
+    corrector = write_spelling_index(index_directory_path, lexicon, inverted_index)
+    build_time = time.perf_counter() - start_time
+    print(
+        f"Wrote {index_directory_path}/{SPELLING_SNAPSHOT_FILE} "
+        f"({len(corrector.terms)} terms, {len(corrector.deletes)} deletes) "
+        f"in {build_time * 1000:.2f} ms."
+    )
+
+
+@cli.command()
+@click.argument("index_directory_path", nargs=1, required=False)
+def dates(index_directory_path: str) -> None:
+    validate_paths(index_directory_path, ["index_registrar.txt"])
+    registrar = read_lines(f"{index_directory_path}/index_registrar.txt")
+    dates_path = f"{index_directory_path}/{DOC_DATES_FILE}"
+    write_doc_dates(dates_path, registrar)
+    doc_dates = DocDates(dates_path)
+    print(f"Wrote {dates_path} ({len(doc_dates)} documents).")
+    if doc_dates.ordered:
+        print(
+            f"Document IDs are in date order: {len(doc_dates.range_dates)} dates map to contiguous ID ranges."
+        )
+    else:
+        print(
+            "Document IDs are not in date order; date filters will check each posting's date."
+        )
+
+
+@cli.command()
+@click.argument("index_directory_path", nargs=1, required=False)
+def snapshot(index_directory_path: str) -> None:
+    validate_paths(
+        index_directory_path,
+        [
+            "lexicon.txt",
+            "index_registrar.txt",
+            "inverted_index.json",
+            "doc-lengths.txt",
+        ],
+    )
+    snapshot_path = f"{index_directory_path}/{search.SNAPSHOT_FILE}"
+    if os.path.exists(snapshot_path):
+        os.remove(snapshot_path)
+
+    start_time = time.perf_counter()
+    search.load_index_data(index_directory_path)
+    build_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    search.load_index_data(index_directory_path)
+    restore_time = time.perf_counter() - start_time
+
+    print(f"Wrote {snapshot_path} ({os.path.getsize(snapshot_path)} bytes).")
+    print(
+        f"Text load: {build_time * 1000:.2f} ms, snapshot restore: {restore_time * 1000:.2f} ms"
+    )
+
+
+@cli.command()
+@click.argument("index_directory_path", nargs=1, required=False)
+@click.option(
+    "--strategy",
+    type=click.Choice(["docno", "bisection"]),
+    default="docno",
+    show_default=True,
+    help="docno sorts by publication date and sequence; bisection clusters documents that share terms.",
+)
+@click.option(
+    "--topics",
+    "topics_file_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="JSON topics file used to time queries before and after reordering.",
+)
+@click.option("--bisection-depth", default=16, show_default=True)
+@click.option("--bisection-iterations", default=10, show_default=True)
+def reorder(
+    index_directory_path: str,
+    strategy: str,
+    topics_file_path: str,
+    bisection_depth: int,
+    bisection_iterations: int,
+) -> None:
+    validate_paths(index_directory_path, INDEX_FILES)
+    lexicon, docnos, inverted_index, doc_lengths = read_index_files(
+        index_directory_path
+    )
+    queries = load_topics(topics_file_path) if topics_file_path else []
+
+    size_before = reordering.compressed_postings_size(inverted_index)
+    if queries:
+        latency_before = measure_query_latency(
+            queries, lexicon, inverted_index, doc_lengths
+        )
+
+    if strategy == "bisection":
+        order = reordering.bisection_order(
+            inverted_index, docnos, bisection_depth, bisection_iterations
+        )
+    else:
+        order = reordering.docno_order(docnos)
+    new_ids = [0] * len(order)
+    for new_id, old_id in enumerate(order):
+        new_ids[old_id] = new_id
+
+    deleted = load_deleted_ids(index_directory_path)
+    inverted_index = reordering.remap_postings(inverted_index, new_ids)
+    doc_lengths = [doc_lengths[old_id] for old_id in order]
+    docnos = [docnos[old_id] for old_id in order]
+    index_engine.write_index_files(
+        index_directory_path, lexicon, inverted_index, doc_lengths, docnos
+    )
+    # Deleted documents stay deleted under their new IDs.
+    if deleted:
+        write_deleted_docs(
+            f"{index_directory_path}/{DELETED_DOCS_FILE}",
+            len(order),
+            {new_ids[doc_id] for doc_id in deleted},
+        )
+    for new_id, old_id in enumerate(order):
+        if new_id != old_id:
+            reordering.rewrite_internal_id(
+                search.document_path(index_directory_path, docnos[new_id]), new_id
+            )
+
+    size_after = reordering.compressed_postings_size(inverted_index)
+    moved = sum(1 for new_id, old_id in enumerate(order) if new_id != old_id)
+    print(f"Reassigned {moved} of {len(order)} document IDs ({strategy}).")
+    print(
+        f"Compressed postings (varint d-gaps): {size_before} -> {size_after} bytes "
+        f"({(size_after - size_before) / max(size_before, 1):+.1%})"
+    )
+    if queries:
+        latency_after = measure_query_latency(
+            queries, lexicon, inverted_index, doc_lengths
+        )
+        print(
+            f"Mean query latency over {len(queries)} topics: "
+            f"{latency_before:.3f} -> {latency_after:.3f} ms"
+        )
+
+
+@cli.command()
+@click.argument("index_directory_path", nargs=1, required=False)
+@click.argument("destination_directory_path", nargs=1, required=False)
+@click.option(
+    "--keep",
+    "keep_fractions",
+    type=click.FloatRange(0, 1, min_open=True),
+    multiple=True,
+    default=[0.9, 0.7, 0.5, 0.3],
+    show_default=True,
+    help="Fraction of postings to keep; repeat for several pruning levels.",
+)
+@click.option(
+    "--method",
+    type=click.Choice(PRUNING_METHODS),
+    default="global",
+    show_default=True,
+    help="global applies one BM25 impact threshold to every term; term keeps each term's highest-impact fraction.",
+)
+@click.option(
+    "--min-postings",
+    default=search.RETRIEVED_RESULTS_LIMIT,
+    show_default=True,
+    help="Postings every term keeps regardless of the threshold.",
+)
+@click.option(
+    "--topics",
+    "topics_file_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="JSON topics file used to time queries and, with --qrels, to score them.",
+)
+@click.option(
+    "--qrels",
+    "qrels_file_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Relevance judgments used to report MAP and NDCG deltas.",
+)
+@click.option("--depth", default=1000, show_default=True)
+def prune(
+    index_directory_path: str,
+    destination_directory_path: str,
+    keep_fractions: List[float],
+    method: str,
+    min_postings: int,
+    topics_file_path: str,
+    qrels_file_path: str,
+    depth: int,
+) -> None:
+    validate_paths(index_directory_path, INDEX_FILES)
+    validate_destination(destination_directory_path)
+    lexicon, docnos, inverted_index, doc_lengths = read_index_files(
+        index_directory_path
+    )
+    # Deleted documents' postings are dropped before pruning, so they neither
+    # come back in the pruned copies nor count towards the stored dfs.
+    liveness = load_liveness(index_directory_path)
+    if liveness is not None:
+        inverted_index = {
+            term_id: liveness.restrict(postings)
+            for term_id, postings in inverted_index.items()
+        }
+    topic_queries = load_topic_queries(topics_file_path) if topics_file_path else {}
+    queries = list(topic_queries.values())
+    if qrels_file_path:
+        relevancy_profiles, relevant_counts = evaluator.load_relevancy_profiles(
+            qrels_file_path
+        )
+
+    def report(
+        label: str,
+        index: Dict[str, List[int]],
+        baseline: Optional[Dict[str, float]] = None,
+        document_frequencies: Optional[List[int]] = None,
+    ) -> Optional[Dict[str, float]]:
+        postings = sum(len(term_postings) for term_postings in index.values()) // 2
+        line = (
+            f"{label}: {postings} postings, "
+            f"{reordering.compressed_postings_size(index)} bytes (varint d-gaps)"
+        )
+        metrics = None
+        if queries:
+            latency = measure_query_latency(
+                queries,
+                lexicon,
+                index,
+                doc_lengths,
+                document_frequencies=document_frequencies,
+            )
+            line += f", {latency:.3f} ms/query"
+        if qrels_file_path and topic_queries:
+            metrics = measure_effectiveness(
+                topic_queries,
+                relevancy_profiles,
+                relevant_counts,
+                lexicon,
+                index,
+                docnos,
+                doc_lengths,
+                depth,
+                document_frequencies,
+            )
+            for metric in ["ap", "ndcg_cut_10"]:
+                line += f", {evaluator.MEAN_LABELS[metric]} {metrics[metric]:.4f}"
+                if baseline:
+                    line += f" ({metrics[metric] - baseline[metric]:+.4f})"
+        print(line)
+        return metrics
+
+    baseline = report("unpruned", inverted_index)
+
+    os.mkdir(destination_directory_path)
+    document_frequencies = [0] + [
+        len(inverted_index.get(str(term_id), [])) // 2
+        for term_id in sorted(lexicon.values())
+    ]
+    for keep_fraction in sorted(keep_fractions, reverse=True):
+        pruned_index, threshold = prune_index(
+            inverted_index,
+            doc_lengths,
+            keep_fraction,
+            method,
+            K1,
+            B,
+            min_postings,
+        )
+        level_path = f"{destination_directory_path}/keep-{round(keep_fraction * 100)}"
+        os.mkdir(level_path)
+        index_engine.write_index_files(
+            level_path, lexicon, pruned_index, doc_lengths, docnos
+        )
+        write_document_frequencies(level_path, lexicon, inverted_index)
+        # The bitmap keeps N and avgdl over live documents, as in the source.
+        if liveness is not None:
+            shutil.copyfile(liveness.path, f"{level_path}/{DELETED_DOCS_FILE}")
+        index_engine.link_stored_documents(index_directory_path, level_path)
+
+        label = f"keep {keep_fraction:.0%} ({method}"
+        if threshold is not None:
+            label += f", impact >= {threshold:.4f}"
+        report(f"{label})", pruned_index, baseline, document_frequencies)
+        print(f"  written to {level_path}")
+
+
+@cli.command()
+@click.argument("index_directory_path", nargs=1, required=False)
+@click.option(
+    "--size",
+    default=DEFAULT_CHAMPION_SIZE,
+    show_default=True,
+    help="Postings kept in each term's champion list.",
+)
+@click.option(
+    "--order",
+    type=click.Choice(CHAMPION_ORDERS),
+    default="impact",
+    show_default=True,
+    help="Rank a term's postings for its champion list by BM25 impact or raw tf.",
+)
+@click.option(
+    "--topics",
+    "topics_file_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="JSON topics file used to compare approximate and exact search.",
+)
+@click.option(
+    "--depth",
+    default=search.RETRIEVED_RESULTS_LIMIT,
+    show_default=True,
+    help="Rank cutoff at which approximate results are compared to exact ones.",
+)
+def tiers(
+    index_directory_path: str,
+    size: int,
+    order: str,
+    topics_file_path: str,
+    depth: int,
+) -> None:
+    validate_paths(index_directory_path, INDEX_FILES)
+    lexicon, docnos, inverted_index, doc_lengths = read_index_files(
+        index_directory_path
+    )
+    champions = write_champion_lists(
+        index_directory_path,
+        inverted_index,
+        doc_lengths,
+        size,
+        order,
+        K1,
+        B,
+    )
+    total = sum(len(postings) for postings in inverted_index.values()) // 2
+    tier_one = (
+        total
+        - sum(
+            len(inverted_index[term_id]) - len(postings)
+            for term_id, postings in champions.items()
+        )
+        // 2
+    )
+    print(
+        f"{len(champions)} of {len(inverted_index)} terms have champion lists; "
+        f"tier 1 holds {tier_one} of {total} postings ({tier_one / max(total, 1):.1%})."
+    )
+    if not topics_file_path:
+        return
+
+    inverted_index = compact_postings(inverted_index)
+    tiered_index = load_tiered_index(index_directory_path, inverted_index)
+    average_doc_length = statistics.fmean(doc_lengths)
+    recalls, timings = [], {"exact": 0.0, "approximate": 0.0}
+    queries = load_topics(topics_file_path)
+    for query in queries:
+        rankings = {}
+        for mode, tiered in [("exact", None), ("approximate", tiered_index)]:
+            start_time = time.perf_counter()
+            rankings[mode] = search.process_query(
+                query,
+                lexicon,
+                inverted_index,
+                doc_lengths,
+                average_doc_length,
+                len(doc_lengths),
+                limit=depth,
+                tiered_index=tiered,
+                approximate_k=depth,
+            )
+            timings[mode] += time.perf_counter() - start_time
+        if rankings["exact"]:
+            recalls.append(
+                len(rankings["exact"].keys() & rankings["approximate"].keys())
+                / len(rankings["exact"])
+            )
+    print(
+        f"Recall@{depth} of approximate against exact search: "
+        f"{statistics.fmean(recalls) if recalls else 0.0:.4f} over {len(recalls)} queries."
+    )
+    for mode, elapsed in timings.items():
+        print(f"{mode}: {elapsed / max(len(queries), 1) * 1000:.3f} ms/query")
+
+
+@cli.command()
+@click.argument("index_directory_path", nargs=1, required=False)
+@click.argument("target_docnos", nargs=-1)
+@click.option(
+    "--file",
+    "docnos_file_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="File with one DOCNO per line to delete, in addition to the arguments.",
+)
+@click.option(
+    "--threshold",
+    type=click.FloatRange(0, 1),
+    default=DEFAULT_COMPACTION_THRESHOLD,
+    show_default=True,
+    help="Deleted fraction above which compaction is suggested.",
+)
+def delete(
+    index_directory_path: str,
+    target_docnos: List[str],
+    docnos_file_path: str,
+    threshold: float,
+) -> None:
+    validate_paths(index_directory_path, ["index_registrar.txt"])
+    targets = set(target_docnos)
+    if docnos_file_path:
+        targets.update(filter(None, read_lines(docnos_file_path)))
+    docnos = read_lines(f"{index_directory_path}/index_registrar.txt")
+    deleted = load_deleted_ids(index_directory_path)
+
+    newly_deleted = {
+        doc_id
+        for doc_id, docno in enumerate(docnos)
+        if docno in targets and doc_id not in deleted
+    }
+    deleted |= newly_deleted
+    write_deleted_docs(
+        f"{index_directory_path}/{DELETED_DOCS_FILE}", len(docnos), deleted
+    )
+
+    print(f"Deleted {len(newly_deleted)} documents.")
+    missing = targets - {docnos[doc_id] for doc_id in newly_deleted}
+    if missing:
+        print(f"Not found or already deleted: {', '.join(sorted(missing))}")
+    report_deleted(len(deleted), len(docnos), threshold)
+
+
+@cli.command()
+@click.argument("index_directory_path", nargs=1, required=False)
+@click.argument("source_file_path", nargs=1, required=False)
+@click.option(
+    "--porter-stem",
+    is_flag=True,
+    help="Stem the new documents; must match how the index was built.",
+)
+@click.option(
+    "--threshold",
+    type=click.FloatRange(0, 1),
+    default=DEFAULT_COMPACTION_THRESHOLD,
+    show_default=True,
+    help="Deleted fraction above which compaction is suggested.",
+)
+def update(
+    index_directory_path: str,
+    source_file_path: str,
+    porter_stem: bool,
+    threshold: float,
+) -> None:
+    validate_paths(index_directory_path, INDEX_FILES)
+    validate_source(source_file_path)
+    lexicon, docnos, inverted_index, doc_lengths = read_index_files(
+        index_directory_path
+    )
+    deleted = load_deleted_ids(index_directory_path)
+    live_ids = {
+        docno: doc_id for doc_id, docno in enumerate(docnos) if doc_id not in deleted
+    }
+
+    # New versions get fresh IDs after every existing one, and the versions
+    # they replace are marked deleted. Appending keeps each term's postings in
+    # doc ID order.
+    first_doc_id = len(docnos)
+    appended_postings, replaced = {}, 0
+    profiler = BuildProfiler(enabled=False)
+    with gzip.open(source_file_path, "rt") as f:
+        for raw_document in index_engine.iter_raw_documents(f):
+            doc_id = len(docnos)
+            doc_length, docno = index_engine.process_and_generate_document(
+                raw_document,
+                index_directory_path,
+                doc_id,
+                lexicon,
+                appended_postings,
+                porter_stem,
+                profiler,
+            )
+            if docno in live_ids:
+                deleted.add(live_ids[docno])
+                replaced += 1
+            live_ids[docno] = doc_id
+            doc_lengths.append(doc_length)
+            docnos.append(docno)
+
+    for term_id, postings in appended_postings.items():
+        inverted_index.setdefault(str(term_id), []).extend(postings)
+    index_engine.write_index_files(
+        index_directory_path, lexicon, inverted_index, doc_lengths, docnos
+    )
+    write_deleted_docs(
+        f"{index_directory_path}/{DELETED_DOCS_FILE}", len(docnos), deleted
+    )
+    invalidate_document_frequencies(index_directory_path)
+
+    print(
+        f"Appended {len(docnos) - first_doc_id} documents as IDs "
+        f"{first_doc_id}-{len(docnos) - 1}, replacing {replaced} existing versions."
+    )
+    report_deleted(len(deleted), len(docnos), threshold)
+
+
+@cli.command()
+@click.argument("index_directory_path", nargs=1, required=False)
+@click.option(
+    "--threshold",
+    type=click.FloatRange(0, 1),
+    default=DEFAULT_COMPACTION_THRESHOLD,
+    show_default=True,
+    help="Only compact when at least this fraction of documents is deleted.",
+)
+def compact(index_directory_path: str, threshold: float) -> None:
+    validate_paths(index_directory_path, INDEX_FILES)
+    deleted = load_deleted_ids(index_directory_path)
+    docnos = read_lines(f"{index_directory_path}/index_registrar.txt")
+    fraction = len(deleted) / len(docnos) if docnos else 0.0
+    if not deleted or fraction < threshold:
+        print(
+            f"{len(deleted)} of {len(docnos)} documents ({fraction:.1%}) are deleted, "
+            f"below the {threshold:.0%} compaction threshold; nothing to do."
+        )
+        return
+
+    lexicon, docnos, inverted_index, doc_lengths = read_index_files(
+        index_directory_path
+    )
+    postings_before = sum(len(postings) for postings in inverted_index.values()) // 2
+    new_ids, live_ids = [], []
+    for doc_id in range(len(docnos)):
+        new_ids.append(-1 if doc_id in deleted else len(live_ids))
+        if doc_id not in deleted:
+            live_ids.append(doc_id)
+
+    inverted_index = reordering.remap_postings(inverted_index, new_ids)
+    live_docnos = [docnos[doc_id] for doc_id in live_ids]
+    index_engine.write_index_files(
+        index_directory_path,
+        lexicon,
+        inverted_index,
+        [doc_lengths[doc_id] for doc_id in live_ids],
+        live_docnos,
+    )
+    os.remove(f"{index_directory_path}/{DELETED_DOCS_FILE}")
+    invalidate_document_frequencies(index_directory_path)
+
+    for new_id, old_id in enumerate(live_ids):
+        if new_id != old_id:
+            reordering.rewrite_internal_id(
+                search.document_path(index_directory_path, docnos[old_id]), new_id
+            )
+    # A replaced document's stored file already holds its newest version.
+    for docno in {docnos[doc_id] for doc_id in deleted} - set(live_docnos):
+        os.remove(search.document_path(index_directory_path, docno))
+
+    postings_after = sum(len(postings) for postings in inverted_index.values()) // 2
+    print(
+        f"Purged {len(deleted)} deleted documents: {len(docnos)} -> "
+        f"{len(live_docnos)} document IDs, {postings_before} -> {postings_after} postings."
+    )
+
+
+if __name__ == "__main__":
+    cli()
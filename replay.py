@@ -0,0 +1,329 @@
+import click
+import functools
+import itertools
+import json
+import threading
+import time
+import urllib.parse
+import urllib.request
+import numpy as np
+import search
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from utils.doc_dates import load_doc_dates
+from utils.document_cache import DEFAULT_CACHE_BYTES, DocumentCache
+from utils.liveness import load_liveness
+from utils.postings_cache import CACHE_POLICIES
+from utils.pruning import load_document_frequencies
+from utils.query_log import load_replay_queries
+from utils.search_utils import validate_paths
+from utils.spelling import load_spelling_corrector
+from utils.wildcard import DEFAULT_MAX_EXPANSIONS, WildcardExpander
+
+PERCENTILES = [50, 90, 95, 99]
+REPORTED_ERRORS = 5
+# Latency, result count (-1 when the query failed) and the failure, if any.
+Outcome = Tuple[float, int, Optional[str]]
+
+
+class InProcessEngine:
+    # Does the work search.main does for each query up to showing the result
+    # page: spelling correction, BM25 scoring and fetching the result documents
+    # that snippets are cut from.
+    def __init__(
+        self,
+        index_directory_path: str,
+        document_cache_mb: int,
+        max_expansions: int,
+        spelling_correction: bool,
+        postings_cache_mb: int = 0,
+        cache_policy: str = "lru",
+        warm_log_path: Optional[str] = None,
+    ) -> None:
+        (
+            self.lexicon,
+            self.index_registrar,
+            self.inverted_index,
+            self.doc_lengths,
+            self.average_doc_length,
+            self.num_docs,
+        ) = (
+            search.load_cached_index_data(
+                index_directory_path,
+                postings_cache_mb * 2**20,
+                cache_policy,
+                warm_log_path,
+            )
+            if postings_cache_mb
+            else search.load_index_data(index_directory_path)
+        )
+        self.postings_cache = self.inverted_index if postings_cache_mb else None
+        self.document_frequencies = load_document_frequencies(index_directory_path)
+        self.doc_dates = load_doc_dates(index_directory_path)
+        self.liveness = load_liveness(index_directory_path)
+        if self.liveness is not None:
+            self.num_docs, self.average_doc_length = (
+                self.liveness.collection_statistics(self.doc_lengths)
+            )
+        self.wildcard_expander = WildcardExpander(
+            self.lexicon,
+            (
+                self.postings_cache.flat_index
+                if self.postings_cache is not None
+                else self.inverted_index
+            ),
+            max_expansions,
+        )
+        self.spelling_corrector = (
+            load_spelling_corrector(index_directory_path)
+            if spelling_correction
+            else None
+        )
+        self.document_cache = DocumentCache(
+            functools.partial(search.lookup_by_docno, index_directory_path),
+            max_bytes=document_cache_mb * 2**20,
+            workers=search.RETRIEVED_RESULTS_LIMIT,
+        )
+
+    def search(self, query: str) -> int:
+        query, date_filter = search.build_date_filter(query, self.doc_dates)
+        corrected_query, _ = search.correct_query(
+            query, self.lexicon, self.spelling_corrector
+        )
+        document_scores = search.process_query(
+            corrected_query,
+            self.lexicon,
+            self.inverted_index,
+            self.doc_lengths,
+            self.average_doc_length,
+            self.num_docs,
+            self.wildcard_expander,
+            self.document_frequencies,
+            date_filter=date_filter,
+            liveness=self.liveness,
+        )
+        docnos = [self.index_registrar[doc_id] for doc_id in document_scores]
+        self.document_cache.prefetch(docnos)
+        for docno in docnos:
+            self.document_cache.get(docno)
+        return len(document_scores)
+
+    def cache_stats(self) -> Dict[str, Dict[str, float]]:
+        expansions = self.wildcard_expander.hits + self.wildcard_expander.misses
+        stats = {
+            "document cache": self.document_cache.stats(),
+            "wildcard expansion cache": dict(
+                hits=self.wildcard_expander.hits,
+                misses=self.wildcard_expander.misses,
+                hit_rate=(
+                    self.wildcard_expander.hits / expansions if expansions else 0.0
+                ),
+            ),
+        }
+        if self.postings_cache is not None:
+            stats["postings cache"] = self.postings_cache.stats()
+        return stats
+
+    def close(self) -> None:
+        self.document_cache.close()
+        if self.postings_cache is not None:
+            self.postings_cache.close()
+
+
+class HttpEngine:
+    # Sends each query to a running serve.py instance.
+    def __init__(self, url: str) -> None:
+        self.url = url.rstrip("/")
+
+    def search(self, query: str) -> int:
+        params = urllib.parse.urlencode({"q": query})
+        with urllib.request.urlopen(f"{self.url}/search?{params}") as response:
+            return len(json.load(response)["results"])
+
+    def cache_stats(self) -> Dict[str, Dict[str, float]]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+def timed_search(engine, query: str, scheduled_time: float) -> Outcome:
+    # A failing query is recorded rather than ending the replay, keeping the
+    # exception so that the report can show what went wrong.
+    try:
+        result_count, error = engine.search(query), None
+    except Exception as e:
+        result_count, error = -1, f"{query!r}: {type(e).__name__}: {e}"
+    return time.perf_counter() - scheduled_time, result_count, error
+
+
+def run_closed_loop(engine, queries: List[str], clients: int) -> List[Outcome]:
+    # Each client sends its next query as soon as the previous one returns.
+    next_query = iter(queries)
+    lock = threading.Lock()
+    outcomes = []
+
+    def client() -> None:
+        while True:
+            with lock:
+                query = next(next_query, None)
+            if query is None:
+                return
+            outcome = timed_search(engine, query, time.perf_counter())
+            with lock:
+                outcomes.append(outcome)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def run_open_loop(
+    engine, queries: List[str], qps: float, clients: int
+) -> List[Outcome]:
+    # Queries arrive on a fixed schedule whether or not earlier ones finished,
+    # and latency is measured from the scheduled arrival so that queueing
+    # delay is not hidden when the engine falls behind.
+    start_time = time.perf_counter()
+    futures = []
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        for i, query in enumerate(queries):
+            scheduled_time = start_time + i / qps
+            delay = scheduled_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(timed_search, engine, query, scheduled_time))
+    return [future.result() for future in futures]
+
+
+def print_report(
+    outcomes: List[Outcome],
+    elapsed: float,
+    description: str,
+    cache_stats: Dict[str, Dict[str, float]],
+) -> None:
+    latencies = np.array([latency for latency, count, _ in outcomes if count >= 0])
+    errors = [error for _, count, error in outcomes if count < 0]
+    print(
+        f"Replayed {len(outcomes)} queries ({description}) in {elapsed:.2f} s: "
+        f"{len(outcomes) / elapsed:.1f} queries/s, {len(errors)} errors"
+    )
+    for error in errors[:REPORTED_ERRORS]:
+        print(f"  failed: {error}")
+    if len(errors) > REPORTED_ERRORS:
+        print(f"  ... and {len(errors) - REPORTED_ERRORS} more failures")
+    if len(latencies):
+        percentiles = np.percentile(latencies * 1000, PERCENTILES)
+        print(
+            "Latency: "
+            + ", ".join(
+                f"p{p} {value:.2f} ms" for p, value in zip(PERCENTILES, percentiles)
+            )
+            + f", max {latencies.max() * 1000:.2f} ms, mean {latencies.mean() * 1000:.2f} ms"
+        )
+        result_counts = [count for _, count, _ in outcomes if count >= 0]
+        print(f"Mean results per query: {np.mean(result_counts):.2f}")
+    for name, stats in cache_stats.items():
+        print(
+            f"{name.capitalize()}: hit rate {stats['hit_rate']:.1%} "
+            f"({', '.join(f'{k} {v}' for k, v in stats.items() if k != 'hit_rate')})"
+        )
+
+
+@click.command()
+@click.argument("target", nargs=1, required=False)
+@click.argument(
+    "query_log_path", type=click.Path(exists=True, dir_okay=False), required=True
+)
+@click.option(
+    "--mode",
+    type=click.Choice(["closed", "open"]),
+    default="closed",
+    show_default=True,
+    help="closed: N clients each send their next query on completion. open: queries arrive at --qps.",
+)
+@click.option("--clients", default=1, show_default=True, help="Concurrent clients.")
+@click.option(
+    "--qps", default=10.0, show_default=True, help="Arrival rate in open-loop mode."
+)
+@click.option(
+    "--repeat", default=1, show_default=True, help="Times to replay the query log."
+)
+@click.option(
+    "--document-cache-mb",
+    default=DEFAULT_CACHE_BYTES // 2**20,
+    show_default=True,
+)
+@click.option("--max-expansions", default=DEFAULT_MAX_EXPANSIONS, show_default=True)
+@click.option(
+    "--spelling-correction/--no-spelling-correction", default=True, show_default=True
+)
+@click.option(
+    "--postings-cache-mb",
+    default=0,
+    show_default=True,
+    help="Read postings from flat_index.bin through a cache of this size (0 loads the whole index).",
+)
+@click.option(
+    "--cache-policy",
+    type=click.Choice(CACHE_POLICIES),
+    default="lru",
+    show_default=True,
+)
+@click.option(
+    "--warm-from",
+    "warm_log_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Query log (or topics file) whose most frequent terms are preloaded into the postings cache.",
+)
+def main(
+    target: str,
+    query_log_path: str,
+    mode: str,
+    clients: int,
+    qps: float,
+    repeat: int,
+    document_cache_mb: int,
+    max_expansions: int,
+    spelling_correction: bool,
+    postings_cache_mb: int,
+    cache_policy: str,
+    warm_log_path: Optional[str],
+) -> None:
+    if target and target.startswith(("http://", "https://")):
+        engine = HttpEngine(target)
+    else:
+        validate_paths(target)
+        engine = InProcessEngine(
+            target,
+            document_cache_mb,
+            max_expansions,
+            spelling_correction,
+            postings_cache_mb,
+            cache_policy,
+            warm_log_path,
+        )
+    queries = list(
+        itertools.chain.from_iterable(
+            itertools.repeat(load_replay_queries(query_log_path), repeat)
+        )
+    )
+
+    start_time = time.perf_counter()
+    if mode == "open":
+        outcomes = run_open_loop(engine, queries, qps, clients)
+        description = f"open loop at {qps:g} queries/s, {clients} workers"
+    else:
+        outcomes = run_closed_loop(engine, queries, clients)
+        description = f"closed loop, {clients} clients"
+    elapsed = time.perf_counter() - start_time
+
+    print_report(outcomes, elapsed, description, engine.cache_stats())
+    engine.close()
+
+
+if __name__ == "__main__":
+    main()
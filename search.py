@@ -1,4 +1,6 @@
 import click
+import functools
+import heapq
 import re
 import time
 import json
@@ -7,30 +9,73 @@ import math
 import datetime
 import warnings
 from art import text2art
-from typing import Dict, Tuple, List, Set
+from typing import Callable, Dict, Tuple, List, Optional, Set, Union
 from utils.search_utils import validate_paths
+from utils.lexicon import FRONT_CODED_LEXICON_FILE, load_lexicon
+from utils.snapshot import compact_postings, load_or_build
+from utils.document_cache import DEFAULT_CACHE_BYTES, DocumentCache
+from utils.postings import merge_postings
+from utils.wildcard import DEFAULT_MAX_EXPANSIONS, WildcardExpander
+from utils.spelling import SpellingCorrector, correct_tokens, load_spelling_corrector
+from utils.pruning import load_document_frequencies
+from utils.query_log import QueryLogger
+from utils.pagination import DEFAULT_MAX_RESULTS, ResultCursor
+from utils.ranking import (
+    DEFAULT_BUDGET_MS,
+    DEFAULT_CANDIDATES,
+    FEATURES,
+    CascadeRanker,
+    DocumentFeatureCache,
+    parse_weights,
+)
+from utils.liveness import Liveness, load_liveness
+from utils.tiers import TieredIndex, load_tiered_index
+from utils.bm25 import B, K1
+from utils.flat_index import FLAT_INDEX_FILE, load_flat_index
+from utils.postings_cache import CACHE_POLICIES, PostingsCache, load_postings_cache
+from utils.query_log import load_replay_queries
+from utils.doc_dates import (
+    DOC_DATES_FILE,
+    DateFilter,
+    DocDates,
+    load_doc_dates,
+    parse_date_key,
+)
 
 warnings.filterwarnings("ignore")
 
 RETRIEVED_RESULTS_LIMIT = 10
-K1 = 1.2
-B = 0.75
 CLEAN_TAG_PATTERN = re.compile(r"<.*?>|</.*?>")
 DELIMITERS = [".", "!", "?"]
 WRONGFUL_SELECTION_MSG = "Invalid selection, please try again."
+SNAPSHOT_FILE = "search_state.snapshot"
+DATE_FILTER_PATTERN = re.compile(r"\b(after|before):(\S*)", re.IGNORECASE)
+PAGE_PATTERN = re.compile(r"page\s*=\s*([0-9]+)")
+
+
+def index_source_paths(index_directory_path: str) -> List[str]:
+    return [
+        f"{index_directory_path}/{name}"
+        for name in [
+            "lexicon.txt",
+            FRONT_CODED_LEXICON_FILE,
+            "index_registrar.txt",
+            "inverted_index.json",
+            "doc-lengths.txt",
+        ]
+    ]
 
 
-def load_index_data(
+def build_index_data(
     index_directory_path: str,
 ) -> Tuple[Dict[str, int], Dict[int, str], Dict[str, List[int]], List[int], float, int]:
-    with open(f"{index_directory_path}/lexicon.txt") as f:
-        lexicon = {v: i for i, v in enumerate(f.read().splitlines(), 1)}
+    lexicon = load_lexicon(index_directory_path)
 
     with open(f"{index_directory_path}/index_registrar.txt") as f:
         index_registrar = {i: v for i, v in enumerate(f.read().splitlines())}
 
     with open(f"{index_directory_path}/inverted_index.json") as f:
-        inverted_index = json.load(f)
+        inverted_index = compact_postings(json.load(f))
 
     with open(f"{index_directory_path}/doc-lengths.txt") as f:
         doc_lengths = [int(length.strip()) for length in f.readlines()]
@@ -48,6 +93,85 @@ def load_index_data(
     )
 
 
+def load_index_data(
+    index_directory_path: str,
+) -> Tuple[Dict[str, int], Dict[int, str], Dict[str, List[int]], List[int], float, int]:
+    return load_or_build(
+        f"{index_directory_path}/{SNAPSHOT_FILE}",
+        index_source_paths(index_directory_path),
+        lambda: build_index_data(index_directory_path),
+    )
+
+
+def load_cached_index_data(
+    index_directory_path: str,
+    max_bytes: int,
+    policy: str = "lru",
+    warm_log_path: Optional[str] = None,
+) -> Tuple[Dict[str, int], Dict[int, str], PostingsCache, memoryview, float, int]:
+    # Like load_index_data, but postings stay in flat_index.bin and are read
+    # through a byte-bounded cache instead of loading inverted_index.json. Doc
+    # lengths come from the flat index, which also serves postings lengths for
+    # wildcard expansion without reading the lists.
+    lexicon = load_lexicon(index_directory_path)
+    with open(f"{index_directory_path}/index_registrar.txt") as f:
+        index_registrar = {i: v for i, v in enumerate(f.read().splitlines())}
+    flat_index = load_flat_index(index_directory_path)
+    postings_cache = load_postings_cache(
+        flat_index,
+        max_bytes,
+        policy,
+        load_replay_queries(warm_log_path) if warm_log_path else None,
+        lambda query: [
+            term_id
+            for term_id in resolve_query_terms(tokenize_query(query), lexicon)
+            if isinstance(term_id, int)
+        ],
+    )
+    return (
+        lexicon,
+        index_registrar,
+        postings_cache,
+        flat_index.doc_lengths,
+        flat_index.average_doc_length,
+        flat_index.num_docs,
+    )
+
+
+def tokenize_query(query: str) -> List[str]:
+    return re.sub(r"[^\w*]+", ", ", query).lower().split(", ")
+
+
+def resolve_query_terms(
+    query_tokens: List[str],
+    lexicon: Dict[str, int],
+    wildcard_expander: Optional[WildcardExpander] = None,
+) -> List[Union[int, Tuple[int, ...]]]:
+    termIDs = []
+    for token in query_tokens:
+        if "*" in token:
+            if wildcard_expander is None:
+                continue
+            expansion = tuple(term_id for _, term_id in wildcard_expander.expand(token))
+            if expansion:
+                termIDs.append(expansion if len(expansion) > 1 else expansion[0])
+        elif token in lexicon:
+            termIDs.append(lexicon[token])
+    return termIDs
+
+
+def expand_query_tokens(
+    query_tokens: List[str], wildcard_expander: Optional[WildcardExpander] = None
+) -> List[str]:
+    expanded = []
+    for token in query_tokens:
+        if "*" in token and wildcard_expander is not None:
+            expanded.extend(term for term, _ in wildcard_expander.expand(token))
+        else:
+            expanded.append(token)
+    return expanded
+
+
 def process_query(
     query: str,
     lexicon: Dict[str, int],
@@ -55,34 +179,121 @@ def process_query(
     doc_lengths: List[int],
     average_doc_length: float,
     num_docs: int,
+    wildcard_expander: Optional[WildcardExpander] = None,
+    document_frequencies: Optional[List[int]] = None,
+    limit: int = RETRIEVED_RESULTS_LIMIT,
+    date_filter: Optional[DateFilter] = None,
+    liveness: Optional[Liveness] = None,
+    tiered_index: Optional[TieredIndex] = None,
+    approximate_k: int = RETRIEVED_RESULTS_LIMIT,
 ) -> Dict[int, float]:
-    query_tokens = re.sub(r"\W+", ", ", query).lower().split(", ")
-    termIDs = [lexicon[token] for token in query_tokens if token in lexicon]
-    if not termIDs:
+    query_tokens = tokenize_query(query)
+    termIDs = resolve_query_terms(query_tokens, lexicon, wildcard_expander)
+    if not termIDs or (date_filter is not None and date_filter.empty):
         return {}
 
-    document_scores = calculate_document_scores(
-        termIDs, inverted_index, doc_lengths, average_doc_length, num_docs
-    )
-    sorted_scores = sorted(
-        document_scores.items(), key=lambda item: item[1], reverse=True
+    if tiered_index is not None:
+        document_scores = approximate_document_scores(
+            termIDs,
+            tiered_index,
+            doc_lengths,
+            average_doc_length,
+            num_docs,
+            approximate_k,
+            document_frequencies,
+            date_filter,
+            liveness,
+        )
+    else:
+        document_scores = calculate_document_scores(
+            termIDs,
+            inverted_index,
+            doc_lengths,
+            average_doc_length,
+            num_docs,
+            document_frequencies,
+            date_filter,
+            liveness,
+        )
+    # Same order as a full stable sort, but only `limit` entries are kept.
+    return dict(
+        heapq.nlargest(limit, document_scores.items(), key=lambda item: item[1])
     )
-    return dict(sorted_scores[:RETRIEVED_RESULTS_LIMIT])
+
+
+def fetch_postings(
+    termID: Union[int, Tuple[int, ...]], inverted_index: Dict[str, List[int]]
+) -> List[int]:
+    if isinstance(termID, tuple):
+        return merge_postings(inverted_index[str(term_id)] for term_id in termID)
+    return inverted_index[str(termID)]
+
+
+def document_frequency(
+    termID: Union[int, Tuple[int, ...]],
+    postings_list: List[int],
+    num_docs: int,
+    document_frequencies: Optional[Union[List[int], Dict[int, int]]] = None,
+) -> int:
+    # A pruned index keeps the unpruned dfs so that idf is unchanged by pruning.
+    # A wildcard expansion's df is the sum of its terms' dfs, capped at N: the
+    # size of the union is not recoverable from stored dfs, so every index
+    # uses the sum to keep expansion scores the same before and after pruning.
+    if isinstance(termID, tuple):
+        return min(num_docs, sum(document_frequencies[term_id] for term_id in termID))
+    if document_frequencies is None:
+        return len(postings_list) // 2
+    return document_frequencies[termID]
+
+
+def term_document_frequencies(
+    termIDs: List[Union[int, Tuple[int, ...]]],
+    inverted_index: Dict[str, List[int]],
+    liveness: Optional[Liveness] = None,
+) -> Dict[int, int]:
+    # The df of every term in the query, expansions included, over live
+    # documents and the full postings lists.
+    frequencies = {}
+    for termID in termIDs:
+        for term_id in termID if isinstance(termID, tuple) else (termID,):
+            postings_list = inverted_index[str(term_id)]
+            if liveness is not None:
+                postings_list = liveness.restrict(postings_list)
+            frequencies[term_id] = len(postings_list) // 2
+    return frequencies
 
 
 def calculate_document_scores(
-    termIDs: List[int],
+    termIDs: List[Union[int, Tuple[int, ...]]],
     inverted_index: Dict[str, List[int]],
     doc_lengths: List[int],
     average_doc_length: float,
     num_docs: int,
+    document_frequencies: Optional[Union[List[int], Dict[int, int]]] = None,
+    date_filter: Optional[DateFilter] = None,
+    liveness: Optional[Liveness] = None,
 ) -> Dict[int, float]:
     document_scores = {}
     for termID in termIDs:
-        postings_list = inverted_index[str(termID)]
+        postings_list = fetch_postings(termID, inverted_index)
+        # Deleted documents drop out before df is taken, so idf counts live
+        # documents only.
+        if liveness is not None:
+            postings_list = liveness.restrict(postings_list)
+        docs_with_term = document_frequency(
+            termID,
+            postings_list,
+            num_docs,
+            (
+                term_document_frequencies([termID], inverted_index, liveness)
+                if document_frequencies is None and isinstance(termID, tuple)
+                else document_frequencies
+            ),
+        )
+        if date_filter is not None:
+            postings_list = date_filter.restrict(postings_list)
         documents, frequencies = postings_list[::2], postings_list[1::2]
         doc_frequencies = dict(zip(documents, frequencies))
-        docs_with_term = len(documents)
 
         for doc, freq in doc_frequencies.items():
             doc_length = doc_lengths[doc]
@@ -95,13 +306,94 @@ def calculate_document_scores(
     return document_scores
 
 
-def lookup_by_docno(source_directory: str, docno: str) -> str:
+def approximate_document_scores(
+    termIDs: List[Union[int, Tuple[int, ...]]],
+    tiered_index: TieredIndex,
+    doc_lengths: List[int],
+    average_doc_length: float,
+    num_docs: int,
+    k: int,
+    document_frequencies: Optional[List[int]] = None,
+    date_filter: Optional[DateFilter] = None,
+    liveness: Optional[Liveness] = None,
+) -> Dict[int, float]:
+    # Scores the champion tier only, and adds the remainder tier (making the
+    # scores exact) when the champions yield fewer than `k` documents.
+    # idf always comes from the full postings lists.
+    if document_frequencies is None:
+        document_frequencies = term_document_frequencies(
+            termIDs, tiered_index.inverted_index, liveness
+        )
+    tiers = [tiered_index.champions, tiered_index.remainder]
+    document_scores = {}
+    for tier in tiers:
+        for doc, score in calculate_document_scores(
+            termIDs,
+            tier,
+            doc_lengths,
+            average_doc_length,
+            num_docs,
+            document_frequencies,
+            date_filter,
+            liveness,
+        ).items():
+            document_scores[doc] = document_scores.get(doc, 0) + score
+        if len(document_scores) >= k:
+            break
+    return document_scores
+
+
+def extract_date_filters(query: str) -> Tuple[str, Optional[int], Optional[int]]:
+    # Pulls after:YYYY-MM-DD and before:YYYY-MM-DD out of the query text.
+    bounds = {"after": None, "before": None}
+    for match in DATE_FILTER_PATTERN.finditer(query):
+        bounds[match.group(1).lower()] = parse_date_key(match.group(2))
+    return (
+        DATE_FILTER_PATTERN.sub(" ", query).strip(),
+        bounds["after"],
+        bounds["before"],
+    )
+
+
+def build_date_filter(
+    query: str, doc_dates: Optional[DocDates]
+) -> Tuple[str, Optional[DateFilter]]:
+    try:
+        query, after, before = extract_date_filters(query)
+    except ValueError:
+        raise ValueError(
+            "Date filters must look like after:YYYY-MM-DD or before:YYYY-MM-DD."
+        )
+    if after is None and before is None:
+        return query, None
+    if doc_dates is None:
+        raise ValueError(
+            f"Date filters need {DOC_DATES_FILE}; run 'python index_tools.py dates <index path>' first."
+        )
+    return query, DateFilter(doc_dates, after, before)
+
+
+def correct_query(
+    query: str, lexicon: Dict[str, int], spelling_corrector: Optional[SpellingCorrector]
+) -> Tuple[str, Dict[str, str]]:
+    if spelling_corrector is None:
+        return query, {}
+    corrected_tokens, corrections = correct_tokens(
+        tokenize_query(query), lexicon, spelling_corrector
+    )
+    return (" ".join(corrected_tokens) if corrections else query), corrections
+
+
+def document_path(source_directory: str, docno: str) -> str:
     match = re.search("LA([0-9]{6})-[0-9]{4}", docno)
     match = match.group(1)
     date_components = datetime.datetime.strptime(match, "%m%d%y")
     year, month, day = date_components.year, date_components.month, date_components.day
+    return f"{source_directory}/{year}/{month}/{day}/{docno}.txt"
 
-    search_directory = f"{source_directory}/{year}/{month}/{day}/{docno}.txt"
+
+def lookup_by_docno(source_directory: str, docno: str) -> str:
+    search_directory = document_path(source_directory, docno)
     with open(search_directory) as f:
         output = f.read()
     return output
@@ -145,16 +437,27 @@ def get_graphic(text: str) -> str:
         return f"{text}..."
 
 
+def document_fetcher(
+    index_directory_path: str, document_cache: Optional[DocumentCache]
+) -> Callable[[str], str]:
+    if document_cache is not None:
+        return document_cache.get
+    return functools.partial(lookup_by_docno, index_directory_path)
+
+
 def display_results(
     document_scores: Dict[int, float],
     index_registrar: Dict[int, str],
     index_directory_path: str,
     query_tokens: List[str],
+    document_cache: Optional[DocumentCache] = None,
+    first_rank: int = 1,
 ) -> List[Dict[str, str]]:
+    fetch_document = document_fetcher(index_directory_path, document_cache)
     retrieved_docs = []
-    for rank, (doc_id, score) in enumerate(document_scores.items(), 1):
+    for rank, (doc_id, score) in enumerate(document_scores.items(), first_rank):
         docno = index_registrar[doc_id]
-        document = lookup_by_docno(index_directory_path, docno)
+        document = fetch_document(docno)
         document_split = document.split("\n")
 
         date = document_split[2].split("date: ")[1].strip()
@@ -192,14 +495,22 @@ def display_results(
 
 
 def handle_user_actions(
-    retrieved_docs: List[Dict[str, str]], index_directory_path: str
-) -> None:
+    retrieved_docs: List[Dict[str, str]],
+    index_directory_path: str,
+    document_cache: Optional[DocumentCache] = None,
+    page: int = 1,
+    num_pages: int = 1,
+) -> Optional[int]:
+    # Returns the page to show next, or None to leave the result list.
+    fetch_document = document_fetcher(index_directory_path, document_cache)
+    ranks = {result["rank"]: result for result in retrieved_docs}
     while True:
         next_action = (
             input(
                 "Please enter:\n1. The numeric rank of a document to view the full document.\n"
-                "2. 'N' to launch a new query.\n"
-                "3. 'Q' to exit the search program.\n\n"
+                "2. 'next' or 'prev' to change page, or 'page=N' to jump to page N.\n"
+                "3. 'N' to launch a new query.\n"
+                "4. 'Q' to exit the search program.\n\n"
             )
             .lower()
             .strip()
@@ -209,11 +520,21 @@ def handle_user_actions(
             break
         elif next_action == "n":
             return
+        elif next_action in ("next", "prev") or PAGE_PATTERN.fullmatch(next_action):
+            if next_action == "next":
+                target = page + 1
+            elif next_action == "prev":
+                target = page - 1
+            else:
+                target = int(PAGE_PATTERN.fullmatch(next_action).group(1))
+            if 1 <= target <= num_pages:
+                return target
+            print(f"There are {num_pages} pages of results.")
         elif next_action.isdigit():
             next_action = int(next_action)
-            if next_action > 0 and next_action <= len(retrieved_docs):
-                result = retrieved_docs[next_action - 1]
-                document = lookup_by_docno(index_directory_path, result["docno"])
+            if next_action in ranks:
+                result = ranks[next_action]
+                document = fetch_document(result["docno"])
                 print(document)
             else:
                 print(WRONGFUL_SELECTION_MSG)
@@ -221,10 +542,116 @@ def handle_user_actions(
             print(WRONGFUL_SELECTION_MSG)
 
 
+def parse_weights_option(value: str) -> Dict[str, float]:
+    try:
+        return parse_weights(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
 @click.command()
 @click.argument("index_directory_path", nargs=1, required=False)
-def main(index_directory_path: str) -> None:
+@click.option(
+    "--document-cache-mb",
+    default=DEFAULT_CACHE_BYTES // 2**20,
+    show_default=True,
+    help="Size of the in-memory LRU cache of stored documents.",
+)
+@click.option(
+    "--max-expansions",
+    default=DEFAULT_MAX_EXPANSIONS,
+    show_default=True,
+    help="Most frequent lexicon terms a wildcard query term (e.g. olymp*) expands to.",
+)
+@click.option(
+    "--spelling-correction/--no-spelling-correction",
+    default=True,
+    show_default=True,
+    help="Replace query terms missing from the lexicon with their most likely correction.",
+)
+@click.option(
+    "--query-log",
+    "query_log_path",
+    type=click.Path(dir_okay=False),
+    help="Append every query, its timestamp, latency and result count to this JSON lines file.",
+)
+@click.option(
+    "--rerank",
+    is_flag=True,
+    help="Re-rank the BM25 top --candidates with headline, proximity and recency features.",
+)
+@click.option("--candidates", default=DEFAULT_CANDIDATES, show_default=True)
+@click.option(
+    "--rerank-budget-ms",
+    default=DEFAULT_BUDGET_MS,
+    show_default=True,
+    help="Per-query time allowed for re-ranking; unreached candidates keep their BM25 order.",
+)
+@click.option(
+    "--weights",
+    default="",
+    callback=lambda ctx, param, value: parse_weights_option(value),
+    help=f"Linear model weights, e.g. bm25=1,headline=0.3 (features: {', '.join(FEATURES)}).",
+)
+@click.option(
+    "--max-results",
+    default=DEFAULT_MAX_RESULTS,
+    show_default=True,
+    help="Ranked results kept for paging through with next/prev/page=N.",
+)
+@click.option(
+    "--postings-cache-mb",
+    default=0,
+    show_default=True,
+    help="Serve postings from flat_index.bin through a cache of this size instead of loading the whole index (0 loads it all).",
+)
+@click.option(
+    "--cache-policy",
+    type=click.Choice(CACHE_POLICIES),
+    default="lru",
+    show_default=True,
+    help="Eviction policy of the dynamic part of the postings cache.",
+)
+@click.option(
+    "--warm-from",
+    "warm_log_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Query log (or topics file) whose most frequent terms are preloaded into the postings cache.",
+)
+@click.option(
+    "--approximate",
+    is_flag=True,
+    help="Score champion lists first and fall back to the full postings only when they yield fewer than --approximate-k results.",
+)
+@click.option(
+    "--approximate-k",
+    default=RETRIEVED_RESULTS_LIMIT,
+    show_default=True,
+    help="Results the champion lists must yield before the rest of the postings are skipped.",
+)
+def main(
+    index_directory_path: str,
+    document_cache_mb: int,
+    max_expansions: int,
+    spelling_correction: bool,
+    query_log_path: Optional[str],
+    rerank: bool,
+    candidates: int,
+    rerank_budget_ms: float,
+    weights: Dict[str, float],
+    max_results: int,
+    postings_cache_mb: int,
+    cache_policy: str,
+    warm_log_path: Optional[str],
+    approximate: bool,
+    approximate_k: int,
+) -> None:
     validate_paths(index_directory_path)
+    document_cache = DocumentCache(
+        functools.partial(lookup_by_docno, index_directory_path),
+        max_bytes=document_cache_mb * 2**20,
+        workers=RETRIEVED_RESULTS_LIMIT,
+    )
     (
         lexicon,
         index_registrar,
@@ -232,7 +659,50 @@ def main(index_directory_path: str) -> None:
         doc_lengths,
         average_doc_length,
         num_docs,
-    ) = load_index_data(index_directory_path)
+    ) = (
+        load_cached_index_data(
+            index_directory_path,
+            postings_cache_mb * 2**20,
+            cache_policy,
+            warm_log_path,
+        )
+        if postings_cache_mb
+        else load_index_data(index_directory_path)
+    )
+    postings_cache = inverted_index if postings_cache_mb else None
+    document_frequencies = load_document_frequencies(index_directory_path)
+    doc_dates = load_doc_dates(index_directory_path)
+    liveness = load_liveness(index_directory_path)
+    if liveness is not None:
+        num_docs, average_doc_length = liveness.collection_statistics(doc_lengths)
+    tiered_index = None
+    if approximate:
+        tiered_index = load_tiered_index(index_directory_path, inverted_index)
+        if tiered_index is None:
+            print(
+                "No up-to-date champion lists found; searching exactly. "
+                "Write them with index_tools.py tiers."
+            )
+    wildcard_expander = WildcardExpander(
+        lexicon,
+        postings_cache.flat_index if postings_cache is not None else inverted_index,
+        max_expansions,
+    )
+    spelling_corrector = (
+        load_spelling_corrector(index_directory_path) if spelling_correction else None
+    )
+    query_logger = QueryLogger(query_log_path) if query_log_path else None
+    ranker = (
+        CascadeRanker(
+            DocumentFeatureCache(
+                functools.partial(lookup_by_docno, index_directory_path)
+            ),
+            weights,
+            rerank_budget_ms,
+        )
+        if rerank
+        else None
+    )
 
     print(text2art("BM25 Search Engine"))
 
@@ -247,21 +717,92 @@ def main(index_directory_path: str) -> None:
             continue
 
         start_time = time.time()
+        try:
+            query_text, date_filter = build_date_filter(query, doc_dates)
+        except ValueError as e:
+            print(e)
+            continue
+        corrected_query, corrections = correct_query(
+            query_text, lexicon, spelling_corrector
+        )
+        if corrections:
+            print(f"Showing results for: {corrected_query}")
         document_scores = process_query(
-            query, lexicon, inverted_index, doc_lengths, average_doc_length, num_docs
+            corrected_query,
+            lexicon,
+            inverted_index,
+            doc_lengths,
+            average_doc_length,
+            num_docs,
+            wildcard_expander,
+            document_frequencies,
+            limit=candidates if ranker else max_results,
+            date_filter=date_filter,
+            liveness=liveness,
+            tiered_index=tiered_index,
+            approximate_k=approximate_k,
         )
+        if ranker is not None:
+            document_scores, _ = ranker.rerank(
+                expand_query_tokens(tokenize_query(corrected_query), wildcard_expander),
+                document_scores,
+                index_registrar.get,
+                max_results,
+            )
+        if query_logger is not None:
+            query_logger.log(
+                query,
+                time.time() - start_time,
+                len(document_scores),
+                corrected_query if corrections else None,
+            )
+        query = corrected_query
 
         if not document_scores:
             print(f"No results found for query: {query}")
             continue
 
-        query_tokens = re.sub(r"\W+", ", ", query).lower().split(", ")
-        retrieved_docs = display_results(
-            document_scores, index_registrar, index_directory_path, query_tokens
+        # Later pages are cut from the cursor; only the page on screen is
+        # fetched and has snippets built.
+        cursor = ResultCursor(
+            query, document_scores, RETRIEVED_RESULTS_LIMIT, max_results
         )
-        print(f"Retrieval took {time.time() - start_time:.2f} seconds.\n")
+        query_tokens = expand_query_tokens(tokenize_query(query), wildcard_expander)
+        page = 1
+        while page is not None:
+            page_scores = dict(cursor.page(page))
+            document_cache.prefetch(index_registrar[doc_id] for doc_id in page_scores)
+            retrieved_docs = display_results(
+                page_scores,
+                index_registrar,
+                index_directory_path,
+                query_tokens,
+                document_cache,
+                cursor.first_rank(page),
+            )
+            print(f"Page {page} of {cursor.num_pages} ({cursor.total} results).")
+            if page == 1:
+                print(f"Retrieval took {time.time() - start_time:.2f} seconds.\n")
+
+            page = handle_user_actions(
+                retrieved_docs,
+                index_directory_path,
+                document_cache,
+                page,
+                cursor.num_pages,
+            )
 
-        handle_user_actions(retrieved_docs, index_directory_path)
+    document_cache.close()
+    if query_logger is not None:
+        query_logger.close()
+    if postings_cache is not None:
+        stats = postings_cache.stats()
+        print(
+            f"Postings cache: hit rate {stats['hit_rate']:.1%}, "
+            f"{stats['bytes_saved']} bytes served from memory, "
+            f"{stats['bytes_read']} bytes read from {FLAT_INDEX_FILE}."
+        )
+        postings_cache.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,330 @@
+import click
+import gc
+import json
+import os
+import resource
+import signal
+import tempfile
+import time
+import search
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+from utils.doc_dates import load_doc_dates
+from utils.docno_map import DOCNO_MAP_FILE, load_docno_map, write_docno_map
+from utils.flat_index import load_flat_index
+from utils.liveness import load_liveness
+from utils.pagination import (
+    DEFAULT_IDLE_SECONDS,
+    DEFAULT_MAX_RESULTS,
+    DEFAULT_MAX_SESSIONS,
+    CursorStore,
+    ResultCursor,
+)
+from utils.lexicon import (
+    FRONT_CODED_LEXICON_FILE,
+    FrontCodedLexicon,
+    load_lexicon,
+    read_text_terms,
+    write_front_coded_lexicon,
+)
+from utils.pruning import load_document_frequencies
+from utils.search_utils import validate_paths
+from utils.spelling import load_spelling_corrector
+from utils.wildcard import DEFAULT_MAX_EXPANSIONS, WildcardExpander
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+MAX_RESULTS_LIMIT = 1000
+
+
+class ServingIndex:
+    # Everything a worker needs to answer a query, opened once in the parent
+    # before forking. The lexicon, postings, doc lengths, DOCNOs and dates are
+    # all mmapped files, so workers share them through the page cache.
+    def __init__(
+        self,
+        index_directory_path: str,
+        max_expansions: int,
+        spelling_correction: bool,
+        cursor_store: CursorStore,
+        max_results: int = DEFAULT_MAX_RESULTS,
+    ) -> None:
+        self.cursor_store = cursor_store
+        self.max_results = max_results
+        self.lexicon = load_lexicon(index_directory_path)
+        if not isinstance(self.lexicon, FrontCodedLexicon):
+            compact_path = f"{index_directory_path}/{FRONT_CODED_LEXICON_FILE}"
+            write_front_coded_lexicon(
+                compact_path, read_text_terms(index_directory_path)
+            )
+            self.lexicon = FrontCodedLexicon(compact_path)
+        self.docno_map = load_docno_map(index_directory_path)
+        if self.docno_map is None:
+            with open(f"{index_directory_path}/index_registrar.txt") as f:
+                write_docno_map(
+                    f"{index_directory_path}/{DOCNO_MAP_FILE}", f.read().splitlines()
+                )
+            self.docno_map = load_docno_map(index_directory_path)
+        self.flat_index = load_flat_index(index_directory_path)
+        self.doc_dates = load_doc_dates(index_directory_path)
+        self.document_frequencies = load_document_frequencies(index_directory_path)
+        self.liveness = load_liveness(index_directory_path)
+        self.num_docs, self.average_doc_length = (
+            self.liveness.collection_statistics(self.flat_index.doc_lengths)
+            if self.liveness is not None
+            else (self.flat_index.num_docs, self.flat_index.average_doc_length)
+        )
+        self.wildcard_expander = WildcardExpander(
+            self.lexicon, self.flat_index, max_expansions
+        )
+        self.spelling_corrector = (
+            load_spelling_corrector(index_directory_path)
+            if spelling_correction
+            else None
+        )
+        self.queries_served = 0
+        self.pages_served = 0
+
+    def search(self, query: str, limit: int) -> Dict[str, Any]:
+        # Scores once to the cursor depth; when there is more than one page,
+        # the ranking is saved as a cursor that later pages are cut from.
+        start_time = time.perf_counter()
+        query_text, date_filter = search.build_date_filter(query, self.doc_dates)
+        corrected_query, corrections = search.correct_query(
+            query_text, self.lexicon, self.spelling_corrector
+        )
+        document_scores = search.process_query(
+            corrected_query,
+            self.lexicon,
+            self.flat_index,
+            self.flat_index.doc_lengths,
+            self.average_doc_length,
+            self.num_docs,
+            self.wildcard_expander,
+            self.document_frequencies,
+            max(limit, self.max_results),
+            date_filter,
+            self.liveness,
+        )
+        cursor = ResultCursor(
+            query, document_scores, limit, max(limit, self.max_results)
+        )
+        token = self.cursor_store.add(cursor) if cursor.num_pages > 1 else None
+        self.queries_served += 1
+        return {
+            "query": query,
+            "corrected_query": corrected_query if corrections else None,
+            **self.page_body(cursor, 1, token),
+            "latency_ms": round((time.perf_counter() - start_time) * 1000, 3),
+            "worker": os.getpid(),
+        }
+
+    def page(self, token: str, number: int) -> Optional[Dict[str, Any]]:
+        start_time = time.perf_counter()
+        cursor = self.cursor_store.get(token)
+        if cursor is None:
+            return None
+        if not 1 <= number <= cursor.num_pages:
+            raise ValueError(f"Expected a page between 1 and {cursor.num_pages}.")
+        self.pages_served += 1
+        return {
+            "query": cursor.query,
+            **self.page_body(cursor, number, token),
+            "latency_ms": round((time.perf_counter() - start_time) * 1000, 3),
+            "worker": os.getpid(),
+        }
+
+    def page_body(
+        self, cursor: ResultCursor, number: int, token: Optional[str]
+    ) -> Dict[str, Any]:
+        return {
+            "results": [
+                {"rank": rank, "docno": self.docno_map.docno(doc_id), "score": score}
+                for rank, (doc_id, score) in enumerate(
+                    cursor.page(number), cursor.first_rank(number)
+                )
+            ],
+            "cursor": token,
+            "page": number,
+            "pages": cursor.num_pages,
+            "total": cursor.total,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "worker": os.getpid(),
+            "queries_served": self.queries_served,
+            "pages_served": self.pages_served,
+            "open_cursors": len(self.cursor_store),
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+
+
+class PreforkHTTPServer(HTTPServer):
+    request_queue_size = 128
+
+
+def make_handler(serving_index: ServingIndex):
+    class SearchRequestHandler(BaseHTTPRequestHandler):
+        def send_json(self, status: int, body: Dict[str, Any]) -> None:
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            if url.path == "/stats":
+                self.send_json(200, serving_index.stats())
+                return
+            if url.path != "/search":
+                self.send_json(404, {"error": f"Unknown path {url.path}"})
+                return
+            if "cursor" in params:
+                try:
+                    page = int(params.get("page", ["1"])[0])
+                    body = serving_index.page(params["cursor"][0], page)
+                except ValueError as e:
+                    self.send_json(400, {"error": str(e) or "Expected &page=<n>."})
+                    return
+                if body is None:
+                    self.send_json(
+                        404, {"error": "Unknown or expired cursor; repeat the query."}
+                    )
+                    return
+                self.send_json(200, body)
+                return
+
+            query = params.get("q", [""])[0].strip()
+            try:
+                limit = int(params.get("limit", [search.RETRIEVED_RESULTS_LIMIT])[0])
+            except ValueError:
+                limit = 0
+            if not query or not 1 <= limit <= MAX_RESULTS_LIMIT:
+                self.send_json(
+                    400,
+                    {"error": f"Expected ?q=<query>&limit=<1-{MAX_RESULTS_LIMIT}>."},
+                )
+                return
+            try:
+                self.send_json(200, serving_index.search(query, limit))
+            except ValueError as e:
+                self.send_json(400, {"error": str(e)})
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return SearchRequestHandler
+
+
+def serve_forever_in_workers(server: HTTPServer, workers: int) -> List[int]:
+    # Classic pre-fork: every worker inherits the listening socket and the
+    # kernel hands each incoming connection to whichever worker accepts first.
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os._exit(0)
+        children.append(pid)
+    return children
+
+
+@click.command()
+@click.argument("index_directory_path", nargs=1, required=False)
+@click.option("--host", default=DEFAULT_HOST, show_default=True)
+@click.option("--port", default=DEFAULT_PORT, show_default=True)
+@click.option(
+    "--workers",
+    default=os.cpu_count() or 1,
+    show_default=True,
+    help="Pre-forked worker processes sharing the mmapped index.",
+)
+@click.option("--max-expansions", default=DEFAULT_MAX_EXPANSIONS, show_default=True)
+@click.option(
+    "--spelling-correction/--no-spelling-correction",
+    default=False,
+    show_default=True,
+    help="The spelling index is an in-memory dictionary, so it is paged into every worker that uses it.",
+)
+@click.option(
+    "--max-results",
+    default=DEFAULT_MAX_RESULTS,
+    show_default=True,
+    help="Ranked results kept in a query's cursor for paging.",
+)
+@click.option(
+    "--cursor-directory",
+    type=click.Path(file_okay=False),
+    help="Directory shared by the workers for result cursors (defaults to a per-port temporary directory).",
+)
+@click.option("--max-sessions", default=DEFAULT_MAX_SESSIONS, show_default=True)
+@click.option(
+    "--session-idle-seconds",
+    default=DEFAULT_IDLE_SECONDS,
+    show_default=True,
+    help="Cursors not read for this long are evicted.",
+)
+def main(
+    index_directory_path: str,
+    host: str,
+    port: int,
+    workers: int,
+    max_expansions: int,
+    spelling_correction: bool,
+    max_results: int,
+    cursor_directory: Optional[str],
+    max_sessions: int,
+    session_idle_seconds: int,
+) -> None:
+    validate_paths(index_directory_path)
+    cursor_store = CursorStore(
+        cursor_directory
+        or os.path.join(tempfile.gettempdir(), f"serve-cursors-{port}"),
+        max_sessions,
+        session_idle_seconds,
+    )
+    serving_index = ServingIndex(
+        index_directory_path,
+        max_expansions,
+        spelling_correction,
+        cursor_store,
+        max_results,
+    )
+    server = PreforkHTTPServer((host, port), make_handler(serving_index))
+    # Objects allocated so far are never collected, so the garbage collector
+    # does not write to (and un-share) their pages in every worker.
+    gc.freeze()
+
+    children = serve_forever_in_workers(server, workers)
+    print(
+        f"Serving {index_directory_path} on http://{host}:{server.server_port} "
+        f"with {workers} workers (GET /search?q=...&limit=N, "
+        f"GET /search?cursor=...&page=N, GET /stats)."
+    )
+
+    def stop(signum, frame) -> None:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for pid in children:
+        os.waitpid(pid, 0)
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
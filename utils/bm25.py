@@ -0,0 +1,3 @@
+# BM25 parameters shared by search, the indexer and the index tools.
+K1 = 1.2
+B = 0.75
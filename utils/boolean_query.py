@@ -0,0 +1,217 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from utils.postings import (
+    difference_doc_ids,
+    intersect_doc_ids,
+    iter_doc_ids,
+    union,
+)
+
+OPERATORS = {"AND", "OR", "NOT"}
+TOKEN_PATTERN = re.compile(r"\(|\)|\w+")
+
+
+class QuerySyntaxError(Exception):
+    pass
+
+
+@dataclass
+class TermPlan:
+    term: str
+    postings: Sequence[int]
+    cost: int
+
+
+@dataclass
+class AndPlan:
+    positives: List["Plan"]
+    negatives: List["Plan"]
+    cost: int
+
+
+@dataclass
+class OrPlan:
+    children: List["Plan"]
+    cost: int
+
+
+@dataclass
+class NotPlan:
+    child: "Plan"
+    cost: int
+
+
+Plan = Union[TermPlan, AndPlan, OrPlan, NotPlan]
+
+
+def tokenize_query(query: str) -> List[str]:
+    cleaned_query = query.replace("\n", " ").replace("_", " ")
+    return [
+        token if token in OPERATORS or token in ("(", ")") else token.lower()
+        for token in TOKEN_PATTERN.findall(cleaned_query)
+    ]
+
+
+class _Parser:
+    def __init__(self, tokens: List[str]) -> None:
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self) -> str:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self) -> Tuple:
+        if not self.tokens:
+            raise QuerySyntaxError("The query is empty.")
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise QuerySyntaxError(f"Unexpected '{self.peek()}'.")
+        return node
+
+    def parse_or(self) -> Tuple:
+        children = [self.parse_and()]
+        while self.peek() == "OR":
+            self.take()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else ("or", children)
+
+    def parse_and(self) -> Tuple:
+        children = [self.parse_unary()]
+        while self.peek() not in (None, "OR", ")"):
+            if self.peek() == "AND":
+                self.take()
+            children.append(self.parse_unary())
+        return children[0] if len(children) == 1 else ("and", children)
+
+    def parse_unary(self) -> Tuple:
+        token = self.peek()
+        if token == "NOT":
+            self.take()
+            return ("not", self.parse_unary())
+        if token == "(":
+            self.take()
+            node = self.parse_or()
+            if self.peek() != ")":
+                raise QuerySyntaxError("Missing closing parenthesis.")
+            self.take()
+            return node
+        if token is None or token in OPERATORS or token == ")":
+            raise QuerySyntaxError(f"Expected a term but found '{token or 'end'}'.")
+        return ("term", self.take())
+
+
+def parse_query(query: str) -> Tuple:
+    return _Parser(tokenize_query(query)).parse()
+
+
+def compile_plan(
+    node: Tuple,
+    lexicon: Dict[str, int],
+    inverted_index: Dict[str, Sequence[int]],
+    num_docs: int,
+) -> Optional[Plan]:
+    # Terms missing from the lexicon compile to None and are dropped, matching
+    # the implicit-AND behaviour of ignoring unknown topic tokens.
+    kind = node[0]
+    if kind == "term":
+        if node[1] not in lexicon:
+            return None
+        postings = inverted_index.get(str(lexicon[node[1]]), [])
+        return TermPlan(node[1], postings, len(postings) // 2)
+
+    if kind == "not":
+        child = compile_plan(node[1], lexicon, inverted_index, num_docs)
+        return None if child is None else NotPlan(child, num_docs - child.cost)
+
+    children = [
+        plan
+        for plan in (
+            compile_plan(child, lexicon, inverted_index, num_docs) for child in node[1]
+        )
+        if plan is not None
+    ]
+    if not children:
+        return None
+    if kind == "or":
+        flattened = []
+        for child in children:
+            flattened.extend(child.children if isinstance(child, OrPlan) else [child])
+        flattened.sort(key=lambda plan: plan.cost)
+        return OrPlan(flattened, min(num_docs, sum(c.cost for c in flattened)))
+
+    positives, negatives = [], []
+    for child in children:
+        if isinstance(child, AndPlan):
+            positives.extend(child.positives)
+            negatives.extend(child.negatives)
+        elif isinstance(child, NotPlan):
+            negatives.append(child.child)
+        else:
+            positives.append(child)
+    positives.sort(key=lambda plan: plan.cost)
+    negatives.sort(key=lambda plan: plan.cost)
+    cost = positives[0].cost if positives else num_docs
+    return AndPlan(positives, negatives, cost)
+
+
+def _intersect_with(candidates: List[int], plan: Plan, num_docs: int) -> List[int]:
+    if isinstance(plan, TermPlan):
+        return intersect_doc_ids(candidates, plan.postings)
+    if isinstance(plan, NotPlan):
+        return _subtract(candidates, plan.child, num_docs)
+    return intersect_doc_ids(candidates, evaluate_plan(plan, num_docs), 1)
+
+
+def _subtract(candidates: List[int], plan: Plan, num_docs: int) -> List[int]:
+    if isinstance(plan, TermPlan):
+        return difference_doc_ids(candidates, plan.postings)
+    return difference_doc_ids(candidates, evaluate_plan(plan, num_docs), 1)
+
+
+def evaluate_plan(plan: Optional[Plan], num_docs: int) -> List[int]:
+    if plan is None:
+        return []
+    if isinstance(plan, TermPlan):
+        return list(iter_doc_ids(plan.postings))
+    if isinstance(plan, OrPlan):
+        return union(
+            (
+                iter_doc_ids(child.postings)
+                if isinstance(child, TermPlan)
+                else evaluate_plan(child, num_docs)
+            )
+            for child in plan.children
+        )
+    if isinstance(plan, NotPlan):
+        return _subtract(list(range(num_docs)), plan.child, num_docs)
+
+    if plan.positives:
+        candidates = evaluate_plan(plan.positives[0], num_docs)
+        for child in plan.positives[1:]:
+            if not candidates:
+                return []
+            candidates = _intersect_with(candidates, child, num_docs)
+    else:
+        candidates = list(range(num_docs))
+    for child in plan.negatives:
+        if not candidates:
+            break
+        candidates = _subtract(candidates, child, num_docs)
+    return candidates
+
+
+def run_query(
+    query: str,
+    lexicon: Dict[str, int],
+    inverted_index: Dict[str, Sequence[int]],
+    num_docs: int,
+) -> List[int]:
+    plan = compile_plan(parse_query(query), lexicon, inverted_index, num_docs)
+    return evaluate_plan(plan, num_docs)
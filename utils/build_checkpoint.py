@@ -0,0 +1,137 @@
+import itertools
+import json
+import os
+import shutil
+from typing import Dict, List, Optional
+
+CHECKPOINT_DIRECTORY = "build_checkpoint"
+STATE_FILE = "state.json"
+DEFAULT_CHECKPOINT_INTERVAL = 10000
+
+
+class CheckpointMismatchError(Exception):
+    pass
+
+
+def write_json_atomically(path: str, value) -> None:
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as f:
+        json.dump(value, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_path, path)
+
+
+class BuildCheckpointer:
+    # Every `interval` documents the postings gathered since the previous
+    # checkpoint are flushed to a numbered segment, together with the terms,
+    # doc lengths and DOCNOs added since then. A state file is replaced last,
+    # recording how many segments are complete and the uncompressed source
+    # offset and doc ID to continue from.
+    def __init__(
+        self,
+        destination_directory: str,
+        source_file: str,
+        porter_stem: bool,
+        interval: int = DEFAULT_CHECKPOINT_INTERVAL,
+    ) -> None:
+        self.directory = f"{destination_directory}/{CHECKPOINT_DIRECTORY}"
+        self.source_file = source_file
+        self.porter_stem = porter_stem
+        self.interval = interval
+        self.segments = 0
+        self.num_terms = 0
+        self.num_docs = 0
+
+    def due(self, doc_id: int) -> bool:
+        return self.interval > 0 and doc_id % self.interval == 0
+
+    def segment_path(self, segment: int) -> str:
+        return f"{self.directory}/segment-{segment:05d}.json"
+
+    def save(
+        self,
+        source_offset: int,
+        lexicon: Dict[str, int],
+        inverted_index: Dict[int, List[int]],
+        doc_lengths: List[int],
+        docnos: List[str],
+    ) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        write_json_atomically(
+            self.segment_path(self.segments),
+            {
+                "terms": list(itertools.islice(lexicon, self.num_terms, None)),
+                "postings": inverted_index,
+                "doc_lengths": doc_lengths[self.num_docs :],
+                "docnos": docnos[self.num_docs :],
+            },
+        )
+        self.segments += 1
+        self.num_terms = len(lexicon)
+        self.num_docs = len(docnos)
+        write_json_atomically(
+            f"{self.directory}/{STATE_FILE}",
+            {
+                "source_file": self.source_file,
+                "porter_stem": self.porter_stem,
+                "source_offset": source_offset,
+                "segments": self.segments,
+                "num_terms": self.num_terms,
+                "num_docs": self.num_docs,
+            },
+        )
+        inverted_index.clear()
+
+    def restore(
+        self, lexicon: Dict[str, int], doc_lengths: List[int], docnos: List[str]
+    ) -> Optional[int]:
+        # Reloads the lexicon, doc lengths and DOCNOs from the completed
+        # segments and returns the source offset to resume from, or None when
+        # no checkpoint has been written yet.
+        state_path = f"{self.directory}/{STATE_FILE}"
+        if not os.path.exists(state_path):
+            return None
+        with open(state_path) as f:
+            state = json.load(f)
+        if (
+            state["source_file"] != self.source_file
+            or state["porter_stem"] != self.porter_stem
+        ):
+            raise CheckpointMismatchError(
+                f"The checkpoint in {self.directory} was written for "
+                f"{state['source_file']} with Porter stemming "
+                f"{state['porter_stem']}."
+            )
+        for segment in range(state["segments"]):
+            with open(self.segment_path(segment)) as f:
+                contents = json.load(f)
+            for term in contents["terms"]:
+                lexicon[term] = len(lexicon) + 1
+            doc_lengths.extend(contents["doc_lengths"])
+            docnos.extend(contents["docnos"])
+        self.segments = state["segments"]
+        self.num_terms = state["num_terms"]
+        self.num_docs = state["num_docs"]
+        return state["source_offset"]
+
+    def merged_postings(
+        self, inverted_index: Dict[int, List[int]]
+    ) -> Dict[int, List[int]]:
+        # Segments hold consecutive doc ID ranges, so concatenating each term's
+        # postings segment by segment keeps them in doc ID order. Terms are
+        # emitted by term ID, the order an uninterrupted build inserts them in.
+        if not self.segments:
+            return inverted_index
+        merged = {}
+        for segment in range(self.segments):
+            with open(self.segment_path(segment)) as f:
+                postings = json.load(f)["postings"]
+            for term_id, segment_postings in postings.items():
+                merged.setdefault(int(term_id), []).extend(segment_postings)
+        for term_id, segment_postings in inverted_index.items():
+            merged.setdefault(term_id, []).extend(segment_postings)
+        return {term_id: merged[term_id] for term_id in sorted(merged)}
+
+    def remove(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,151 @@
+import bisect
+import datetime
+import mmap
+import os
+import re
+import struct
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.postings import POSTING_STRIDE, postings_in_range
+
+DOC_DATES_FILE = "doc-dates.bin"
+MAGIC = b"DDAT"
+VERSION = 1
+HEADER = struct.Struct("<4sIIII")
+DOCNO_DATE_REGEX = re.compile(r"LA([0-9]{6})-[0-9]{4}")
+
+
+class DocDatesFormatError(Exception):
+    pass
+
+
+def date_key(date: datetime.date) -> int:
+    return date.year * 10000 + date.month * 100 + date.day
+
+
+def parse_date_key(text: str) -> int:
+    return date_key(datetime.date.fromisoformat(text))
+
+
+def docno_date(docno: str) -> int:
+    match = DOCNO_DATE_REGEX.search(docno)
+    if not match:
+        return 0
+    return date_key(datetime.datetime.strptime(match.group(1), "%m%d%y"))
+
+
+def date_ranges(dates: Sequence[int]) -> Optional[List[Tuple[int, int]]]:
+    # (date, first doc ID) for every distinct date, or None when IDs are not
+    # in date order and a date cannot be mapped to one contiguous ID range.
+    ranges = []
+    for doc_id, date in enumerate(dates):
+        if ranges and date < ranges[-1][0]:
+            return None
+        if not ranges or date != ranges[-1][0]:
+            ranges.append((date, doc_id))
+    return ranges
+
+
+def write_doc_dates(path: str, docnos: Sequence[str]) -> None:
+    dates = [docno_date(docno) for docno in docnos]
+    ranges = date_ranges(dates)
+    with open(path, "wb") as f:
+        f.write(
+            HEADER.pack(
+                MAGIC, VERSION, len(dates), ranges is not None, len(ranges or [])
+            )
+        )
+        f.write(np.asarray(dates, dtype="<u4").tobytes())
+        if ranges:
+            f.write(np.asarray(ranges, dtype="<u4").tobytes())
+
+
+class DocDates:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise DocDatesFormatError(f"{path} is too small to be a date file.")
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.num_docs, ordered, num_ranges = HEADER.unpack_from(
+            self._buffer, 0
+        )
+        if magic != MAGIC or version != VERSION:
+            raise DocDatesFormatError(f"{path} is not a version {VERSION} date file.")
+        self.ordered = bool(ordered)
+        self.dates = np.frombuffer(
+            self._buffer, dtype="<u4", count=self.num_docs, offset=HEADER.size
+        )
+        ranges = np.frombuffer(
+            self._buffer,
+            dtype="<u4",
+            count=num_ranges * 2,
+            offset=HEADER.size + self.num_docs * 4,
+        ).reshape(-1, 2)
+        self.range_dates = ranges[:, 0].tolist()
+        self.range_starts = ranges[:, 1].tolist()
+
+    def __reduce__(self):
+        return (DocDates, (self.path,))
+
+    def __len__(self) -> int:
+        return self.num_docs
+
+    def date(self, doc_id: int) -> int:
+        return int(self.dates[doc_id])
+
+    def first_doc_id(self, date: int) -> int:
+        # The first doc ID dated on or after `date`; only valid when ordered.
+        position = bisect.bisect_left(self.range_dates, date)
+        if position == len(self.range_starts):
+            return self.num_docs
+        return self.range_starts[position]
+
+
+class DateFilter:
+    # Keeps documents dated strictly after `after` and strictly before
+    # `before` (YYYYMMDD keys). With date-ordered IDs the filter is one doc ID
+    # range, and each postings list is cut to it with two gallops; otherwise
+    # every posting's date is looked up in the packed date array.
+    def __init__(
+        self, doc_dates: DocDates, after: Optional[int], before: Optional[int]
+    ) -> None:
+        self.doc_dates = doc_dates
+        self.low = after + 1 if after is not None else 0
+        self.high = before if before is not None else 2**32
+        self.id_range = None
+        if doc_dates.ordered:
+            self.id_range = (
+                doc_dates.first_doc_id(self.low),
+                doc_dates.first_doc_id(self.high),
+            )
+
+    @property
+    def empty(self) -> bool:
+        if self.low >= self.high:
+            return True
+        return self.id_range is not None and self.id_range[0] >= self.id_range[1]
+
+    def restrict(self, postings: Sequence[int]) -> Sequence[int]:
+        if self.id_range is not None:
+            return postings_in_range(postings, *self.id_range)
+        pairs = np.asarray(postings).reshape(-1, POSTING_STRIDE)
+        dates = self.doc_dates.dates[pairs[:, 0]]
+        return pairs[(dates >= self.low) & (dates < self.high)].ravel().tolist()
+
+
+def load_doc_dates(index_directory_path: str) -> Optional[DocDates]:
+    dates_path = f"{index_directory_path}/{DOC_DATES_FILE}"
+    registrar_path = f"{index_directory_path}/index_registrar.txt"
+    if not os.path.exists(dates_path):
+        return None
+    if os.path.exists(registrar_path) and os.path.getmtime(
+        dates_path
+    ) < os.path.getmtime(registrar_path):
+        return None
+    try:
+        return DocDates(dates_path)
+    except DocDatesFormatError:
+        return None
@@ -0,0 +1,108 @@
+import mmap
+import os
+import struct
+import zlib
+from typing import Optional, Sequence
+
+DOCNO_MAP_FILE = "docno_map.bin"
+MAGIC = b"DNOM"
+VERSION = 1
+HEADER = struct.Struct("<4sIIQQ")
+SLOT = struct.Struct("<I")
+
+
+class DocnoMapFormatError(Exception):
+    pass
+
+
+def slot_count(num_docs: int) -> int:
+    slots = 1
+    while slots < num_docs * 2:
+        slots *= 2
+    return slots
+
+
+def write_docno_map(path: str, docnos: Sequence[str]) -> None:
+    encoded = [docno.encode("utf-8") for docno in docnos]
+    width = max((len(docno) for docno in encoded), default=1)
+    slots = slot_count(len(encoded))
+    table = [0] * slots
+    for doc_id, docno in enumerate(encoded):
+        slot = zlib.crc32(docno) & (slots - 1)
+        while table[slot] and encoded[table[slot] - 1] != docno:
+            slot = (slot + 1) & (slots - 1)
+        # A DOCNO that appears twice resolves to its latest internal ID.
+        table[slot] = doc_id + 1
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, width, len(encoded), slots))
+        for docno in encoded:
+            f.write(docno.ljust(width, b"\0"))
+        f.write(struct.pack(f"<{slots}I", *table))
+
+
+class DocnoMap:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise DocnoMapFormatError(f"{path} is too small to be a DOCNO map.")
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.width, self.num_docs, self.slots = HEADER.unpack_from(
+            self._buffer, 0
+        )
+        if magic != MAGIC or version != VERSION:
+            raise DocnoMapFormatError(f"{path} is not a version {VERSION} DOCNO map.")
+        self.table_start = HEADER.size + self.width * self.num_docs
+
+    def __reduce__(self):
+        return (DocnoMap, (self.path,))
+
+    def __len__(self) -> int:
+        return self.num_docs
+
+    def __getitem__(self, doc_id: int) -> str:
+        docno = self.docno(doc_id)
+        if docno is None:
+            raise KeyError(doc_id)
+        return docno
+
+    def _raw_docno(self, doc_id: int) -> bytes:
+        start = HEADER.size + doc_id * self.width
+        return self._buffer[start : start + self.width].rstrip(b"\0")
+
+    def docno(self, doc_id: int) -> Optional[str]:
+        if not 0 <= doc_id < self.num_docs:
+            return None
+        return self._raw_docno(doc_id).decode("utf-8")
+
+    def internal_id(self, docno: str) -> Optional[int]:
+        if not self.num_docs:
+            return None
+        key = docno.encode("utf-8")
+        slot = zlib.crc32(key) & (self.slots - 1)
+        while True:
+            entry = SLOT.unpack_from(self._buffer, self.table_start + slot * 4)[0]
+            if not entry:
+                return None
+            if self._raw_docno(entry - 1) == key:
+                return entry - 1
+            slot = (slot + 1) & (self.slots - 1)
+
+    def close(self) -> None:
+        self._buffer.close()
+
+
+def load_docno_map(index_directory_path: str) -> Optional[DocnoMap]:
+    map_path = f"{index_directory_path}/{DOCNO_MAP_FILE}"
+    registrar_path = f"{index_directory_path}/index_registrar.txt"
+    if not os.path.exists(map_path):
+        return None
+    if os.path.exists(registrar_path) and os.path.getmtime(map_path) < os.path.getmtime(
+        registrar_path
+    ):
+        return None
+    try:
+        return DocnoMap(map_path)
+    except DocnoMapFormatError:
+        return None
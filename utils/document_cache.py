@@ -0,0 +1,87 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable
+
+DEFAULT_CACHE_BYTES = 32 * 2**20
+DEFAULT_PREFETCH_WORKERS = 10
+
+
+class DocumentCache:
+    def __init__(
+        self,
+        loader: Callable[[str], str],
+        max_bytes: int = DEFAULT_CACHE_BYTES,
+        workers: int = DEFAULT_PREFETCH_WORKERS,
+    ) -> None:
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.prefetch_hits = 0
+        self.misses = 0
+        self._documents = OrderedDict()
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def _store(self, docno: str, document: str) -> None:
+        # Sized by their UTF-8 encoding, which is what max_bytes bounds.
+        size = len(document.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if docno in self._documents:
+                return
+            self._documents[docno] = (document, size)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._documents.popitem(last=False)
+                self.size_bytes -= evicted_size
+
+    def _load(self, docno: str) -> str:
+        try:
+            document = self.loader(docno)
+            self._store(docno, document)
+            return document
+        finally:
+            with self._lock:
+                self._pending.pop(docno, None)
+
+    def prefetch(self, docnos: Iterable[str]) -> None:
+        with self._lock:
+            for docno in docnos:
+                if docno not in self._documents and docno not in self._pending:
+                    self._pending[docno] = self._executor.submit(self._load, docno)
+
+    def get(self, docno: str) -> str:
+        with self._lock:
+            if docno in self._documents:
+                self._documents.move_to_end(docno)
+                self.hits += 1
+                return self._documents[docno][0]
+            pending = self._pending.get(docno)
+            if pending is not None:
+                self.prefetch_hits += 1
+            else:
+                self.misses += 1
+        if pending is not None:
+            return pending.result()
+        document = self.loader(docno)
+        self._store(docno, document)
+        return document
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.prefetch_hits + self.misses
+            return dict(
+                hits=self.hits,
+                prefetch_hits=self.prefetch_hits,
+                misses=self.misses,
+                hit_rate=(self.hits + self.prefetch_hits) / lookups if lookups else 0.0,
+                documents=len(self._documents),
+                size_bytes=self.size_bytes,
+            )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
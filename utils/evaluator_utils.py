@@ -18,12 +18,18 @@ class IndexArtifactsNotFound(Exception):
 
 
 INSTRUCTIONS = """
-Please provide three positional arguments:\n1. The absolute path to the QREL file.\n2. The absolute path to the individual results file, formatted in the standard TREC format.
+Please provide three positional arguments:\n1. The absolute path to the QREL file.\n2. The absolute path to the individual results file, formatted in the standard TREC format. Several results files may be given to compare runs.
 """
 
 
+def as_result_paths(results):
+    if isinstance(results, str):
+        return [results]
+    return list(results or [])
+
+
 def validate_input(qrel, results):
-    args = [arg for arg in [qrel, results] if arg]
+    args = [arg for arg in [qrel, *as_result_paths(results)] if arg]
     try:
         if len(args) < 2:
             raise MissingArgumentsError(
@@ -40,10 +46,11 @@ def validate_absolute_nature(qrel, results):
             raise InvalidPathError(
                 "Please provide the absolute file path for the QREL file."
             )
-        if not os.path.isabs(results):
-            raise InvalidPathError(
-                "Please provide the absolute file path for the results file."
-            )
+        for result in as_result_paths(results):
+            if not os.path.isabs(result):
+                raise InvalidPathError(
+                    "Please provide the absolute file path for the results file."
+                )
     except InvalidPathError as e:
         print(f"Path Specification Error: {e}\n{INSTRUCTIONS}")
         exit()
@@ -60,10 +67,11 @@ def validate_existing_file(qrel, results):
         exit()
 
     try:
-        if not os.path.exists(results):
-            raise FileDoesNotExistError(
-                f"The results file does not exist according to the provided file path: {results}."
-            )
+        for result in as_result_paths(results):
+            if not os.path.exists(result):
+                raise FileDoesNotExistError(
+                    f"The results file does not exist according to the provided file path: {result}."
+                )
     except FileDoesNotExistError as e:
         print(f"File Does Not Exist Error: {e}\n")
         exit()
@@ -0,0 +1,153 @@
+import json
+import mmap
+import os
+import struct
+from array import array
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from utils.lexicon import read_text_lexicon
+
+FLAT_INDEX_FILE = "flat_index.bin"
+MAGIC = b"FLAT"
+VERSION = 1
+HEADER = struct.Struct("<4sIQQQd")
+
+
+class FlatIndexFormatError(Exception):
+    pass
+
+
+def write_flat_index(
+    path: str,
+    num_terms: int,
+    inverted_index: Dict,
+    doc_lengths: Sequence[int],
+) -> None:
+    # Layout: header, an int64 offset per term ID (plus one sentinel), the
+    # int32 doc lengths padded to 8 bytes, then every term's interleaved
+    # postings back to back in term ID order.
+    offsets = array("q", [0, 0])
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as f:
+        lengths = array("i", doc_lengths)
+        lengths_size = len(lengths) * lengths.itemsize
+        padding = b"\0" * (-lengths_size % 8)
+        postings_start = HEADER.size + (num_terms + 2) * 8 + lengths_size + len(padding)
+        f.seek(postings_start)
+        for term_id in range(1, num_terms + 1):
+            postings = inverted_index.get(str(term_id), inverted_index.get(term_id, []))
+            f.write(array("i", postings).tobytes())
+            offsets.append(offsets[-1] + len(postings))
+
+        average_doc_length = sum(lengths) / len(lengths) if lengths else 0.0
+        f.seek(0)
+        f.write(
+            HEADER.pack(
+                MAGIC, VERSION, num_terms, len(lengths), offsets[-1], average_doc_length
+            )
+        )
+        f.write(offsets.tobytes())
+        f.write(lengths.tobytes())
+        f.write(padding)
+    os.replace(temporary_path, path)
+
+
+class FlatIndex:
+    # A read-only, dict-like view of inverted_index.json over one mmapped file.
+    # Postings come back as memoryview slices, so every process that maps the
+    # file shares the same page-cache pages and nothing is copied per query.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise FlatIndexFormatError(f"{path} is too small to be a flat index.")
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            self.num_terms,
+            self.num_docs,
+            num_postings,
+            self.average_doc_length,
+        ) = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise FlatIndexFormatError(f"{path} is not a version {VERSION} flat index.")
+
+        view = memoryview(self._buffer)
+        offsets_end = HEADER.size + (self.num_terms + 2) * 8
+        lengths_end = offsets_end + self.num_docs * 4
+        postings_start = lengths_end + (-(self.num_docs * 4) % 8)
+        self.offsets = view[HEADER.size : offsets_end].cast("q")
+        self.doc_lengths = view[offsets_end:lengths_end].cast("i")
+        self.postings = view[postings_start : postings_start + num_postings * 4].cast(
+            "i"
+        )
+        self.postings_offset = postings_start
+
+    def __reduce__(self):
+        return (FlatIndex, (self.path,))
+
+    def _term_id(self, key) -> Optional[int]:
+        try:
+            term_id = int(key)
+        except (TypeError, ValueError):
+            return None
+        return term_id if 1 <= term_id <= self.num_terms else None
+
+    def __getitem__(self, key) -> memoryview:
+        term_id = self._term_id(key)
+        if term_id is None:
+            raise KeyError(key)
+        return self.postings[self.offsets[term_id] : self.offsets[term_id + 1]]
+
+    def postings_size(self, key) -> int:
+        # Bytes taken by a term's postings, read from the offsets alone.
+        term_id = self._term_id(key)
+        if term_id is None:
+            return 0
+        return (self.offsets[term_id + 1] - self.offsets[term_id]) * 4
+
+    def get(self, key, default=None):
+        return default if self._term_id(key) is None else self[key]
+
+    def __contains__(self, key) -> bool:
+        return self._term_id(key) is not None
+
+    def __len__(self) -> int:
+        return self.num_terms
+
+    def __iter__(self) -> Iterator[str]:
+        return (str(term_id) for term_id in range(1, self.num_terms + 1))
+
+    def items(self) -> Iterator[Tuple[str, memoryview]]:
+        return ((key, self[key]) for key in self)
+
+
+def build_flat_index(index_directory_path: str) -> None:
+    with open(f"{index_directory_path}/inverted_index.json") as f:
+        inverted_index = json.load(f)
+    with open(f"{index_directory_path}/doc-lengths.txt") as f:
+        doc_lengths = [int(length) for length in f.read().splitlines()]
+    write_flat_index(
+        f"{index_directory_path}/{FLAT_INDEX_FILE}",
+        len(read_text_lexicon(index_directory_path)),
+        inverted_index,
+        doc_lengths,
+    )
+
+
+def load_flat_index(index_directory_path: str) -> FlatIndex:
+    flat_path = f"{index_directory_path}/{FLAT_INDEX_FILE}"
+    sources = [
+        f"{index_directory_path}/{name}"
+        for name in ["lexicon.txt", "inverted_index.json", "doc-lengths.txt"]
+    ]
+    if not os.path.exists(flat_path) or any(
+        os.path.getmtime(source) > os.path.getmtime(flat_path) for source in sources
+    ):
+        build_flat_index(index_directory_path)
+    try:
+        return FlatIndex(flat_path)
+    except FlatIndexFormatError:
+        build_flat_index(index_directory_path)
+        return FlatIndex(flat_path)
@@ -1,44 +1,129 @@
 import click
 import datetime
 import re
-from typing import Optional
+import sys
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 
+import docno_map
 import get_doc_utils
 
 
-def lookup_by_internal_id(source_directory: str, value: str) -> Optional[str]:
+def lookup_docno_by_internal_id(source_directory: str, value: str) -> Optional[str]:
+    index = int(value)
+    mapping = docno_map.load_docno_map(source_directory)
+    if mapping is not None:
+        return mapping.docno(index)
+
     index_registrar = f"{source_directory}/index_registrar.txt"
     with open(index_registrar, "r") as index_registrar:
-        lines = index_registrar.readlines()
-        index = int(value)
-        try:
-            docno = lines[index]
-        except IndexError:
-            return None
-    docno = docno.strip()
+        for line_number, line in enumerate(index_registrar):
+            if line_number == index:
+                return line.strip()
+    return None
+
+
+def lookup_by_internal_id(source_directory: str, value: str) -> Optional[str]:
+    docno = lookup_docno_by_internal_id(source_directory, value)
+    if docno is None:
+        return None
     output = lookup_by_docno(source_directory, docno)
     return output
 
 
-def lookup_by_docno(source_directory: str, docno: str) -> Optional[str]:
+def document_path(source_directory: str, docno: str) -> str:
     match = re.search("LA([0-9]{6})-[0-9]{4}", docno)
     match = match.group(1)
     date_components = datetime.datetime.strptime(match, "%m%d%y")
     year, month, day = date_components.year, date_components.month, date_components.day
+    return f"{source_directory}/{year}/{month}/{day}/{docno}.txt"
 
-    search_directory = f"{source_directory}/{year}/{month}/{day}/{docno}.txt"
+
+def lookup_by_docno(source_directory: str, docno: str) -> Optional[str]:
+    search_directory = document_path(source_directory, docno)
     with open(search_directory) as f:
         output = f.read()
     return output
 
 
+def read_identifiers(batch_source: str) -> Iterator[str]:
+    stream = sys.stdin if batch_source == "-" else open(batch_source)
+    try:
+        for line in stream:
+            if line.strip():
+                yield line.strip()
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def internal_id_resolver(source_directory: str) -> Callable[[int], Optional[str]]:
+    mapping = docno_map.load_docno_map(source_directory)
+    if mapping is not None:
+        return mapping.docno
+
+    with open(f"{source_directory}/index_registrar.txt") as f:
+        docnos = f.read().splitlines()
+
+    def resolve(doc_id: int) -> Optional[str]:
+        return docnos[doc_id] if 0 <= doc_id < len(docnos) else None
+
+    return resolve
+
+
+def resolve_batch(
+    source_directory: str, identifier: str, values: Iterable[str]
+) -> Tuple[List[Tuple[str, str]], List[str]]:
+    if identifier == "id":
+        lookup = internal_id_resolver(source_directory)
+
+    found, missing = [], []
+    for value in values:
+        if identifier == "id":
+            docno = lookup(int(value)) if value.lstrip("-").isdigit() else None
+        else:
+            docno = value if re.match(r"LA[0-9]{6}-[0-9]{4}", value) else None
+        try:
+            found.append((document_path(source_directory, docno), value))
+        except (AttributeError, TypeError, ValueError):
+            missing.append(value)
+    # Reading in path order keeps each day's directory hot and the disk head
+    # (or readahead window) moving forward instead of seeking back and forth.
+    found.sort()
+    return found, missing
+
+
+def stream_batch(source_directory: str, identifier: str, batch_source: str) -> None:
+    found, missing = resolve_batch(
+        source_directory, identifier, read_identifiers(batch_source)
+    )
+    for path, value in found:
+        try:
+            with open(path) as f:
+                sys.stdout.write(f.read())
+        except FileNotFoundError:
+            missing.append(value)
+            continue
+        sys.stdout.write("\n\n")
+    for value in missing:
+        print(f"Document Mismatch Error: Document not found: {value}", file=sys.stderr)
+
+
 @click.command()
 @click.argument("source_directory", nargs=1, required=False)
 @click.argument("identifier", nargs=1, required=False)
 @click.argument("value", nargs=1, required=False)
-def main(source_directory: str, identifier: str, value: str):
-    get_doc_utils.validate_arguements(source_directory, identifier, value)
+@click.option(
+    "--batch",
+    is_flag=True,
+    help="Treat VALUE as a file of ids or DOCNOs, one per line ('-' for stdin).",
+)
+def main(source_directory: str, identifier: str, value: str, batch: bool):
+    get_doc_utils.validate_arguments(source_directory, identifier, value, batch)
     identifier = identifier.lower()
+    if batch:
+        stream_batch(source_directory, identifier, value)
+        return
+
     if identifier == "id":
         result = lookup_by_internal_id(source_directory, value)
     elif identifier == "docno":
@@ -27,6 +27,10 @@ class InvalidValueError(Exception):
     pass
 
 
+class BatchFileNotFoundError(Exception):
+    pass
+
+
 def validate_input(source_directory: str, identifier: str, value: Any) -> None:
     args = [arg for arg in [source_directory, identifier, value] if arg]
     try:
@@ -93,9 +97,25 @@ def enforce_value(identifier: str, value: str) -> None:
         exit()
 
 
-def validate_arguments(source_directory: str, identifier: str, value: str) -> None:
+def validate_batch_source(batch_source: str) -> None:
+    try:
+        if batch_source != "-" and not os.path.isfile(batch_source):
+            raise BatchFileNotFoundError(
+                f"The batch file: {batch_source} does not exist. Use '-' to read from stdin."
+            )
+    except BatchFileNotFoundError as e:
+        print(f"Batch File Not Found Error: {e}")
+        exit()
+
+
+def validate_arguments(
+    source_directory: str, identifier: str, value: str, batch: bool = False
+) -> None:
     validate_input(source_directory, identifier, value)
     validate_absolute_nature(source_directory)
     validate_existing_directory(source_directory)
     validate_identifier_choice(identifier)
-    enforce_value(identifier, value)
+    if batch:
+        validate_batch_source(value)
+    else:
+        enforce_value(identifier, value)
@@ -0,0 +1,114 @@
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from utils.flat_index import FlatIndex
+from utils.liveness import Liveness
+from utils.pruning import length_normalizers
+
+DEFAULT_BLOCK_SIZE = 256
+
+
+def build_impact_matrix(
+    flat_index: FlatIndex,
+    k1: float,
+    b: float,
+    document_frequencies: Optional[Sequence[int]] = None,
+    liveness: Optional[Liveness] = None,
+) -> sparse.csr_matrix:
+    # Row t holds term t's BM25 contribution to every document it occurs in,
+    # so the scores of a bag of query terms are the sum of their rows. The
+    # flat index already stores postings contiguously in term ID order, which
+    # is exactly CSR layout once the offsets are halved.
+    postings = np.frombuffer(flat_index.postings, dtype=np.int32)
+    documents, frequencies = postings[::2], postings[1::2].astype(np.float64)
+    indptr = np.frombuffer(flat_index.offsets, dtype=np.int64) // 2
+    doc_lengths = np.frombuffer(flat_index.doc_lengths, dtype=np.int32)
+    num_docs, average_doc_length = flat_index.num_docs, flat_index.average_doc_length
+    if liveness is not None:
+        # Deleted documents' postings are dropped, and N, avgdl and df are
+        # taken over the live documents.
+        live = ~liveness.deleted_mask(documents)
+        term_ids = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))[live]
+        documents, frequencies = documents[live], frequencies[live]
+        indptr = np.concatenate(
+            ([0], np.cumsum(np.bincount(term_ids, minlength=len(indptr) - 1)))
+        )
+        num_docs, average_doc_length = liveness.collection_statistics(doc_lengths)
+    lengths = np.diff(indptr)
+
+    normalizers = length_normalizers(doc_lengths, average_doc_length, k1, b)
+    dfs = lengths if document_frequencies is None else np.asarray(document_frequencies)
+    idf = np.log((num_docs - dfs + 0.5) / (dfs + 0.5))
+    impacts = (
+        np.repeat(idf, lengths) * frequencies / (frequencies + normalizers[documents])
+    )
+    return sparse.csr_matrix(
+        (impacts, documents, indptr),
+        shape=(flat_index.num_terms + 1, flat_index.num_docs),
+    )
+
+
+def query_matrix(queries: List[List[int]], num_terms: int) -> sparse.csr_matrix:
+    # A repeated query term is summed once per occurrence, as it is by
+    # search.calculate_document_scores.
+    rows = np.repeat(np.arange(len(queries)), [len(terms) for terms in queries])
+    columns = np.fromiter(
+        (term_id for terms in queries for term_id in terms), dtype=np.int64
+    )
+    return sparse.csr_matrix(
+        (np.ones(len(columns)), (rows, columns)),
+        shape=(len(queries), num_terms + 1),
+    )
+
+
+def top_k_rows(
+    scores: sparse.csr_matrix,
+    k: int,
+    matches: Optional[sparse.csr_matrix] = None,
+) -> Iterator[List[Tuple[int, float]]]:
+    # Highest score first; ties go to the lower doc ID.
+    for row in range(scores.shape[0]):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        values, documents = scores.data[start:end], scores.indices[start:end]
+        if matches is not None:
+            # The sparse product drops documents whose BM25 sums to exactly
+            # 0.0; they still match a query term, so they come back as zeros.
+            missing = np.setdiff1d(
+                matches.indices[matches.indptr[row] : matches.indptr[row + 1]],
+                documents,
+            )
+            values = np.concatenate((values, np.zeros(len(missing))))
+            documents = np.concatenate((documents, missing))
+        if len(values) > k:
+            keep = np.argpartition(-values, k - 1)[:k]
+            values, documents = values[keep], documents[keep]
+        order = np.lexsort((documents, -values))
+        yield [(int(documents[i]), float(values[i])) for i in order]
+
+
+def batch_scores(
+    impact_matrix: sparse.csr_matrix,
+    queries: List[List[int]],
+    k: int,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> Iterator[List[Tuple[int, float]]]:
+    # One sparse product per block of queries, so at most block_size rows of
+    # accumulated scores are held in memory at a time.
+    num_terms = impact_matrix.shape[0] - 1
+    # Same postings with every impact set to 1, whose product with a block
+    # counts matched query terms and so never cancels to zero.
+    postings = sparse.csr_matrix(
+        (
+            np.ones(impact_matrix.nnz, dtype=np.float32),
+            impact_matrix.indices,
+            impact_matrix.indptr,
+        ),
+        shape=impact_matrix.shape,
+    )
+    for start in range(0, len(queries), block_size):
+        block = query_matrix(queries[start : start + block_size], num_terms)
+        yield from top_k_rows(
+            (block @ impact_matrix).tocsr(), k, (block @ postings).tocsr()
+        )
@@ -1,6 +1,6 @@
 import os
 import re
-from typing import Optional
+from typing import Optional, Tuple
 
 
 class InvalidPathError(Exception):
@@ -19,6 +19,10 @@ class InvalidPorterStemArgumentError(Exception):
     pass
 
 
+class VariantResumeError(Exception):
+    pass
+
+
 INSTRUCTIONS = """
 Please provide three positional arguments:\n1. The absolute path to the source data file.\n2. The absolute path to the desired, destination directory for the index.\n3. If the tokenizer includes Porter Stemming (True/False)
 """
@@ -96,8 +100,22 @@ def validate_porter_stem(porter_stem: str) -> None:
         exit()
 
 
-def validate_paths(source: str, destination: str, porter_stem: str) -> None:
+def validate_variants(variant_names: Tuple[str, ...], resume: bool) -> None:
+    try:
+        if variant_names and resume:
+            raise VariantResumeError(
+                "Builds with --variant are not checkpointed and cannot be resumed."
+            )
+    except VariantResumeError as e:
+        print(f"Variant Resume Error: {e}\n")
+        exit()
+
+
+def validate_paths(
+    source: str, destination: str, porter_stem: str, resume: bool = False
+) -> None:
     validate_arguments(source, destination, porter_stem)
     validate_absolute_nature(source, destination)
-    validate_existing_directory(destination)
+    if not resume:
+        validate_existing_directory(destination)
     validate_porter_stem(porter_stem)
@@ -0,0 +1,104 @@
+import os
+
+INSTRUCTIONS = """
+Please provide the absolute path to an existing index directory created by index_engine.py.
+"""
+
+
+class MissingArgumentsError(Exception):
+    pass
+
+
+class InvalidPathError(Exception):
+    pass
+
+
+class IndexArtifactsNotFound(Exception):
+    pass
+
+
+def validate_input(index_directory_path):
+    try:
+        if not index_directory_path:
+            raise MissingArgumentsError(
+                "Please enter the absolute index directory path.\n\nExpected: 1\nFound: 0"
+            )
+    except MissingArgumentsError as e:
+        print(f"Missing Arguements Error. {e}\n{INSTRUCTIONS}")
+        exit()
+
+
+def validate_absolute_nature(index_directory_path):
+    try:
+        if not os.path.isabs(index_directory_path):
+            raise InvalidPathError(
+                "Please provide the absolute file path for the index directory path."
+            )
+    except InvalidPathError as e:
+        print(f"Path Specification Error: {e}\n{INSTRUCTIONS}")
+        exit()
+
+
+def validate_index_artifacts(index_directory_path, mandatory_files):
+    try:
+        for file in mandatory_files:
+            file_path = os.path.join(index_directory_path, file)
+            if not os.path.exists(file_path):
+                raise IndexArtifactsNotFound(
+                    f"The file '{file}' does not exist in the directory '{index_directory_path}'"
+                )
+    except IndexArtifactsNotFound as e:
+        print(f"Missing Index File: {e}\n")
+        exit()
+
+
+def validate_paths(index_directory_path, mandatory_files):
+    validate_input(index_directory_path)
+    validate_absolute_nature(index_directory_path)
+    validate_index_artifacts(index_directory_path, mandatory_files)
+
+
+class ExistingDirectoryError(Exception):
+    pass
+
+
+def validate_destination(destination_directory_path):
+    try:
+        if not destination_directory_path or not os.path.isabs(
+            destination_directory_path
+        ):
+            raise InvalidPathError(
+                "Please provide the absolute path for the destination directory."
+            )
+        if os.path.exists(destination_directory_path):
+            raise ExistingDirectoryError(
+                f"The destination directory '{destination_directory_path}' already exists."
+            )
+    except InvalidPathError as e:
+        print(f"Path Specification Error: {e}\n")
+        exit()
+    except ExistingDirectoryError as e:
+        print(f"Existing Directory Error: {e}\n")
+        exit()
+
+
+class SourceFileNotFound(Exception):
+    pass
+
+
+def validate_source(source_file_path):
+    try:
+        if not source_file_path or not os.path.isabs(source_file_path):
+            raise InvalidPathError(
+                "Please provide the absolute path for the source data file."
+            )
+        if not os.path.isfile(source_file_path):
+            raise SourceFileNotFound(
+                f"The source data file '{source_file_path}' does not exist."
+            )
+    except InvalidPathError as e:
+        print(f"Path Specification Error: {e}\n")
+        exit()
+    except SourceFileNotFound as e:
+        print(f"Missing Source File: {e}\n")
+        exit()
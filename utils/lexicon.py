@@ -0,0 +1,196 @@
+import mmap
+import os
+import struct
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+FRONT_CODED_LEXICON_FILE = "lexicon.fc"
+MAGIC = b"FCLX"
+VERSION = 1
+BLOCK_SIZE = 16
+HEADER = struct.Struct("<4sIIQQQ")
+OFFSET = struct.Struct("<Q")
+
+
+class LexiconFormatError(Exception):
+    pass
+
+
+def encode_varint(value: int, out: bytearray) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(buffer, position: int) -> Tuple[int, int]:
+    value, shift = 0, 0
+    while True:
+        byte = buffer[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def shared_prefix_length(a: bytes, b: bytes) -> int:
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def write_front_coded_lexicon(
+    path: str, terms: Iterable[str], block_size: int = BLOCK_SIZE
+) -> None:
+    entries = sorted(
+        (term.encode("utf-8"), term_id) for term_id, term in enumerate(terms, 1)
+    )
+    data, offsets = bytearray(), []
+    previous = b""
+    for i, (term, term_id) in enumerate(entries):
+        if i % block_size == 0:
+            offsets.append(HEADER.size + len(data))
+            previous = b""
+        shared = shared_prefix_length(previous, term)
+        encode_varint(shared, data)
+        encode_varint(len(term) - shared, data)
+        data += term[shared:]
+        encode_varint(term_id, data)
+        previous = term
+
+    offsets_start = HEADER.size + len(data)
+    with open(path, "wb") as f:
+        f.write(
+            HEADER.pack(
+                MAGIC, VERSION, block_size, len(entries), len(offsets), offsets_start
+            )
+        )
+        f.write(data)
+        for offset in offsets:
+            f.write(OFFSET.pack(offset))
+
+
+class FrontCodedLexicon:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise LexiconFormatError(f"{path} is too small to be a lexicon.")
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            self.block_size,
+            self.num_terms,
+            self.num_blocks,
+            self.offsets_start,
+        ) = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise LexiconFormatError(f"{path} is not a version {VERSION} lexicon.")
+
+    def __reduce__(self):
+        return (FrontCodedLexicon, (self.path,))
+
+    def __len__(self) -> int:
+        return self.num_terms
+
+    def __contains__(self, term: str) -> bool:
+        return self.get(term) is not None
+
+    def __getitem__(self, term: str) -> int:
+        term_id = self.get(term)
+        if term_id is None:
+            raise KeyError(term)
+        return term_id
+
+    def __iter__(self) -> Iterator[str]:
+        for term, _ in self.items():
+            yield term
+
+    def _block_offset(self, block: int) -> int:
+        return OFFSET.unpack_from(self._buffer, self.offsets_start + 8 * block)[0]
+
+    def _first_term(self, block: int) -> bytes:
+        position = self._block_offset(block)
+        _, position = decode_varint(self._buffer, position)
+        length, position = decode_varint(self._buffer, position)
+        return self._buffer[position : position + length]
+
+    def _find_block(self, key: bytes) -> int:
+        lo, hi = 0, self.num_blocks
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._first_term(mid) <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return max(lo - 1, 0)
+
+    def _iter_block(self, block: int) -> Iterator[Tuple[bytes, int]]:
+        position = self._block_offset(block)
+        count = min(self.block_size, self.num_terms - block * self.block_size)
+        term = b""
+        for _ in range(count):
+            shared, position = decode_varint(self._buffer, position)
+            length, position = decode_varint(self._buffer, position)
+            term = term[:shared] + self._buffer[position : position + length]
+            position += length
+            term_id, position = decode_varint(self._buffer, position)
+            yield term, term_id
+
+    def get(self, term: str, default: Optional[int] = None) -> Optional[int]:
+        if not self.num_terms:
+            return default
+        key = term.encode("utf-8")
+        for candidate, term_id in self._iter_block(self._find_block(key)):
+            if candidate == key:
+                return term_id
+            if candidate > key:
+                break
+        return default
+
+    def items(self, start_block: int = 0) -> Iterator[Tuple[str, int]]:
+        for block in range(start_block, self.num_blocks):
+            for term, term_id in self._iter_block(block):
+                yield term.decode("utf-8"), term_id
+
+    def prefix(self, prefix: str) -> Iterator[Tuple[str, int]]:
+        if not self.num_terms:
+            return
+        key = prefix.encode("utf-8")
+        for block in range(self._find_block(key), self.num_blocks):
+            for term, term_id in self._iter_block(block):
+                if term.startswith(key):
+                    yield term.decode("utf-8"), term_id
+                elif term > key:
+                    return
+
+    def close(self) -> None:
+        self._buffer.close()
+
+
+def read_text_lexicon(index_directory_path: str) -> Dict[str, int]:
+    with open(f"{index_directory_path}/lexicon.txt") as f:
+        return {v: i for i, v in enumerate(f.read().splitlines(), 1)}
+
+
+def read_text_terms(index_directory_path: str) -> List[str]:
+    with open(f"{index_directory_path}/lexicon.txt") as f:
+        return f.read().splitlines()
+
+
+def load_lexicon(
+    index_directory_path: str,
+) -> Union[Dict[str, int], FrontCodedLexicon]:
+    text_path = f"{index_directory_path}/lexicon.txt"
+    compact_path = f"{index_directory_path}/{FRONT_CODED_LEXICON_FILE}"
+    if os.path.exists(compact_path) and os.path.getmtime(
+        compact_path
+    ) >= os.path.getmtime(text_path):
+        try:
+            return FrontCodedLexicon(compact_path)
+        except LexiconFormatError:
+            pass
+    return read_text_lexicon(index_directory_path)
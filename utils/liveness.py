@@ -0,0 +1,97 @@
+import mmap
+import os
+import struct
+from typing import Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.postings import POSTING_STRIDE
+
+DELETED_DOCS_FILE = "deleted-docs.bin"
+MAGIC = b"DELS"
+VERSION = 1
+HEADER = struct.Struct("<4sIII")
+DEFAULT_COMPACTION_THRESHOLD = 0.2
+
+
+class LivenessFormatError(Exception):
+    pass
+
+
+def write_deleted_docs(path: str, num_docs: int, deleted: Iterable[int]) -> None:
+    # One bit per internal ID, set when the document is deleted.
+    bits = np.zeros(num_docs, dtype=bool)
+    bits[list(deleted)] = True
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, num_docs, int(bits.sum())))
+        f.write(np.packbits(bits, bitorder="little").tobytes())
+    os.replace(temporary_path, path)
+
+
+class Liveness:
+    # The deleted-document bitmap, memory-mapped. IDs past the end of the
+    # bitmap belong to documents appended after it was written and are live.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise LivenessFormatError(f"{path} is too small to be a bitmap.")
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.num_docs, self.num_deleted = HEADER.unpack_from(
+            self._buffer, 0
+        )
+        if magic != MAGIC or version != VERSION:
+            raise LivenessFormatError(f"{path} is not a version {VERSION} bitmap.")
+        self.bits = np.frombuffer(
+            self._buffer,
+            dtype=np.uint8,
+            count=(self.num_docs + 7) // 8,
+            offset=HEADER.size,
+        )
+
+    def __reduce__(self):
+        return (Liveness, (self.path,))
+
+    def is_deleted(self, doc_id: int) -> bool:
+        return doc_id < self.num_docs and bool(
+            self.bits[doc_id >> 3] >> (doc_id & 7) & 1
+        )
+
+    def deleted_ids(self) -> Sequence[int]:
+        bits = np.unpackbits(self.bits, count=self.num_docs, bitorder="little")
+        return np.flatnonzero(bits).tolist()
+
+    def deleted_mask(self, doc_ids: np.ndarray) -> np.ndarray:
+        in_bitmap = doc_ids < self.num_docs
+        clipped = np.where(in_bitmap, doc_ids, 0)
+        return in_bitmap & ((self.bits[clipped >> 3] >> (clipped & 7)) & 1).astype(bool)
+
+    def restrict(self, postings: Sequence[int]) -> Sequence[int]:
+        pairs = np.asarray(postings).reshape(-1, POSTING_STRIDE)
+        return pairs[~self.deleted_mask(pairs[:, 0])].ravel().tolist()
+
+    def filter_ids(self, doc_ids: Sequence[int]) -> Sequence[int]:
+        return [doc_id for doc_id in doc_ids if not self.is_deleted(doc_id)]
+
+    def collection_statistics(self, doc_lengths: Sequence[int]) -> Tuple[int, float]:
+        # N and avgdl over live documents only.
+        lengths = np.asarray(doc_lengths)
+        live = ~self.deleted_mask(np.arange(len(lengths)))
+        num_live = int(live.sum())
+        return num_live, float(lengths[live].mean()) if num_live else 0.0
+
+    def deleted_fraction(self, num_docs: int) -> float:
+        return self.num_deleted / num_docs if num_docs else 0.0
+
+
+def load_liveness(index_directory_path: str) -> Optional[Liveness]:
+    # None when nothing has been deleted, so callers skip the bitmap entirely.
+    path = f"{index_directory_path}/{DELETED_DOCS_FILE}"
+    if not os.path.exists(path):
+        return None
+    try:
+        liveness = Liveness(path)
+    except LivenessFormatError:
+        return None
+    return liveness if liveness.num_deleted else None
@@ -0,0 +1,152 @@
+import os
+import secrets
+import struct
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_MAX_RESULTS = 1000
+DEFAULT_PAGE_SIZE = 10
+DEFAULT_MAX_SESSIONS = 10000
+DEFAULT_IDLE_SECONDS = 300
+EVICTION_INTERVAL_SECONDS = 1.0
+CURSOR_SUFFIX = ".cursor"
+MAGIC = b"CURS"
+HEADER = struct.Struct("<4sIII")
+
+
+class ResultCursor:
+    # A finished ranking kept as two packed arrays, so any page can be cut
+    # from it without scoring again. At most `max_results` entries are kept,
+    # which bounds a cursor at 12 bytes per result.
+    def __init__(
+        self,
+        query: str,
+        document_scores: Dict[int, float],
+        page_size: int = DEFAULT_PAGE_SIZE,
+        max_results: int = DEFAULT_MAX_RESULTS,
+    ) -> None:
+        self.query = query
+        self.page_size = page_size
+        ranking = list(document_scores.items())[:max_results]
+        self.doc_ids = array("i", (doc_id for doc_id, _ in ranking))
+        self.scores = array("d", (score for _, score in ranking))
+
+    @property
+    def total(self) -> int:
+        return len(self.doc_ids)
+
+    @property
+    def num_pages(self) -> int:
+        return max(1, -(-self.total // self.page_size))
+
+    def page(self, number: int) -> List[Tuple[int, float]]:
+        # Pages are numbered from 1.
+        start = (number - 1) * self.page_size
+        end = start + self.page_size
+        return list(zip(self.doc_ids[start:end], self.scores[start:end]))
+
+    def first_rank(self, number: int) -> int:
+        return (number - 1) * self.page_size + 1
+
+    def to_bytes(self) -> bytes:
+        query = self.query.encode("utf-8")
+        return (
+            HEADER.pack(MAGIC, self.total, self.page_size, len(query))
+            + query
+            + self.doc_ids.tobytes()
+            + self.scores.tobytes()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Optional["ResultCursor"]:
+        if len(data) < HEADER.size:
+            return None
+        magic, total, page_size, query_length = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or len(data) != HEADER.size + query_length + total * 12:
+            return None
+        cursor = cls.__new__(cls)
+        offset = HEADER.size + query_length
+        cursor.query = data[HEADER.size : offset].decode("utf-8")
+        cursor.page_size = page_size
+        cursor.doc_ids = array("i", data[offset : offset + total * 4])
+        cursor.scores = array("d", data[offset + total * 4 :])
+        return cursor
+
+
+class CursorStore:
+    # Cursors are kept as small files in one directory rather than in a
+    # worker's memory, so a page request can be answered by whichever
+    # pre-forked worker accepts it. Reading a cursor refreshes its mtime;
+    # cursors idle for longer than `idle_seconds` are removed, and beyond
+    # `max_sessions` the least recently used ones go first. The directory is
+    # swept at most once a second per process, so the session bound can be
+    # overshot by the cursors added in between.
+    def __init__(
+        self,
+        directory: str,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        idle_seconds: float = DEFAULT_IDLE_SECONDS,
+    ) -> None:
+        self.directory = directory
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.last_eviction = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, token: str) -> Optional[str]:
+        # Tokens are hex, which also keeps client input out of other paths.
+        if not token or any(c not in "0123456789abcdef" for c in token):
+            return None
+        return os.path.join(self.directory, token + CURSOR_SUFFIX)
+
+    def add(self, cursor: ResultCursor) -> str:
+        if time.monotonic() - self.last_eviction > EVICTION_INTERVAL_SECONDS:
+            self.evict()
+        token = secrets.token_hex(8)
+        path = self._path(token)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(cursor.to_bytes())
+        os.replace(f"{path}.tmp", path)
+        return token
+
+    def get(self, token: str) -> Optional[ResultCursor]:
+        path = self._path(token)
+        try:
+            if path is None or time.time() - os.path.getmtime(path) > self.idle_seconds:
+                return None
+            with open(path, "rb") as f:
+                cursor = ResultCursor.from_bytes(f.read())
+            os.utime(path)
+        except OSError:
+            return None
+        return cursor
+
+    def evict(self) -> int:
+        self.last_eviction = time.monotonic()
+        sessions = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(CURSOR_SUFFIX):
+                try:
+                    sessions.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    pass
+        sessions.sort(reverse=True)
+        cutoff = time.time() - self.idle_seconds
+        evicted = 0
+        # One slot is left free for the cursor about to be added.
+        for rank, (mtime, path) in enumerate(sessions):
+            if mtime < cutoff or rank >= self.max_sessions - 1:
+                try:
+                    os.remove(path)
+                    evicted += 1
+                except OSError:
+                    pass
+        return evicted
+
+    def __len__(self) -> int:
+        return sum(
+            1
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(CURSOR_SUFFIX)
+        )
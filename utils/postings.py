@@ -0,0 +1,128 @@
+import heapq
+import itertools
+from typing import Iterable, Iterator, List, Sequence
+
+POSTING_STRIDE = 2
+
+
+def gallop(
+    postings: Sequence[int], target: int, start: int, stride: int = POSTING_STRIDE
+) -> int:
+    # Returns the first entry at or after `start` whose doc ID is >= target,
+    # probing 1, 2, 4, ... entries ahead before binary searching the last step.
+    count = len(postings) // stride
+    if start >= count or postings[start * stride] >= target:
+        return start
+    step = 1
+    lo = start
+    hi = start + step
+    while hi < count and postings[hi * stride] < target:
+        lo = hi
+        step *= 2
+        hi = start + step
+    hi = min(hi, count)
+    while lo + 1 < hi:
+        mid = (lo + hi) // 2
+        if postings[mid * stride] < target:
+            lo = mid
+        else:
+            hi = mid
+    return hi
+
+
+def postings_in_range(
+    postings: Sequence[int],
+    first_doc_id: int,
+    end_doc_id: int,
+    stride: int = POSTING_STRIDE,
+) -> Sequence[int]:
+    start = gallop(postings, first_doc_id, 0, stride)
+    end = gallop(postings, end_doc_id, start, stride)
+    return postings[start * stride : end * stride]
+
+
+def doc_ids(postings: Sequence[int], stride: int = POSTING_STRIDE) -> List[int]:
+    return list(postings[::stride])
+
+
+def intersect_doc_ids(
+    candidates: List[int], postings: Sequence[int], stride: int = POSTING_STRIDE
+) -> List[int]:
+    matches = []
+    position = 0
+    count = len(postings) // stride
+    for doc_id in candidates:
+        position = gallop(postings, doc_id, position, stride)
+        if position == count:
+            break
+        if postings[position * stride] == doc_id:
+            matches.append(doc_id)
+    return matches
+
+
+def intersect(
+    postings_lists: List[Sequence[int]], stride: int = POSTING_STRIDE
+) -> List[int]:
+    if not postings_lists:
+        return []
+    ordered = sorted(postings_lists, key=len)
+    candidates = doc_ids(ordered[0], stride)
+    for postings in ordered[1:]:
+        if not candidates:
+            break
+        candidates = intersect_doc_ids(candidates, postings, stride)
+    return candidates
+
+
+def iter_doc_ids(
+    postings: Sequence[int], stride: int = POSTING_STRIDE
+) -> Iterator[int]:
+    return itertools.islice(postings, 0, None, stride)
+
+
+def union(doc_id_streams: Iterable[Iterable[int]]) -> List[int]:
+    merged = []
+    for doc_id in heapq.merge(*doc_id_streams):
+        if not merged or merged[-1] != doc_id:
+            merged.append(doc_id)
+    return merged
+
+
+def difference_doc_ids(
+    candidates: List[int], postings: Sequence[int], stride: int = POSTING_STRIDE
+) -> List[int]:
+    count = len(postings) // stride
+    if count < len(candidates):
+        # Fewer exclusions than candidates: gallop the excluded IDs through the
+        # candidates and cut them out, instead of probing every candidate.
+        remaining, kept_from, position = [], 0, 0
+        for doc_id in iter_doc_ids(postings, stride):
+            position = gallop(candidates, doc_id, position, 1)
+            if position == len(candidates):
+                break
+            if candidates[position] == doc_id:
+                remaining.extend(candidates[kept_from:position])
+                kept_from = position + 1
+        remaining.extend(candidates[kept_from:])
+        return remaining
+
+    remaining = []
+    position = 0
+    for i, doc_id in enumerate(candidates):
+        position = gallop(postings, doc_id, position, stride)
+        if position == count:
+            remaining.extend(candidates[i:])
+            break
+        if postings[position * stride] != doc_id:
+            remaining.append(doc_id)
+    return remaining
+
+
+def merge_postings(postings_lists: Iterable[Sequence[int]]) -> List[int]:
+    # Folds several terms' postings into one interleaved list, summing term
+    # frequencies per document, so the group can be scored as a single term.
+    frequencies = {}
+    for postings in postings_lists:
+        for doc_id, frequency in zip(postings[::2], postings[1::2]):
+            frequencies[doc_id] = frequencies.get(doc_id, 0) + frequency
+    return [value for pair in sorted(frequencies.items()) for value in pair]
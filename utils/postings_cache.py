@@ -0,0 +1,202 @@
+import heapq
+import itertools
+import os
+import threading
+from array import array
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from utils.flat_index import FlatIndex
+
+CACHE_POLICIES = ["lru", "lfu"]
+DEFAULT_POSTINGS_CACHE_BYTES = 64 * 2**20
+DEFAULT_STATIC_FRACTION = 0.5
+
+
+def frequent_query_terms(
+    queries: Iterable[str],
+    resolve: Callable[[str], Sequence[int]],
+) -> List[int]:
+    # Term IDs ordered by how many logged queries use them, most used first;
+    # ties go to the lower term ID.
+    counts = Counter()
+    for query in queries:
+        counts.update(set(resolve(query)))
+    return sorted(counts, key=lambda term_id: (-counts[term_id], term_id))
+
+
+class PostingsCache:
+    # A dict-like, byte-bounded view of flat_index.bin in front of the query
+    # processor. Postings that miss are read from the file with pread rather
+    # than through the mapping, so only cached lists stay resident. The static
+    # part is filled once by `preload` and never evicted; the dynamic part
+    # takes the rest of the budget and evicts either the least recently used
+    # list or, under `lfu`, the list with the fewest hits per byte. Lists
+    # larger than the dynamic budget are served without being admitted.
+    def __init__(
+        self,
+        flat_index: FlatIndex,
+        max_bytes: int = DEFAULT_POSTINGS_CACHE_BYTES,
+        policy: str = "lru",
+    ) -> None:
+        self.flat_index = flat_index
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.static_bytes = 0
+        self.dynamic_bytes = 0
+        self.static_hits = 0
+        self.dynamic_hits = 0
+        self.misses = 0
+        self.bytes_read = 0
+        self.bytes_saved = 0
+        self._static: Dict[int, array] = {}
+        self._dynamic: OrderedDict = OrderedDict()
+        self._frequencies: Dict[int, int] = {}
+        self._heap: List = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._fd = os.open(flat_index.path, os.O_RDONLY)
+
+    def _read(self, term_id: int) -> array:
+        start, end = self.flat_index.offsets[term_id : term_id + 2]
+        postings = array("i")
+        postings.frombytes(
+            os.pread(
+                self._fd,
+                (end - start) * postings.itemsize,
+                self.flat_index.postings_offset + start * postings.itemsize,
+            )
+        )
+        return postings
+
+    def preload(self, term_ids: Iterable[int], max_bytes: int) -> int:
+        # Admits term IDs in the given order while they fit in `max_bytes`;
+        # returns the number of lists loaded.
+        loaded = 0
+        for term_id in term_ids:
+            if term_id not in self.flat_index or term_id in self._static:
+                continue
+            size = self.flat_index.postings_size(term_id)
+            if self.static_bytes + size > min(max_bytes, self.max_bytes):
+                continue
+            self._static[term_id] = self._read(term_id)
+            self.static_bytes += size
+            loaded += 1
+        return loaded
+
+    def _admit(self, term_id: int, postings: array) -> None:
+        size = postings.itemsize * len(postings)
+        capacity = self.max_bytes - self.static_bytes
+        if size > capacity or term_id in self._dynamic:
+            return
+        while self.dynamic_bytes + size > capacity:
+            self._evict()
+        self._dynamic[term_id] = postings
+        self.dynamic_bytes += size
+        if self.policy == "lfu":
+            self._frequencies[term_id] = 1
+            self._push(term_id)
+
+    def _push(self, term_id: int) -> None:
+        if len(self._heap) > 4 * len(self._dynamic) + 64:
+            # Drops the stale entries left behind by earlier hits.
+            self._heap = []
+            for cached_id in self._dynamic:
+                if cached_id != term_id:
+                    self._push(cached_id)
+        size = max(self.flat_index.postings_size(term_id), 1)
+        heapq.heappush(
+            self._heap,
+            (self._frequencies[term_id] / size, next(self._sequence), term_id),
+        )
+
+    def _evict(self) -> None:
+        if self.policy == "lfu":
+            # Heap entries go stale when a list gains hits; only the entry
+            # matching a cached list's current frequency is acted on.
+            while True:
+                priority, _, term_id = heapq.heappop(self._heap)
+                if term_id in self._dynamic and priority == self._frequencies[
+                    term_id
+                ] / max(self.flat_index.postings_size(term_id), 1):
+                    break
+            del self._frequencies[term_id]
+            postings = self._dynamic.pop(term_id)
+        else:
+            _, postings = self._dynamic.popitem(last=False)
+        self.dynamic_bytes -= postings.itemsize * len(postings)
+
+    def __getitem__(self, key) -> array:
+        if key not in self.flat_index:
+            raise KeyError(key)
+        term_id = int(key)
+        with self._lock:
+            postings = self._static.get(term_id)
+            if postings is not None:
+                self.static_hits += 1
+            else:
+                postings = self._dynamic.get(term_id)
+                if postings is not None:
+                    self.dynamic_hits += 1
+                    if self.policy == "lfu":
+                        self._frequencies[term_id] += 1
+                        self._push(term_id)
+                    else:
+                        self._dynamic.move_to_end(term_id)
+            if postings is not None:
+                self.bytes_saved += postings.itemsize * len(postings)
+                return postings
+            self.misses += 1
+            postings = self._read(term_id)
+            self.bytes_read += postings.itemsize * len(postings)
+            self._admit(term_id, postings)
+            return postings
+
+    def get(self, key, default=None):
+        return self[key] if key in self.flat_index else default
+
+    def __contains__(self, key) -> bool:
+        return key in self.flat_index
+
+    def __len__(self) -> int:
+        return len(self.flat_index)
+
+    def __iter__(self):
+        return iter(self.flat_index)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.static_hits + self.dynamic_hits + self.misses
+            return dict(
+                static_hits=self.static_hits,
+                dynamic_hits=self.dynamic_hits,
+                misses=self.misses,
+                hit_rate=(
+                    (self.static_hits + self.dynamic_hits) / lookups if lookups else 0.0
+                ),
+                static_lists=len(self._static),
+                dynamic_lists=len(self._dynamic),
+                size_bytes=self.static_bytes + self.dynamic_bytes,
+                bytes_read=self.bytes_read,
+                bytes_saved=self.bytes_saved,
+            )
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def load_postings_cache(
+    flat_index: FlatIndex,
+    max_bytes: int,
+    policy: str = "lru",
+    warm_queries: Optional[Iterable[str]] = None,
+    resolve: Optional[Callable[[str], Sequence[int]]] = None,
+    static_fraction: float = DEFAULT_STATIC_FRACTION,
+) -> PostingsCache:
+    cache = PostingsCache(flat_index, max_bytes, policy)
+    if warm_queries is not None and resolve is not None:
+        cache.preload(
+            frequent_query_terms(warm_queries, resolve),
+            int(max_bytes * static_fraction),
+        )
+    return cache
@@ -0,0 +1,149 @@
+import contextlib
+import cProfile
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+STAGES = [
+    "parsing",
+    "tokenizing",
+    "postings",
+    "variants",
+    "document writes",
+    "serialization",
+]
+NULL_STAGE = contextlib.nullcontext()
+
+
+class _StageTimer:
+    def __init__(self, totals: Dict[str, float], name: str) -> None:
+        self.totals = totals
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self.totals[self.name] += time.perf_counter() - self.start
+
+
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def lexicon_size_bytes(lexicon: Dict[str, int]) -> int:
+    size = sys.getsizeof(lexicon)
+    for term, term_id in lexicon.items():
+        size += sys.getsizeof(term) + sys.getsizeof(term_id)
+    return size
+
+
+def inverted_index_size_bytes(inverted_index: Dict[int, List[int]]) -> int:
+    # Posting values are counted at the size of a small int object rather than
+    # walked individually, which keeps periodic snapshots cheap on large indexes.
+    int_size = sys.getsizeof(2**20)
+    size = sys.getsizeof(inverted_index)
+    for term_id, postings in inverted_index.items():
+        size += sys.getsizeof(term_id) + sys.getsizeof(postings)
+        size += len(postings) * int_size
+    return size
+
+
+class BuildProfiler:
+    def __init__(self, enabled: bool, snapshot_interval: int = 5000) -> None:
+        self.enabled = enabled
+        self.snapshot_interval = snapshot_interval
+        self.totals = {stage: 0.0 for stage in STAGES}
+        self.timers = {stage: _StageTimer(self.totals, stage) for stage in STAGES}
+        self.snapshots = []
+        self.profile = cProfile.Profile() if enabled else None
+        self.start_time = None
+        self.wall_time = 0.0
+
+    def start(self) -> None:
+        if not self.enabled:
+            return
+        tracemalloc.start()
+        self.start_time = time.perf_counter()
+        self.profile.enable()
+
+    def stop(self) -> None:
+        if not self.enabled:
+            return
+        self.profile.disable()
+        self.wall_time = time.perf_counter() - self.start_time
+
+    def stage(self, name: str):
+        return self.timers[name] if self.enabled else NULL_STAGE
+
+    def maybe_snapshot(
+        self,
+        docs_processed: int,
+        lexicon: Dict[str, int],
+        inverted_index: Dict[int, List[int]],
+        force: bool = False,
+    ) -> None:
+        if not self.enabled:
+            return
+        # An interval of 0 takes the final snapshot only.
+        if not force and (
+            not self.snapshot_interval or docs_processed % self.snapshot_interval
+        ):
+            return
+        if self.snapshots and self.snapshots[-1]["docs"] == docs_processed:
+            return
+        traced_current, traced_peak = tracemalloc.get_traced_memory()
+        self.snapshots.append(
+            dict(
+                docs=docs_processed,
+                elapsed=time.perf_counter() - self.start_time,
+                rss=current_rss_bytes(),
+                traced_current=traced_current,
+                traced_peak=traced_peak,
+                lexicon_terms=len(lexicon),
+                lexicon_bytes=lexicon_size_bytes(lexicon),
+                postings_entries=sum(len(p) for p in inverted_index.values()) // 2,
+                inverted_index_bytes=inverted_index_size_bytes(inverted_index),
+            )
+        )
+
+    def write_report(self, destination_directory: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        tracemalloc.stop()
+        report_path = f"{destination_directory}/build_profile.txt"
+        dump_path = f"{destination_directory}/build_profile.prof"
+        self.profile.dump_stats(dump_path)
+
+        accounted = sum(self.totals.values())
+        lines = [f"total wall time: {self.wall_time:.3f}s\n", "\nstage timings:\n"]
+        for stage in STAGES:
+            share = self.totals[stage] / self.wall_time if self.wall_time else 0
+            lines.append(f"  {stage:<16} {self.totals[stage]:>10.3f}s {share:>7.1%}\n")
+        lines.append(f"  {'other (i/o)':<16} {self.wall_time - accounted:>10.3f}s\n")
+
+        lines.append("\nmemory snapshots (MiB):\n")
+        lines.append(
+            f"  {'docs':>8} {'elapsed':>9} {'rss':>9} {'traced':>9} {'peak':>9}"
+            f" {'terms':>9} {'lexicon':>9} {'postings':>11} {'index':>9}\n"
+        )
+        for s in self.snapshots:
+            lines.append(
+                f"  {s['docs']:>8} {s['elapsed']:>8.1f}s {s['rss'] / 2**20:>9.1f}"
+                f" {s['traced_current'] / 2**20:>9.1f} {s['traced_peak'] / 2**20:>9.1f}"
+                f" {s['lexicon_terms']:>9} {s['lexicon_bytes'] / 2**20:>9.1f}"
+                f" {s['postings_entries']:>11} {s['inverted_index_bytes'] / 2**20:>9.1f}\n"
+            )
+        lines.append(f"\ncProfile dump: {dump_path}\n")
+
+        with open(report_path, "w") as f:
+            f.writelines(lines)
+        return report_path
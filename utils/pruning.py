@@ -0,0 +1,110 @@
+import math
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DOC_FREQUENCIES_FILE = "doc-frequencies.txt"
+PRUNING_METHODS = ["global", "term"]
+
+
+def length_normalizers(
+    doc_lengths: Sequence[int], average_doc_length: float, k1: float, b: float
+) -> np.ndarray:
+    return k1 * ((1 - b) + b * (np.asarray(doc_lengths) / average_doc_length))
+
+
+def posting_impacts(
+    postings: Sequence[int], num_docs: int, normalizers: np.ndarray
+) -> np.ndarray:
+    # The magnitude of each posting's BM25 contribution. Terms in more than half
+    # the collection have a negative idf, and their largest-tf postings move
+    # scores the most, so pruning works on absolute values.
+    postings = np.asarray(postings, dtype=np.int64)
+    documents, frequencies = postings[::2], postings[1::2]
+    df = len(documents)
+    idf = math.log((num_docs - df + 0.5) / (df + 0.5))
+    return np.abs(idf * frequencies / (frequencies + normalizers[documents]))
+
+
+def kept_postings(postings: Sequence[int], keep: np.ndarray) -> List[int]:
+    pairs = np.asarray(postings, dtype=np.int64).reshape(-1, 2)
+    return pairs[keep].ravel().tolist()
+
+
+def global_threshold(impacts: List[np.ndarray], keep_fraction: float) -> float:
+    everything = np.concatenate(impacts) if impacts else np.zeros(0)
+    keep_count = math.ceil(len(everything) * keep_fraction)
+    if not keep_count:
+        return math.inf
+    return float(np.partition(everything, len(everything) - keep_count)[-keep_count])
+
+
+def prune_index(
+    inverted_index: Dict[str, Sequence[int]],
+    doc_lengths: Sequence[int],
+    keep_fraction: float,
+    method: str,
+    k1: float,
+    b: float,
+    min_postings: int = 0,
+) -> Tuple[Dict[str, List[int]], Optional[float]]:
+    # "global" keeps every posting whose impact clears one collection-wide
+    # threshold; "term" keeps each term's top fraction by impact. Both keep at
+    # least min_postings per term so short queries still fill a result page.
+    normalizers = length_normalizers(
+        doc_lengths, sum(doc_lengths) / len(doc_lengths), k1, b
+    )
+    impacts = {
+        term_id: posting_impacts(postings, len(doc_lengths), normalizers)
+        for term_id, postings in inverted_index.items()
+    }
+    threshold = (
+        global_threshold(list(impacts.values()), keep_fraction)
+        if method == "global"
+        else None
+    )
+
+    pruned = {}
+    for term_id, postings in inverted_index.items():
+        term_impacts = impacts[term_id]
+        if method == "global":
+            keep_count = int(np.count_nonzero(term_impacts >= threshold))
+        else:
+            keep_count = math.ceil(len(term_impacts) * keep_fraction)
+        keep_count = min(len(term_impacts), max(keep_count, min_postings))
+        keep = np.zeros(len(term_impacts), dtype=bool)
+        if keep_count:
+            # Highest impacts first, ties broken towards lower document IDs.
+            order = np.lexsort((np.arange(len(term_impacts)), -term_impacts))
+            keep[order[:keep_count]] = True
+        pruned[term_id] = kept_postings(postings, keep)
+    return pruned, threshold
+
+
+def write_document_frequencies(
+    index_directory_path: str,
+    lexicon: Dict[str, int],
+    inverted_index: Dict[str, Sequence[int]],
+) -> None:
+    with open(f"{index_directory_path}/{DOC_FREQUENCIES_FILE}", "w") as f:
+        for term_id in sorted(lexicon.values()):
+            f.write(f"{len(inverted_index.get(str(term_id), [])) // 2}\n")
+
+
+def remove_document_frequencies(index_directory_path: str) -> bool:
+    # The stored dfs describe the postings they were written with; once the
+    # postings change they are dropped and idf falls back to the postings.
+    path = f"{index_directory_path}/{DOC_FREQUENCIES_FILE}"
+    if not os.path.exists(path):
+        return False
+    os.remove(path)
+    return True
+
+
+def load_document_frequencies(index_directory_path: str) -> Optional[List[int]]:
+    path = f"{index_directory_path}/{DOC_FREQUENCIES_FILE}"
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return [0] + [int(df) for df in f.read().splitlines()]
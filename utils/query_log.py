@@ -0,0 +1,53 @@
+import datetime
+import json
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class QueryLogger:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def log(
+        self,
+        query: str,
+        latency_seconds: float,
+        result_count: int,
+        corrected_query: Optional[str] = None,
+    ) -> None:
+        record = {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "query": query,
+            "latency_ms": round(latency_seconds * 1000, 3),
+            "results": result_count,
+        }
+        if corrected_query is not None:
+            record["corrected_query"] = corrected_query
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_query_log(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def load_replay_queries(path: str) -> List[str]:
+    # Accepts a query log (JSON lines with a "query" field) or a topics file
+    # (one JSON object mapping topic IDs to queries).
+    with open(path, encoding="utf-8") as f:
+        try:
+            topics = json.load(f)
+        except json.JSONDecodeError:
+            topics = None
+    if isinstance(topics, dict) and "query" not in topics:
+        return [str(query) for query in topics.values()]
+    return [record["query"] for record in read_query_log(path) if "query" in record]
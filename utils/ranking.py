@@ -0,0 +1,196 @@
+import bisect
+import datetime
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils.doc_dates import docno_date
+from utils.index_engine_utils import extract_tag_text
+
+FEATURES = ["bm25", "headline", "proximity", "recency"]
+DEFAULT_WEIGHTS = {"bm25": 1.0, "headline": 0.3, "proximity": 0.3, "recency": 0.05}
+DEFAULT_CANDIDATES = 1000
+DEFAULT_BUDGET_MS = 50.0
+DEFAULT_FEATURE_CACHE_DOCUMENTS = 20000
+RECENCY_HALF_LIFE_DAYS = 365
+WORD_PATTERN = re.compile(r"\W+")
+
+
+def parse_weights(text: str) -> Dict[str, float]:
+    weights = dict(DEFAULT_WEIGHTS)
+    for assignment in filter(None, (part.strip() for part in text.split(","))):
+        feature, _, value = assignment.partition("=")
+        if feature not in FEATURES:
+            raise ValueError(
+                f"Unknown feature '{feature}'; expected one of {', '.join(FEATURES)}."
+            )
+        weights[feature] = float(value)
+    return weights
+
+
+def words(text: str) -> List[str]:
+    return WORD_PATTERN.sub(" ", text).lower().split()
+
+
+@dataclass
+class DocumentFeatures:
+    headline_terms: frozenset
+    positions: Dict[str, List[int]]
+    date_ordinal: int
+
+
+def extract_document_features(docno: str, stored_document: str) -> DocumentFeatures:
+    headline, _, raw_document = stored_document.partition("raw document:\n")
+    headline = headline.split("headline: ", 1)[-1]
+    body = " ".join(
+        extract_tag_text(raw_document, tag) for tag in ("HEADLINE", "GRAPHIC", "TEXT")
+    )
+    positions = {}
+    for position, word in enumerate(words(body)):
+        positions.setdefault(word, []).append(position)
+    date = docno_date(docno)
+    date_ordinal = (
+        datetime.date(date // 10000, date // 100 % 100, date % 100).toordinal()
+        if date
+        else 0
+    )
+    return DocumentFeatures(frozenset(words(headline)), positions, date_ordinal)
+
+
+class DocumentFeatureCache:
+    # Parsed, query-independent document representations kept in an LRU keyed
+    # by DOCNO, so a document is read and tokenized once however many queries
+    # re-rank it.
+    def __init__(
+        self,
+        loader: Callable[[str], str],
+        max_documents: int = DEFAULT_FEATURE_CACHE_DOCUMENTS,
+    ) -> None:
+        self.loader = loader
+        self.max_documents = max_documents
+        self.hits = 0
+        self.misses = 0
+        self._features = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, docno: str) -> DocumentFeatures:
+        with self._lock:
+            features = self._features.get(docno)
+            if features is not None:
+                self._features.move_to_end(docno)
+                self.hits += 1
+                return features
+            self.misses += 1
+        features = extract_document_features(docno, self.loader(docno))
+        with self._lock:
+            self._features[docno] = features
+            while len(self._features) > self.max_documents:
+                self._features.popitem(last=False)
+        return features
+
+
+def minimum_distance(first: Sequence[int], second: Sequence[int]) -> int:
+    # Probes each position of the shorter list into the longer one.
+    if len(first) > len(second):
+        first, second = second, first
+    best = None
+    for position in first:
+        i = bisect.bisect_left(second, position)
+        for neighbour in second[max(i - 1, 0) : i + 1]:
+            distance = abs(position - neighbour)
+            if best is None or distance < best:
+                best = distance
+    return best
+
+
+def proximity(query_terms: List[str], features: DocumentFeatures) -> float:
+    # Mean over pairs of matched query terms of 1 / (closest distance).
+    present = [term for term in query_terms if term in features.positions]
+    pairs = [
+        (first, second)
+        for i, first in enumerate(present)
+        for second in present[i + 1 :]
+    ]
+    if not pairs:
+        return 0.0
+    return sum(
+        1
+        / max(
+            minimum_distance(features.positions[first], features.positions[second]),
+            1,
+        )
+        for first, second in pairs
+    ) / len(pairs)
+
+
+class CascadeRanker:
+    # Stage one is the BM25 top-N handed to rerank(). Stage two scores the
+    # candidates in BM25 order with a linear model over richer features until
+    # the time budget runs out; candidates it did not reach keep their BM25
+    # order below the re-ranked ones.
+    def __init__(
+        self,
+        feature_cache: DocumentFeatureCache,
+        weights: Optional[Dict[str, float]] = None,
+        budget_ms: float = DEFAULT_BUDGET_MS,
+    ) -> None:
+        self.feature_cache = feature_cache
+        self.weights = weights or dict(DEFAULT_WEIGHTS)
+        self.budget_ms = budget_ms
+
+    def rerank(
+        self,
+        query_tokens: List[str],
+        first_stage: Dict[int, float],
+        docno: Callable[[int], str],
+        limit: int,
+    ) -> Tuple[Dict[int, float], int]:
+        deadline = time.perf_counter() + self.budget_ms / 1000
+        query_terms = list(dict.fromkeys(token for token in query_tokens if token))
+        candidates = sorted(first_stage.items(), key=lambda item: item[1], reverse=True)
+        if not candidates or not query_terms:
+            return dict(candidates[:limit]), 0
+        # Scaled by the largest magnitude rather than the top score, which is
+        # negative when every query term has df > N/2 and would flip the order.
+        scale = max(abs(score) for _, score in candidates) or 1.0
+
+        # Query-dependent features are scored inside the budgeted loop; recency
+        # is relative to the newest re-ranked candidate, so it is added after.
+        scored = []
+        for doc_id, bm25 in candidates:
+            if time.perf_counter() > deadline:
+                break
+            features = self.feature_cache.get(docno(doc_id))
+            score = (
+                self.weights["bm25"] * bm25 / scale
+                + self.weights["headline"]
+                * sum(term in features.headline_terms for term in query_terms)
+                / len(query_terms)
+                + self.weights["proximity"] * proximity(query_terms, features)
+            )
+            scored.append((doc_id, score, features.date_ordinal))
+        newest = max((date_ordinal for _, _, date_ordinal in scored), default=0)
+
+        reranked = [
+            (
+                doc_id,
+                score
+                + (
+                    self.weights["recency"]
+                    * 0.5 ** ((newest - date_ordinal) / RECENCY_HALF_LIFE_DAYS)
+                    if date_ordinal
+                    else 0.0
+                ),
+            )
+            for doc_id, score, date_ordinal in scored
+        ]
+        reranked.sort(key=lambda item: item[1], reverse=True)
+
+        ranking = reranked + [
+            (doc_id, self.weights["bm25"] * bm25 / scale)
+            for doc_id, bm25 in candidates[len(reranked) :]
+        ]
+        return dict(ranking[:limit]), len(reranked)
@@ -0,0 +1,169 @@
+import datetime
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Sequence
+
+DOCNO_DATE_REGEX = re.compile(r"LA([0-9]{6})-([0-9]{4})")
+INTERNAL_ID_PREFIX = "internal id: "
+BISECTION_LEAF_SIZE = 16
+
+
+def docno_sort_key(docno: str):
+    match = DOCNO_DATE_REGEX.search(docno)
+    if not match:
+        return (datetime.date.max, docno)
+    date = datetime.datetime.strptime(match.group(1), "%m%d%y").date()
+    return (date, int(match.group(2)))
+
+
+def docno_order(docnos: Sequence[str]) -> List[int]:
+    return sorted(range(len(docnos)), key=lambda doc_id: docno_sort_key(docnos[doc_id]))
+
+
+def forward_index(
+    inverted_index: Dict[str, List[int]], num_docs: int, min_df: int = 2
+) -> List[List[int]]:
+    doc_terms = [[] for _ in range(num_docs)]
+    for term_id, postings in inverted_index.items():
+        if len(postings) // 2 < min_df:
+            continue
+        term_id = int(term_id)
+        for doc_id in postings[::2]:
+            doc_terms[doc_id].append(term_id)
+    return doc_terms
+
+
+def _log_gap_cost(degree: int, size: int) -> float:
+    return degree * math.log2(size / (degree + 1)) if degree else 0.0
+
+
+def _move_gains(
+    docs: List[int],
+    doc_terms: List[List[int]],
+    from_degrees: Counter,
+    to_degrees: Counter,
+    from_size: int,
+    to_size: int,
+) -> List[float]:
+    term_gains = {}
+    gains = []
+    for doc_id in docs:
+        gain = 0.0
+        for term_id in doc_terms[doc_id]:
+            term_gain = term_gains.get(term_id)
+            if term_gain is None:
+                d_from, d_to = from_degrees[term_id], to_degrees[term_id]
+                term_gain = (
+                    _log_gap_cost(d_from, from_size)
+                    + _log_gap_cost(d_to, to_size)
+                    - _log_gap_cost(d_from - 1, from_size)
+                    - _log_gap_cost(d_to + 1, to_size)
+                )
+                term_gains[term_id] = term_gain
+            gain += term_gain
+        gains.append(gain)
+    return gains
+
+
+def _bisect(
+    docs: List[int],
+    doc_terms: List[List[int]],
+    depth: int,
+    max_depth: int,
+    iterations: int,
+) -> List[int]:
+    if len(docs) <= BISECTION_LEAF_SIZE or depth >= max_depth:
+        return sorted(docs)
+
+    half = len(docs) // 2
+    left, right = docs[:half], docs[half:]
+    left_degrees = Counter(t for doc_id in left for t in doc_terms[doc_id])
+    right_degrees = Counter(t for doc_id in right for t in doc_terms[doc_id])
+
+    for _ in range(iterations):
+        left_gains = _move_gains(
+            left, doc_terms, left_degrees, right_degrees, len(left), len(right)
+        )
+        right_gains = _move_gains(
+            right, doc_terms, right_degrees, left_degrees, len(right), len(left)
+        )
+        left_ranked = sorted(zip(left_gains, left), reverse=True)
+        right_ranked = sorted(zip(right_gains, right), reverse=True)
+
+        swaps = 0
+        for (left_gain, left_doc), (right_gain, right_doc) in zip(
+            left_ranked, right_ranked
+        ):
+            if left_gain + right_gain <= 0:
+                break
+            left_degrees.subtract(doc_terms[left_doc])
+            right_degrees.update(doc_terms[left_doc])
+            right_degrees.subtract(doc_terms[right_doc])
+            left_degrees.update(doc_terms[right_doc])
+            left_ranked[swaps] = (left_gain, right_doc)
+            right_ranked[swaps] = (right_gain, left_doc)
+            swaps += 1
+        if not swaps:
+            break
+        left = [doc_id for _, doc_id in left_ranked]
+        right = [doc_id for _, doc_id in right_ranked]
+
+    return _bisect(left, doc_terms, depth + 1, max_depth, iterations) + _bisect(
+        right, doc_terms, depth + 1, max_depth, iterations
+    )
+
+
+def bisection_order(
+    inverted_index: Dict[str, List[int]],
+    docnos: Sequence[str],
+    max_depth: int = 16,
+    iterations: int = 10,
+) -> List[int]:
+    doc_terms = forward_index(inverted_index, len(docnos))
+    return _bisect(docno_order(docnos), doc_terms, 0, max_depth, iterations)
+
+
+def remap_postings(
+    inverted_index: Dict[str, List[int]], new_ids: Sequence[int]
+) -> Dict[str, List[int]]:
+    remapped = {}
+    for term_id, postings in inverted_index.items():
+        pairs = sorted(
+            (new_ids[doc_id], frequency)
+            for doc_id, frequency in zip(postings[::2], postings[1::2])
+            if new_ids[doc_id] >= 0
+        )
+        # Terms left without postings keep an empty list, since they stay in
+        # the lexicon.
+        remapped[term_id] = [value for pair in pairs for value in pair]
+    return remapped
+
+
+def varint_length(value: int) -> int:
+    length = 1
+    while value >= 0x80:
+        value >>= 7
+        length += 1
+    return length
+
+
+def compressed_postings_size(inverted_index: Dict[str, List[int]]) -> int:
+    size = 0
+    for postings in inverted_index.values():
+        previous = 0
+        for doc_id, frequency in zip(postings[::2], postings[1::2]):
+            size += varint_length(doc_id - previous) + varint_length(frequency)
+            previous = doc_id
+    return size
+
+
+def rewrite_internal_id(document_path: str, internal_id: int) -> None:
+    with open(document_path) as f:
+        lines = f.read().split("\n")
+    for i, line in enumerate(lines[:4]):
+        if line.startswith(INTERNAL_ID_PREFIX):
+            lines[i] = f"{INTERNAL_ID_PREFIX}{internal_id}"
+            break
+    with open(document_path, "w") as f:
+        f.write("\n".join(lines))
@@ -0,0 +1,85 @@
+import json
+import mmap
+import os
+import pickle
+import struct
+import zlib
+from array import array
+from typing import Any, Callable, Dict, List, Optional
+
+MAGIC = b"BM25SNAP"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQI")
+
+
+def compact_postings(inverted_index: Dict[str, List[int]]) -> Dict[str, array]:
+    return {
+        term_id: array("i", postings) for term_id, postings in inverted_index.items()
+    }
+
+
+def source_stamps(source_paths: List[str]) -> Dict[str, Optional[List[int]]]:
+    stamps = {}
+    for path in source_paths:
+        try:
+            stat = os.stat(path)
+            stamps[os.path.basename(path)] = [stat.st_mtime_ns, stat.st_size]
+        except FileNotFoundError:
+            stamps[os.path.basename(path)] = None
+    return stamps
+
+
+def load_snapshot(snapshot_path: str, source_paths: List[str]) -> Optional[Any]:
+    try:
+        snapshot_mtime = os.stat(snapshot_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    stamps = source_stamps(source_paths)
+    if any(stamp and stamp[0] > snapshot_mtime for stamp in stamps.values()):
+        return None
+
+    with open(snapshot_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            magic, version, checksum, payload_length, stamps_length = (
+                HEADER.unpack_from(buffer, 0)
+            )
+            if magic != MAGIC or version != VERSION:
+                return None
+            stamps_end = HEADER.size + stamps_length
+            if json.loads(buffer[HEADER.size : stamps_end]) != stamps:
+                return None
+            payload = memoryview(buffer)[stamps_end : stamps_end + payload_length]
+            try:
+                if len(payload) != payload_length or zlib.crc32(payload) != checksum:
+                    return None
+                return pickle.loads(payload)
+            finally:
+                payload.release()
+
+
+def save_snapshot(snapshot_path: str, state: Any, source_paths: List[str]) -> bool:
+    payload = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+    stamps = json.dumps(source_stamps(source_paths)).encode("utf-8")
+    header = HEADER.pack(MAGIC, VERSION, zlib.crc32(payload), len(payload), len(stamps))
+    temporary_path = f"{snapshot_path}.tmp"
+    try:
+        with open(temporary_path, "wb") as f:
+            f.write(header)
+            f.write(stamps)
+            f.write(payload)
+        os.replace(temporary_path, snapshot_path)
+    except OSError:
+        return False
+    return True
+
+
+def load_or_build(
+    snapshot_path: str, source_paths: List[str], build: Callable[[], Any]
+) -> Any:
+    state = load_snapshot(snapshot_path, source_paths)
+    if state is None:
+        state = build()
+        save_snapshot(snapshot_path, state, source_paths)
+    return state
@@ -0,0 +1,177 @@
+import json
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.lexicon import read_text_lexicon
+from utils.snapshot import load_or_build, save_snapshot
+
+SPELLING_SNAPSHOT_FILE = "spelling.snapshot"
+DEFAULT_MAX_EDIT_DISTANCE = 2
+DEFAULT_PREFIX_LENGTH = 7
+
+
+def collection_frequencies(
+    lexicon: Dict[str, int], inverted_index: Dict
+) -> Dict[str, int]:
+    # The engine keys postings by integer term ID; the JSON file by its string.
+    key = str if isinstance(next(iter(inverted_index), ""), str) else int
+    return {
+        term: sum(inverted_index.get(key(term_id), [])[1::2])
+        for term, term_id in lexicon.items()
+    }
+
+
+def deletes(word: str, max_distance: int) -> Set[str]:
+    variants, frontier = {word}, [word]
+    for _ in range(max_distance):
+        next_frontier = []
+        for variant in frontier:
+            for i in range(len(variant)):
+                deleted = variant[:i] + variant[i + 1 :]
+                if deleted not in variants:
+                    variants.add(deleted)
+                    next_frontier.append(deleted)
+        frontier = next_frontier
+    return variants
+
+
+def edit_distance(source: str, target: str, max_distance: int) -> Optional[int]:
+    # Optimal string alignment distance (adjacent transpositions count as one
+    # edit), abandoned as soon as every cell in a row exceeds max_distance.
+    if abs(len(source) - len(target)) > max_distance:
+        return None
+    previous_previous, previous = None, list(range(len(target) + 1))
+    for i in range(1, len(source) + 1):
+        current = [i] + [0] * len(target)
+        for j in range(1, len(target) + 1):
+            cost = 0 if source[i - 1] == target[j - 1] else 1
+            current[j] = min(
+                previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost
+            )
+            if (
+                previous_previous is not None
+                and j > 1
+                and source[i - 1] == target[j - 2]
+                and source[i - 2] == target[j - 1]
+            ):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return None
+        previous_previous, previous = previous, current
+    return previous[-1] if previous[-1] <= max_distance else None
+
+
+class SpellingCorrector:
+    # SymSpell-style: every term is registered under all strings reachable by
+    # deleting up to max_edit_distance characters from its prefix, so a lookup
+    # only generates deletes of the misspelling and verifies the few terms that
+    # share one with it.
+    def __init__(
+        self,
+        frequencies: Dict[str, int],
+        max_edit_distance: int = DEFAULT_MAX_EDIT_DISTANCE,
+        prefix_length: int = DEFAULT_PREFIX_LENGTH,
+    ) -> None:
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        self.terms = list(frequencies)
+        self.frequencies = frequencies
+        self.deletes: Dict[str, List[int]] = {}
+        for position, term in enumerate(self.terms):
+            for variant in deletes(term[:prefix_length], max_edit_distance):
+                self.deletes.setdefault(variant, []).append(position)
+
+    def lookup(self, word: str) -> List[Tuple[str, int, int]]:
+        if word in self.frequencies:
+            return [(word, 0, self.frequencies[word])]
+
+        best_distance = self.max_edit_distance
+        suggestions: Dict[str, int] = {}
+        prefix = word[: self.prefix_length]
+        candidates, seen = deque([prefix]), {prefix}
+        while candidates:
+            candidate = candidates.popleft()
+            if len(prefix) - len(candidate) > best_distance:
+                break
+            for position in self.deletes.get(candidate, ()):
+                term = self.terms[position]
+                if term in suggestions:
+                    continue
+                distance = edit_distance(word, term, best_distance)
+                if distance is None:
+                    continue
+                if distance < best_distance:
+                    best_distance = distance
+                    suggestions = {
+                        known: known_distance
+                        for known, known_distance in suggestions.items()
+                        if known_distance <= distance
+                    }
+                suggestions[term] = distance
+            if len(prefix) - len(candidate) < best_distance:
+                for i in range(len(candidate)):
+                    deleted = candidate[:i] + candidate[i + 1 :]
+                    if deleted not in seen:
+                        seen.add(deleted)
+                        candidates.append(deleted)
+
+        return sorted(
+            (
+                (term, distance, self.frequencies[term])
+                for term, distance in suggestions.items()
+            ),
+            key=lambda suggestion: (suggestion[1], -suggestion[2], suggestion[0]),
+        )
+
+    def correct(self, word: str) -> Optional[str]:
+        suggestions = self.lookup(word)
+        return suggestions[0][0] if suggestions else None
+
+
+def correct_tokens(
+    tokens: Iterable[str], lexicon: Dict[str, int], corrector: SpellingCorrector
+) -> Tuple[List[str], Dict[str, str]]:
+    corrected, corrections = [], {}
+    for token in tokens:
+        if token and token not in lexicon and token.isalpha():
+            suggestion = corrector.correct(token)
+            if suggestion is not None:
+                corrections[token] = suggestion
+                token = suggestion
+        corrected.append(token)
+    return corrected, corrections
+
+
+def spelling_source_paths(index_directory_path: str) -> List[str]:
+    return [
+        f"{index_directory_path}/lexicon.txt",
+        f"{index_directory_path}/inverted_index.json",
+    ]
+
+
+def write_spelling_index(
+    index_directory_path: str, lexicon: Dict[str, int], inverted_index: Dict
+) -> SpellingCorrector:
+    corrector = SpellingCorrector(collection_frequencies(lexicon, inverted_index))
+    save_snapshot(
+        f"{index_directory_path}/{SPELLING_SNAPSHOT_FILE}",
+        corrector,
+        spelling_source_paths(index_directory_path),
+    )
+    return corrector
+
+
+def build_spelling_corrector(index_directory_path: str) -> SpellingCorrector:
+    with open(f"{index_directory_path}/inverted_index.json") as f:
+        inverted_index = json.load(f)
+    return SpellingCorrector(
+        collection_frequencies(read_text_lexicon(index_directory_path), inverted_index)
+    )
+
+
+def load_spelling_corrector(index_directory_path: str) -> SpellingCorrector:
+    return load_or_build(
+        f"{index_directory_path}/{SPELLING_SNAPSHOT_FILE}",
+        spelling_source_paths(index_directory_path),
+        lambda: build_spelling_corrector(index_directory_path),
+    )
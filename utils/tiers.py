@@ -0,0 +1,111 @@
+import json
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.pruning import kept_postings, length_normalizers
+from utils.snapshot import compact_postings
+
+CHAMPION_LISTS_FILE = "champion_lists.json"
+CHAMPION_ORDERS = ["impact", "tf"]
+DEFAULT_CHAMPION_SIZE = 200
+
+
+def champion_lists(
+    inverted_index: Dict[str, Sequence[int]],
+    doc_lengths: Sequence[int],
+    size: int,
+    order: str,
+    k1: float,
+    b: float,
+) -> Dict[str, List[int]]:
+    # Tier 1 of every term with more than `size` postings: its `size` postings
+    # with the highest tf, or the highest BM25 impact (tf normalized by
+    # document length; idf is the same for every posting of a term), kept in
+    # doc ID order. Shorter lists are entirely tier 1 and are not stored.
+    normalizers = length_normalizers(
+        doc_lengths, sum(doc_lengths) / len(doc_lengths), k1, b
+    )
+    champions = {}
+    for term_id, postings in inverted_index.items():
+        if len(postings) // 2 <= size:
+            continue
+        pairs = np.asarray(postings, dtype=np.int64).reshape(-1, 2)
+        frequencies = pairs[:, 1].astype(np.float64)
+        weights = (
+            frequencies / (frequencies + normalizers[pairs[:, 0]])
+            if order == "impact"
+            else frequencies
+        )
+        # Highest weights first, ties broken towards lower document IDs.
+        ranked = np.lexsort((np.arange(len(weights)), -weights))
+        keep = np.zeros(len(weights), dtype=bool)
+        keep[ranked[:size]] = True
+        champions[term_id] = kept_postings(postings, keep)
+    return champions
+
+
+def write_champion_lists(
+    index_directory_path: str,
+    inverted_index: Dict[str, Sequence[int]],
+    doc_lengths: Sequence[int],
+    size: int,
+    order: str,
+    k1: float,
+    b: float,
+) -> Dict[str, List[int]]:
+    champions = champion_lists(inverted_index, doc_lengths, size, order, k1, b)
+    with open(f"{index_directory_path}/{CHAMPION_LISTS_FILE}", "w") as f:
+        json.dump({"size": size, "order": order, "lists": champions}, f)
+    return champions
+
+
+class TieredIndex:
+    # Dict-like views over the two tiers of an inverted index: `champions`
+    # yields each term's tier 1 postings and `remainder` the rest, so that the
+    # scores from both add up to the exact BM25 scores as long as idf is taken
+    # from the full lists.
+    def __init__(
+        self, inverted_index: Dict[str, Sequence[int]], lists: Dict[str, List[int]]
+    ) -> None:
+        self.inverted_index = inverted_index
+        self.lists = lists
+        self.champions = _Tier(self, remainder=False)
+        self.remainder = _Tier(self, remainder=True)
+
+
+class _Tier:
+    def __init__(self, tiered_index: TieredIndex, remainder: bool) -> None:
+        self.tiered_index = tiered_index
+        self.remainder = remainder
+
+    def __getitem__(self, key) -> Sequence[int]:
+        postings = self.tiered_index.inverted_index[key]
+        champions = self.tiered_index.lists.get(key)
+        if champions is None:
+            return [] if self.remainder else postings
+        if not self.remainder:
+            return champions
+        pairs = np.asarray(postings).reshape(-1, 2)
+        keep = ~np.isin(pairs[:, 0], np.asarray(champions)[::2])
+        return pairs[keep].ravel().tolist()
+
+    def get(self, key, default=None):
+        return self[key] if key in self.tiered_index.inverted_index else default
+
+    def __contains__(self, key) -> bool:
+        return key in self.tiered_index.inverted_index
+
+
+def load_tiered_index(
+    index_directory_path: str, inverted_index: Dict[str, Sequence[int]]
+) -> Optional[TieredIndex]:
+    path = f"{index_directory_path}/{CHAMPION_LISTS_FILE}"
+    postings_path = f"{index_directory_path}/inverted_index.json"
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(
+        postings_path
+    ):
+        return None
+    with open(path) as f:
+        return TieredIndex(inverted_index, compact_postings(json.load(f)["lists"]))
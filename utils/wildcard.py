@@ -0,0 +1,118 @@
+import bisect
+import re
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+DEFAULT_MAX_EXPANSIONS = 50
+EXPANSION_CACHE_SIZE = 1024
+KGRAM_BOUNDARY = "$"
+
+
+def kgrams(text: str, k: int = 2) -> List[str]:
+    return [text[i : i + k] for i in range(len(text) - k + 1)]
+
+
+def pattern_kgrams(pattern: str, k: int = 2) -> List[str]:
+    segments = f"{KGRAM_BOUNDARY}{pattern}{KGRAM_BOUNDARY}".split("*")
+    return [gram for segment in segments for gram in kgrams(segment, k)]
+
+
+class WildcardExpander:
+    # Prefix patterns are answered from the sorted term array (or the
+    # front-coded lexicon's own prefix scan), suffix patterns from a sorted array
+    # of reversed terms, and anything with an inner wildcard from a bigram index
+    # whose candidates are verified against the pattern.
+    def __init__(
+        self,
+        lexicon,
+        inverted_index: Dict[str, Sequence[int]],
+        max_expansions: int = DEFAULT_MAX_EXPANSIONS,
+    ) -> None:
+        self.lexicon = lexicon
+        self.inverted_index = inverted_index
+        self.max_expansions = max_expansions
+        self._terms = None
+        self._reversed_terms = None
+        self._kgram_index = None
+        self._expansions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _sorted_terms(self) -> List[Tuple[str, int]]:
+        if self._terms is None:
+            self._terms = sorted(self.lexicon.items())
+        return self._terms
+
+    def _prefix_matches(self, prefix: str) -> Iterator[Tuple[str, int]]:
+        if hasattr(self.lexicon, "prefix"):
+            yield from self.lexicon.prefix(prefix)
+            return
+        terms = self._sorted_terms()
+        for term, term_id in terms[bisect.bisect_left(terms, (prefix,)) :]:
+            if not term.startswith(prefix):
+                return
+            yield term, term_id
+
+    def _suffix_matches(self, suffix: str) -> Iterator[Tuple[str, int]]:
+        if self._reversed_terms is None:
+            self._reversed_terms = sorted(
+                (term[::-1], term_id) for term, term_id in self.lexicon.items()
+            )
+        reversed_suffix = suffix[::-1]
+        terms = self._reversed_terms
+        for term, term_id in terms[bisect.bisect_left(terms, (reversed_suffix,)) :]:
+            if not term.startswith(reversed_suffix):
+                return
+            yield term[::-1], term_id
+
+    def _kgram_matches(self, pattern: str) -> Iterator[Tuple[str, int]]:
+        terms = self._sorted_terms()
+        if self._kgram_index is None:
+            self._kgram_index = {}
+            for position, (term, _) in enumerate(terms):
+                bounded = f"{KGRAM_BOUNDARY}{term}{KGRAM_BOUNDARY}"
+                for gram in set(kgrams(bounded)):
+                    self._kgram_index.setdefault(gram, []).append(position)
+
+        postings = [self._kgram_index.get(gram, []) for gram in pattern_kgrams(pattern)]
+        postings.sort(key=len)
+        candidates = set(postings[0]) if postings else range(len(terms))
+        for gram_positions in postings[1:]:
+            candidates = candidates.intersection(gram_positions)
+            if not candidates:
+                return
+        matcher = re.compile(".*".join(re.escape(part) for part in pattern.split("*")))
+        for position in sorted(candidates):
+            term, term_id = terms[position]
+            if matcher.fullmatch(term):
+                yield term, term_id
+
+    def _matches(self, pattern: str) -> Iterator[Tuple[str, int]]:
+        parts = pattern.split("*")
+        head, tail, middle = parts[0], parts[-1], parts[1:-1]
+        if any(middle):
+            return self._kgram_matches(pattern)
+        if head:
+            return (
+                (term, term_id)
+                for term, term_id in self._prefix_matches(head)
+                if term.endswith(tail) and len(term) >= len(head) + len(tail)
+            )
+        return self._suffix_matches(tail)
+
+    def expand(self, pattern: str) -> List[Tuple[str, int]]:
+        if not pattern.replace("*", ""):
+            return []
+        expansion = self._expansions.get(pattern)
+        if expansion is not None:
+            self.hits += 1
+            return expansion
+        self.misses += 1
+        if len(self._expansions) >= EXPANSION_CACHE_SIZE:
+            self._expansions.clear()
+        matches = list(self._matches(pattern))
+        matches.sort(
+            key=lambda match: len(self.inverted_index.get(str(match[1]), [])),
+            reverse=True,
+        )
+        expansion = self._expansions[pattern] = matches[: self.max_expansions]
+        return expansion